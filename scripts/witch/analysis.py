@@ -0,0 +1,261 @@
+import json
+
+import maya
+from maya import cmds as mc
+
+from . import graph
+from .modules import module_base
+
+## ----------------------------------------------------------------------
+'''
+
+	ANALYSIS.PY
+
+	Rig complexity and evaluation-cost reports per module.
+
+	Every module is walked once, starting from its MODULE node's nodes,
+	controls, rig and extras links: the DAG below the MODULE node, the
+	utility nodes tagged with a module connection and any other DG nodes
+	hanging off them. While walking it counts node types, connections,
+	constraints and DAG depth, and estimates an evaluation cost from
+	COST_WEIGHTS.
+
+	Budgets are plain dicts (or JSON files) of limits:
+
+		{
+			"default":	{ "nodes":2000, "cost":4000 },
+			"SimpleFK":	{ "constraints":200 },
+			"ARM_LF_MODULE": { "depth":30 },
+			"character": { "cost":50000 }
+		}
+
+	Module names override module types, which override the default;
+	"character" limits the totals. The keys that can be limited are nodes,
+	connections, constraints, depth and cost.
+
+'''
+
+## ----------------------------------------------------------------------
+class AnalysisException(Exception):
+	pass
+
+## rough relative cost of evaluating one node of each type; anything not
+## listed costs 1.0, and every connection adds CONNECTION_COST
+COST_WEIGHTS = {
+	'transform':1.0,
+	'joint':1.5,
+	'nurbsCurve':0.25,
+	'parentConstraint':4.0,
+	'pointConstraint':2.0,
+	'orientConstraint':2.5,
+	'scaleConstraint':2.5,
+	'aimConstraint':3.0,
+	'multMatrix':1.0,
+	'decomposeMatrix':1.5,
+	'composeMatrix':1.0,
+	'aimMatrix':2.0,
+	'pairBlend':2.0,
+	'blendColors':0.75,
+	'remapValue':1.0,
+	'multiplyDivide':0.75,
+	'distanceBetween':1.0,
+	'ikHandle':8.0,
+	'ikEffector':0.5,
+}
+CONNECTION_COST = 0.1
+
+LIMIT_KEYS = [ 'nodes', 'connections', 'constraints', 'depth', 'cost' ]
+
+## ----------------------------------------------------------------------
+def findModules():
+	## every MODULE node in the scene
+	return( sorted( x for x in mc.ls('*_MODULE', '*:*_MODULE', type='transform') or []
+		if mc.attributeQuery('chain', node=x, exists=True) ) )
+
+
+## ----------------------------------------------------------------------
+def _links(node, attr):
+	if not mc.attributeQuery(attr, node=node, exists=True):
+		return([])
+	return( mc.listConnections('%s.%s' % (node, attr), s=True, d=False, fullPath=True) or [] )
+
+
+## ----------------------------------------------------------------------
+def analyzeModule(module, visited=None):
+	'''
+	analyzeModule(module, visited=None):
+
+	Walks one module's nodes and returns its stats as a dict. visited is the
+	set of nodes already claimed by other modules, so shared nodes are only
+	counted once across a character.
+	'''
+
+	if visited is None:
+		visited = set()
+
+	module = mc.ls(module, long=True)[0]
+	seeds = [module]
+	for attr in 'nodes', 'controls', 'rig', 'extras':
+		seeds += _links(module, attr)
+	seeds += mc.listRelatives(module, ad=True, fullPath=True) or []
+
+	## nodes registered with registerNodes: utility networks, and DAG
+	## nodes outside the module such as constraints under the rig root
+	registered = graph.ownedNodes(module)
+	seeds += registered['external'] + registered['dg']
+
+	## the bind chain belongs to the skeleton, not the module-- it's
+	## where the walk stops
+	boundary = set( mc.ls(_links(module, 'chain'), long=True) or [] )
+
+	owned = []
+	queue = []
+	for node in mc.ls(seeds, long=True) or []:
+		if not node in visited and not node in boundary:
+			visited.add(node)
+			owned.append(node)
+			queue.append(node)
+
+	connections = 0
+	while len(queue):
+		node = queue.pop()
+		incoming = mc.listConnections(node, s=True, d=False, c=True, skipConversionNodes=False, fullPath=True) or []
+		connections += len(incoming) // 2
+
+		## pull in DG-only neighbours (utility networks) that aren't
+		## registered anywhere else; DAG nodes outside the module are external
+		neighbours = mc.listConnections(node, shapes=False, fullPath=True) or []
+		for other in mc.ls(neighbours, long=True) or []:
+			if other in visited or other in boundary or mc.ls(other, dag=True):
+				continue
+			if mc.attributeQuery('module', node=other, exists=True):
+				continue
+			if mc.ls(other, defaultNodes=True) or mc.nodeType(other) in ('time', 'dagPose', 'objectSet'):
+				continue
+			visited.add(other)
+			owned.append(other)
+			queue.append(other)
+
+	byType = {}
+	for node in owned:
+		nodeType = mc.nodeType(node)
+		byType[nodeType] = byType.get(nodeType, 0) + 1
+
+	constraints = len( mc.ls(owned, type='constraint') or [] )
+	baseDepth = len(module.split('|'))
+	depth = max( [ len(x.split('|')) - baseDepth for x in mc.ls(owned, dag=True, long=True) or [] ] + [0] )
+
+	cost = sum( COST_WEIGHTS.get(key, 1.0) * value for key, value in byType.items() )
+	cost += CONNECTION_COST * connections
+
+	chain = _links(module, 'chain')
+	moduleType = None
+	if len(chain) and mc.attributeQuery(module_base.PARAM_PREFIX+'_type', node=chain[0], exists=True):
+		moduleType = mc.getAttr('%s.%s_type' % (chain[0], module_base.PARAM_PREFIX))
+
+	return( {
+		'module':module.rpartition('|')[2],
+		'type':moduleType,
+		'nodes':len(owned),
+		'byType':byType,
+		'connections':connections,
+		'constraints':constraints,
+		'depth':depth,
+		'cost':round(cost, 3),
+	} )
+
+
+## ----------------------------------------------------------------------
+def analyze(modules=None):
+	'''
+	analyze(modules=None):
+
+	Reports on the given MODULE nodes (every module in the scene if None).
+
+	Returns:
+
+	A dict with a 'modules' list (one entry per module, see analyzeModule)
+	and a 'character' entry holding the totals.
+	'''
+
+	if modules is None:
+		modules = findModules()
+
+	visited = set()
+	results = [ analyzeModule(x, visited) for x in modules ]
+
+	total = { 'module':'<character>', 'type':None, 'nodes':0, 'byType':{}, 'connections':0,
+		'constraints':0, 'depth':0, 'cost':0.0 }
+	for item in results:
+		for key in 'nodes', 'connections', 'constraints', 'cost':
+			total[key] += item[key]
+		total['depth'] = max(total['depth'], item['depth'])
+		for key, value in item['byType'].items():
+			total['byType'][key] = total['byType'].get(key, 0) + value
+	total['cost'] = round(total['cost'], 3)
+
+	return( { 'modules':results, 'character':total } )
+
+
+## ----------------------------------------------------------------------
+def toJSON(report, path=None):
+	text = json.dumps(report, indent=1, sort_keys=True)
+	if path is not None:
+		with open(path, 'w') as handle:
+			handle.write(text)
+	return(text)
+
+
+## ----------------------------------------------------------------------
+def formatTable(report, sortBy='cost'):
+	columns = [ 'module', 'type' ] + LIMIT_KEYS
+	## modules with no type have None there, which doesn't sort against strings on py3
+	rows = sorted( report['modules'], key=lambda x: '' if x[sortBy] is None else x[sortBy], reverse=True ) + [ report['character'] ]
+
+	widths = dict( (x, max( [len(x)] + [ len(str(row[x])) for row in rows ] )) for x in columns )
+	lines = [ '  '.join( x.ljust(widths[x]) for x in columns ) ]
+	lines.append( '  '.join( '-' * widths[x] for x in columns ) )
+	for row in rows:
+		lines.append( '  '.join( str(row[x]).ljust(widths[x]) for x in columns ) )
+
+	return( '\n'.join(lines) )
+
+
+## ----------------------------------------------------------------------
+def loadBudgets(path):
+	with open(path, 'r') as handle:
+		return( json.load(handle) )
+
+
+## ----------------------------------------------------------------------
+def checkBudgets(report, budgets):
+	'''
+	checkBudgets(report, budgets):
+
+	Compares every module in the report against its budget (see the file
+	docstring). budgets may be a dict or the path of a JSON file.
+
+	Returns:
+
+	A list of violation messages; empty if everything fits.
+	'''
+
+	if not isinstance(budgets, dict):
+		budgets = loadBudgets(budgets)
+
+	results = []
+	for item in report['modules']:
+		limits = dict( budgets.get('default', {}) )
+		limits.update( budgets.get(item['type'], {}) or {} )
+		limits.update( budgets.get(item['module'], {}) or {} )
+
+		for key in LIMIT_KEYS:
+			if key in limits and item[key] > limits[key]:
+				results.append( '%s (%s): %s %s is over budget (%s).' % (item['module'], item['type'], key, item[key], limits[key]) )
+
+	if 'character' in budgets:
+		for key in LIMIT_KEYS:
+			if key in budgets['character'] and report['character'][key] > budgets['character'][key]:
+				results.append( 'Character: %s %s is over budget (%s).' % (key, report['character'][key], budgets['character'][key]) )
+
+	return(results)
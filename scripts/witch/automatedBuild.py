@@ -13,6 +13,18 @@ reload(module_base)
 from . import moduleFactory as mf
 reload(mf)
 
+from . import planning
+reload(planning)
+
+from . import analysis
+reload(analysis)
+
+from . import descriptors
+reload(descriptors)
+
+from . import clone as cloning
+reload(cloning)
+
 ## ----------------------------------------------------------------------
 '''
 
@@ -30,69 +42,234 @@ reload(mf)
 class AutomatedBuildException(Exception):
 	pass
 
+## ----------------------------------------------------------------------
+def snapshotRoot(root, moduleClass):
+	'''
+	snapshotRoot(root, moduleClass):
+
+	Reads everything the planner needs from a tagged root into plain data.
+	This only queries the scene; see planning.py for the snapshot layout.
+	'''
+
+	name = str(root)
+	prefix = module_base.PARAM_PREFIX + '_'
+
+	params = {}
+	for attr in mc.listAttr(name, ud=True) or []:
+		if not attr.startswith(prefix) or attr.count('.'):
+			continue
+		plug = '.'.join([name, attr])
+		attrType = mc.getAttr(plug, type=True)
+		if attrType == 'message':
+			continue
+		elif attrType == 'enum':
+			value = mc.getAttr(plug, asString=True)
+		else:
+			value = mc.getAttr(plug)
+			## compound attributes come back as [(x, y, z)]
+			if isinstance(value, list) and len(value) == 1 and isinstance(value[0], tuple):
+				value = list(value[0])
+		params[attr[len(prefix):]] = value
+
+	parents = {}
+	for seam in 'root', 'goal':
+		parent = None
+		if mc.attributeQuery('parent_'+seam, node=name, exists=True):
+			found = mc.listConnections('%s.parent_%s' % (name, seam), s=True, d=False) or []
+			if len(found):
+				parent = { 'node':found[0], 'owner':None }
+				## controls and inputs of built modules point back at their module
+				if mc.attributeQuery('module', node=found[0], exists=True):
+					module = mc.listConnections(found[0]+'.module', s=True, d=False) or []
+					if len(module) and mc.attributeQuery('chain', node=module[0], exists=True):
+						owner = mc.listConnections(module[0]+'.chain', s=True, d=False) or []
+						if len(owner):
+							parent['owner'] = owner[0]
+		parents[seam] = parent
+
+	snapshot = {
+		'root':name,
+		'type':params.get('type'),
+		'token':params.get('token'),
+		'side':params.get('side') or utils.determineSide(name),
+		'detectedSide':utils.determineSide(name),
+		'chain':[ str(x) for x in utils.getChain(root) ],
+		'params':params,
+		'parents':parents,
+		'limits':{
+			'minChainLength':moduleClass._minChainLength,
+			'maxChainLength':moduleClass._maxChainLength,
+			'usesRoot':moduleClass._usesRoot,
+			'usesGoal':moduleClass._usesGoal,
+			'defaultControllerType':moduleClass._defaultControllerType,
+		},
+	}
+
+	return(snapshot)
+
+
+## ----------------------------------------------------------------------
+def planBuild(roots, factory=None, processes=None):
+	'''
+	planBuild(roots, factory=None, processes=None):
+
+	Snapshots the given (tagged) roots and validates them in worker processes.
+	Returns a planning.BuildReport; the scene is not modified.
+	'''
+
+	if factory is None:
+		factory = mf.ModuleFactory()
+
+	snapshots = []
+	for root in utils.makeList(roots, type='joint'):
+		cType = utils.getAttrSpecial( root, 'type', prefix=module_base.PARAM_PREFIX )
+		snapshots.append( snapshotRoot(root, factory.getClass(cType)) )
+
+	## module names already in the scene only collide if they don't
+	## belong to the root being (re)built; planModules reports them along
+	## with the collisions between the roots themselves
+	existing = []
+	for snapshot in snapshots:
+		name = planning.moduleName( snapshot['token'] or '', snapshot['side'] or '' )
+		if mc.objExists(name):
+			chain = mc.listConnections(name+'.chain', s=True, d=False) if \
+				mc.attributeQuery('chain', node=name, exists=True) else None
+			if not chain or not chain[0] == snapshot['root']:
+				existing.append(name)
+
+	report = planning.planModules( snapshots, utils.controllerCurves.keys(), processes=processes, existing=existing )
+
+	return(report)
+
+
 ## ----------------------------------------------------------------------
 def automatedBuild(*args, **kwargs):
 	rebuild = kwargs.get('rebuild', False)
-
-	oblist = [ x for x in utils.makeList(args, type='joint') ]
+	plan = kwargs.get('plan', True)
+	processes = kwargs.get('processes', None)
+	budgets = kwargs.get('budgets', None)
+	clone = kwargs.get('clone', False)
+
+	## describing the roots is cheap; full module instances are only made
+	## for the roots that actually get built
+	oblist = []
+	if len(args):
+		found = utils.makeList(args, type='joint')
+		## ls of an empty list is every joint in the scene
+		if not len(found):
+			print( "++ AutomatedBuild: No joints found in %s-- nothing to build." % str(args) )
+			return([])
+		oblist = mc.ls(found, type='joint')
 
 	factory = mf.ModuleFactory()
 	print(factory.modules)
 
+	roots = []
 	instances = []
 
 	print( ">> AutomatedBuild: Collecting chains..." )
-	for item in oblist:
-		cType = utils.getAttrSpecial( item, 'type', prefix=module_base.PARAM_PREFIX )
-		if not cType in factory.modules:
+	for item in descriptors.scanRoots(oblist):
+		if not item.type in factory.modules:
 			## something funky has happened
-			print( "\t--Invalid module type %s for root %s-- skipping..." % (cType, item) )
+			print( "\t--Invalid module type %s for root %s-- skipping..." % (item.type, item.root) )
 			continue
 
-		if item.hasAttr('module') and item.module.get() is not None:
+		if item.built:
 			## assume it's already built and skip unless rebuild is specified
 			if not rebuild:
-				print( "\t-- AutomatedBuild: Skipping built root %s." % item )
+				print( "\t-- AutomatedBuild: Skipping built root %s." % item.root )
 				continue
-			else:
-				print( "\t++ AutomatedBuild: Rebuild -- removing module from %s..." % item )
-				utils.removeModule( item )
 
-		moduleClass = factory.getClass(cType)
-		instance = moduleClass(item)
-
-		instances.append(instance)
+		roots.append(item)
+
+	## everything that can be checked from plain data is checked here,
+	## before anything in the scene changes
+	if plan:
+		print( ">> AutomatedBuild: Planning..." )
+		report = planBuild([ x.root for x in roots ], factory, processes)
+		print( report.format() )
+		if not report.ok:
+			raise AutomatedBuildException( 'Build plan has %d error(s):\n%s' % (len(report.errors), report.format()) )
+
+	for item in roots:
+		if item.built:
+			print( "\t++ AutomatedBuild: Rebuild -- removing module from %s..." % item.root )
+			utils.removeModule( item.root )
+
+		instances.append( item.instantiate(factory) )
+
+	## roots that would build the same rig only build it once; the others
+	## get a copy after the build stage
+	copies = []
+	if clone:
+		byRoot = dict( (str(x.root), x) for x in instances )
+		groups = cloning.groupByFingerprint( [ str(x.root) for x in instances ] )
+		instances = [ byRoot[x[0]] for x in groups ]
+		copies = [ (x[0], y) for x in groups for y in x[1:] ]
 
 	## build stages
 
 	print( ">> AutomatedBuild: Validating..." )
 	for instance in instances:
 		if not instance.validate():
-			raise AutomatedBuildException( 'Instance invalid: %s (root %s).' % (instance['root'], instance._message) )
+			raise AutomatedBuildException( 'Instance invalid: %s (root %s).' % (instance._message, instance.root) )
 
 	print( ">> AutomatedBuild: Build starting..." )
 	for instance in instances:
-		print( "\t++ %s (%s) -- root (%s)" % (instance['token'], instance['type'], item) )
+		print( "\t++ %s (%s) -- root (%s)" % (instance['token'], instance['type'], instance.root) )
 		instance.build()
 
+	if len(copies):
+		print( ">> AutomatedBuild: Cloning %d module(s)..." % len(copies) )
+		for source, target in copies:
+			print( "\t++ %s -> %s" % (source, target) )
+			instances.append( cloning.cloneModule(source, target, factory) )
+
 	print( ">> AutomatedBuild: Postbuild..." )
 	for instance in instances:
 		instance.postbuild()
 
 	print( ">> AutomatedBuild: Seaming..." )
-	for instance in instances:
-		instance.seamRoot()
-		instance.seamGoal()
+	changed = module_base.reconcileSeams(instances)
+	print( "\t++ %d seam(s) made or redone" % len(changed) )
 
-	print( "++ AutomatedBuild: Build complete (%d modules)" % len(instances) )
+	if budgets is not None:
+		print( ">> AutomatedBuild: Checking budgets..." )
+		report = analysis.analyze( [ str(x.module) for x in instances ] )
+		print( analysis.formatTable(report) )
+		violations = analysis.checkBudgets(report, budgets)
+		if len(violations):
+			raise AutomatedBuildException( 'Build is over budget:\n\t' + '\n\t'.join(violations) )
 
+	print( "++ AutomatedBuild: Build complete (%d modules)" % len(instances) )
 
+	return(instances)
 
 
+## ----------------------------------------------------------------------
+def reseam(*args, **kwargs):
+	'''
+	reseam(*roots, force=False):
 
+	Reconciles the seams of the built modules on the given roots (every
+	built module if none are given) without building anything: only seams
+	whose parent or offset changed are redone (see
+	module_base.reconcileSeams).
 
+	Returns:
 
+	The reconcileSeams result.
+	'''
 
+	force = kwargs.get('force', False)
+	factory = mf.ModuleFactory()
 
+	oblist = [ str(x) for x in utils.makeList(args, type='joint') ] if len(args) else None
+	instances = [ x.rehydrate(factory) for x in descriptors.scanRoots(oblist) if x.built and x.type in factory.modules ]
 
+	changed = module_base.reconcileSeams(instances, force=force)
+	for instance, seam, status in changed:
+		print( "\t++ %s %s seam (%s)" % (instance.root, seam, status) )
+	print( "++ AutomatedBuild: %d of %d module(s) had seams redone" % (len( set( str(x[0].root) for x in changed ) ), len(instances)) )
 
+	return(changed)
@@ -0,0 +1,1097 @@
+import os
+import sys
+import time
+import tempfile
+
+import maya
+from maya import cmds as mc
+import pymel.core as pm
+
+from . import utils
+from .modules import module_base
+
+## ----------------------------------------------------------------------
+'''
+
+	BENCHMARKS.PY
+
+	Benchmark scenes for comparing build strategies. Every benchmark starts
+	a new scene (so save your work first), builds what it needs, and
+	returns its measurements as a dict as well as printing a table.
+
+	Run them from the script editor:
+
+		from witch import benchmarks
+		benchmarks.benchmarkControlLayouts(100)
+
+'''
+
+## ----------------------------------------------------------------------
+class BenchmarkException(Exception):
+	pass
+
+## ----------------------------------------------------------------------
+def newScene():
+	mc.file(new=True, force=True)
+
+
+## ----------------------------------------------------------------------
+def makeTestChain(name, length, spacing=1.0, axis='x', parent=None):
+	'''
+	Creates a straight joint chain of the given length and returns the joint
+	names, root first.
+	'''
+
+	mc.select(clear=True)
+	if parent is not None:
+		mc.select(parent)
+
+	offset = { 'x':(spacing,0,0), 'y':(0,spacing,0), 'z':(0,0,spacing) }[axis]
+
+	joints = []
+	for index in range(length):
+		position = [ x * index for x in offset ]
+		joints.append( mc.joint(name='%s%02d' % (name, index+1), p=position) )
+
+	mc.select(clear=True)
+	return(joints)
+
+
+## ----------------------------------------------------------------------
+def countNodes(types=None):
+	## all nodes (minus the default ones from a new scene) or of the given types
+	if types is None:
+		return( len( set(mc.ls()) - set(mc.ls(defaultNodes=True)) ) )
+	return( len(mc.ls(type=types)) )
+
+
+## ----------------------------------------------------------------------
+def dagDepth(node):
+	return( len( mc.ls(node, long=True)[0].split('|') ) - 1 )
+
+
+## ----------------------------------------------------------------------
+def timed(function, *args, **kwargs):
+	start = time.time()
+	result = function(*args, **kwargs)
+	return( (time.time() - start, result) )
+
+
+## ----------------------------------------------------------------------
+def printTable(title, rows, columns):
+	print( '>> %s' % title )
+	print( '\t' + '\t'.join(columns) )
+	for row in rows:
+		print( '\t' + '\t'.join( ('%.4f' % row[x]) if isinstance(row[x], float) else str(row[x]) for x in columns ) )
+
+
+## ----------------------------------------------------------------------
+def buildSimpleFK(root, **params):
+	from .modules import SimpleFK
+
+	instance = SimpleFK.SimpleFK(root)
+	for key, value in params.items():
+		## set the existing attributes directly so enums stay enums
+		instance.root.attr( '_'.join([module_base.PARAM_PREFIX, key]) ).set(value)
+	instance.build()
+	return(instance)
+
+
+## ----------------------------------------------------------------------
+def tagSimpleFK(root, token):
+	## modules left with the default token all get the same MODULE name
+	from .modules import SimpleFK
+
+	instance = SimpleFK.SimpleFK(root)
+	instance.setParam('token', token, mirror=False, type='string')
+	return(instance)
+
+
+## ----------------------------------------------------------------------
+def benchmarkControlLayouts(length=100):
+	'''
+	benchmarkControlLayouts(length=100):
+
+	Builds a SimpleFK on a chain of the given length once with zero groups
+	and once with offset parent matrices, and compares transform count, total
+	node count, DAG depth of the last control and build time.
+	'''
+
+	rows = []
+	for layout in 'zero', 'offset':
+		newScene()
+		joints = makeTestChain('LAYOUT_cn_', length)
+		before = countNodes()
+		transformsBefore = countNodes('transform')
+
+		seconds, instance = timed( buildSimpleFK, joints[0], controlLayout=layout, addControlToTip=True )
+
+		rows.append( {
+			'layout':layout,
+			'controls':instance.numControls('fk'),
+			'transforms':countNodes('transform') - transformsBefore,
+			'nodes':countNodes() - before,
+			'depth':dagDepth( str(instance.getControl('fk', -1)) ),
+			'seconds':seconds,
+		} )
+
+	printTable( 'Control layouts (%d joints)' % length, rows,
+		['layout', 'controls', 'transforms', 'nodes', 'depth', 'seconds'] )
+
+	return(rows)
+
+
+## ----------------------------------------------------------------------
+def countConnections(nodes):
+	return( len( mc.listConnections(nodes, c=True, s=True, d=False) or [] ) // 2 )
+
+
+## ----------------------------------------------------------------------
+def benchmarkChainBlend(length=50):
+	'''
+	benchmarkChainBlend(length=50):
+
+	Acceptance numbers for ModuleBase.connectChains: connects a single rig
+	chain, then blends an IK and an FK chain, into a chain of the given
+	length and counts the nodes and connections each one adds.
+	'''
+
+	from .modules import SimpleFK
+
+	rows = []
+	for mode, sources in ('direct', ['FK']), ('blend', ['IK', 'FK']):
+		newScene()
+		joints = makeTestChain('BLEND_cn_', length)
+		instance = SimpleFK.SimpleFK(joints[0])
+		instance.createModule()
+		chains = [ instance.createRigChain(x) for x in sources ]
+
+		before = set(mc.ls())
+		seconds, weight = timed( instance.connectChains, *(chains + [instance.chain]) )
+		added = list( set(mc.ls()) - before )
+
+		rows.append( {
+			'mode':mode,
+			'joints':length,
+			'nodes':len(added),
+			'nodesPerJoint':float(len(added)) / length,
+			'connections':countConnections(joints + added),
+			'seconds':seconds,
+		} )
+
+	printTable( 'connectChains (%d joints)' % length, rows,
+		['mode', 'joints', 'nodes', 'nodesPerJoint', 'connections', 'seconds'] )
+
+	return(rows)
+
+
+## ----------------------------------------------------------------------
+def deepSize(ob, seen=None):
+	## rough recursive memory footprint of plain python data
+	if seen is None:
+		seen = set()
+	if id(ob) in seen:
+		return(0)
+	seen.add(id(ob))
+
+	size = sys.getsizeof(ob)
+	if isinstance(ob, dict):
+		size += sum( deepSize(k, seen) + deepSize(v, seen) for k, v in ob.items() )
+	elif isinstance(ob, (list, tuple, set)):
+		size += sum( deepSize(x, seen) for x in ob )
+	elif hasattr(ob, '__dict__'):
+		size += deepSize(ob.__dict__, seen)
+	elif hasattr(ob, '__slots__'):
+		size += sum( deepSize(getattr(ob, x), seen) for x in ob.__slots__ if hasattr(ob, x) )
+	return(size)
+
+
+## ----------------------------------------------------------------------
+def makeTaggedRoots(count, length=3, moduleType='SimpleFK'):
+	## quick tagging with plain attributes, for scan benchmarks
+	prefix = module_base.PARAM_PREFIX + '_'
+	roots = []
+	for index in range(count):
+		joints = makeTestChain('CROWD%04d_cn_' % index, length)
+		root = joints[0]
+		mc.addAttr(root, ln='MODULEROOT', at='bool', dv=True)
+		mc.addAttr(root, ln=prefix+'type', dt='string')
+		mc.setAttr(root+'.'+prefix+'type', moduleType, type='string')
+		mc.addAttr(root, ln=prefix+'token', dt='string')
+		mc.setAttr(root+'.'+prefix+'token', 'CROWD%04d' % index, type='string')
+		mc.addAttr(root, ln=prefix+'side', at='enum', en='cn:lf:rt')
+		roots.append(root)
+	return(roots)
+
+
+## ----------------------------------------------------------------------
+def benchmarkRootScan(count=5000):
+	'''
+	benchmarkRootScan(count=5000):
+
+	Compares describing count tagged roots with descriptors.scanRoots
+	against constructing a full module instance per root, the way
+	automatedBuild used to decide what to build.
+	'''
+
+	from . import descriptors
+	from . import moduleFactory
+
+	newScene()
+	roots = makeTaggedRoots(count)
+
+	seconds, found = timed( descriptors.scanRoots, roots )
+	rows = [ { 'method':'descriptors', 'roots':len(found), 'bytes':deepSize(found), 'seconds':seconds } ]
+
+	factory = moduleFactory.ModuleFactory()
+	seconds, instances = timed( lambda: [ factory.getClass('SimpleFK')(x) for x in roots ] )
+	rows.append( { 'method':'instances', 'roots':len(instances), 'bytes':deepSize(instances), 'seconds':seconds } )
+
+	printTable( 'Root scan (%d roots)' % count, rows, ['method', 'roots', 'bytes', 'seconds'] )
+
+	return(rows)
+
+
+## ----------------------------------------------------------------------
+def makeMirroredChains(name, length, offset=(2.0, 1.0, 0.0)):
+	## a left chain and its behavior mirrored right side partner
+	left = makeTestChain('%s_lf_' % name, length)
+	mc.move(offset[0], offset[1], offset[2], left[0])
+	right = mc.mirrorJoint(left[0], mirrorYZ=True, mirrorBehavior=True, searchReplace=('_lf_', '_rt_'))
+	return( (left, right) )
+
+
+## ----------------------------------------------------------------------
+def benchmarkMirror(pairs=10, length=5, tolerance=1e-3):
+	'''
+	benchmarkMirror(pairs=10, length=5, tolerance=1e-3):
+
+	Builds pairs of left / right SimpleFK modules once independently with
+	automatedBuild and once with symmetry.mirrorBuild, and compares build
+	time and node count. The mirrored right side modules are checked
+	against the independently built ones, at rest and with the first
+	control posed.
+	'''
+
+	from . import automatedBuild
+	from . import symmetry
+	from .modules import SimpleFK
+
+	pose = (10.0, 20.0, 30.0)
+	rows = []
+	captures = {}
+
+	for method in 'independent', 'mirror':
+		newScene()
+		roots = []
+		for index in range(pairs):
+			left, right = makeMirroredChains('MIRROR%02d' % index, length)
+			for root in left[0], right[0]:
+				## one token per pair; the sides keep the names apart
+				tagSimpleFK(root, 'mirror%02d' % index)
+				roots.append(root)
+
+		before = countNodes()
+		if method == 'independent':
+			seconds, result = timed( automatedBuild.automatedBuild, *roots )
+		else:
+			seconds, result = timed( symmetry.mirrorBuild, *roots )
+
+		rights = [ SimpleFK.SimpleFK.rehydrate(x) for x in roots[1::2] ]
+		captures[method] = [ symmetry.captureModule(x) for x in rights ]
+		for instance in rights:
+			mc.setAttr( str(instance.getControl('fk', 0))+'.rotate', *pose )
+		captures[method+'Posed'] = [ symmetry.captureModule(x) for x in rights ]
+
+		rows.append( {
+			'method':method,
+			'modules':len(roots),
+			'nodes':countNodes() - before,
+			'seconds':seconds,
+		} )
+
+	mismatches = []
+	for key in '', 'Posed':
+		for a, b in zip( captures['independent'+key], captures['mirror'+key] ):
+			mismatches += symmetry.compareModules(a, b, tolerance)
+
+	for row in rows:
+		row['mismatches'] = len(mismatches) if row['method'] == 'mirror' else 0
+
+	printTable( 'Mirror build (%d pairs, %d joints)' % (pairs, length), rows,
+		['method', 'modules', 'nodes', 'seconds', 'mismatches'] )
+	for item in mismatches:
+		print( '\t!! %s' % item )
+
+	return(rows)
+
+
+## ----------------------------------------------------------------------
+def benchmarkCloning(counts=(10, 100, 1000), length=3):
+	'''
+	benchmarkCloning(counts=(10, 100, 1000), length=3):
+
+	Builds count identical SimpleFK chains with automatedBuild, once
+	building every module and once with clone=True, and compares build time
+	and node count.
+	'''
+
+	from . import automatedBuild
+
+	rows = []
+	for count in counts:
+		times = {}
+		for method in 'build', 'clone':
+			newScene()
+			roots = []
+			for index in range(count):
+				joints = makeTestChain('CLONE%04d_cn_' % index, length)
+				mc.move(0, 0, index * 2.0, joints[0])
+				## the token isn't part of the fingerprint, so these still clone
+				tagSimpleFK(joints[0], 'clone%04d' % index)
+				roots.append(joints[0])
+
+			before = countNodes()
+			seconds, instances = timed( automatedBuild.automatedBuild, *roots, clone=(method == 'clone') )
+			times[method] = seconds
+
+			rows.append( {
+				'copies':count,
+				'method':method,
+				'modules':len(instances),
+				'nodes':countNodes() - before,
+				'seconds':seconds,
+				'speedup':times['build'] / seconds if seconds > 0.0 else 0.0,
+			} )
+
+	printTable( 'Cloning (%d joints per chain)' % length, rows,
+		['copies', 'method', 'modules', 'nodes', 'seconds', 'speedup'] )
+
+	return(rows)
+
+
+## ----------------------------------------------------------------------
+def savedSize(fileType='mayaBinary'):
+	## saves the scene to a temp file and returns its size in bytes
+	handle, path = tempfile.mkstemp(suffix='.mb' if fileType == 'mayaBinary' else '.ma')
+	os.close(handle)
+	try:
+		mc.file(rename=path)
+		mc.file(save=True, force=True, type=fileType)
+		return( os.path.getsize(path) )
+	finally:
+		os.remove(path)
+
+
+## ----------------------------------------------------------------------
+def heapMegabytes():
+	try:
+		return( float( mc.memory(heapMemory=True, megaByte=True) ) )
+	except (RuntimeError, TypeError):
+		return(0.0)
+
+
+## ----------------------------------------------------------------------
+def benchmarkSharedShapes(modules=40, length=5):
+	'''
+	benchmarkSharedShapes(modules=40, length=5):
+
+	Builds a character's worth of SimpleFK modules with and without
+	sharedShapes and compares curve shape count, heap memory used by the
+	build and saved file size (.ma and .mb).
+	'''
+
+	rows = []
+	for shared in False, True:
+		newScene()
+		roots = []
+		for index in range(modules):
+			joints = makeTestChain('SHAPES%03d_cn_' % index, length)
+			mc.move(0, 0, index * 2.0, joints[0])
+			roots.append(joints[0])
+
+		heap = heapMegabytes()
+		seconds, instances = timed( lambda: [ buildSimpleFK(x, token='shapes%03d' % index, sharedShapes=shared, addControlToTip=True)
+			for index, x in enumerate(roots) ] )
+
+		rows.append( {
+			'shared':shared,
+			'controls':sum( x.numControls('fk') for x in instances ),
+			'curveShapes':countNodes('nurbsCurve'),
+			'heapMB':heapMegabytes() - heap,
+			'maBytes':savedSize('mayaAscii'),
+			'mbBytes':savedSize('mayaBinary'),
+			'seconds':seconds,
+		} )
+
+	printTable( 'Shared controller shapes (%d modules, %d joints)' % (modules, length), rows,
+		['shared', 'controls', 'curveShapes', 'heapMB', 'maBytes', 'mbBytes', 'seconds'] )
+
+	return(rows)
+
+
+## ----------------------------------------------------------------------
+def benchmarkBulkEdit(modules=20, length=5):
+	'''
+	benchmarkBulkEdit(modules=20, length=5):
+
+	Changes fkControllerColor on every module with editing.bulkEdit (an
+	appearance-only update) and compares it with the old way: setParam per
+	module followed by a full rebuild.
+	'''
+
+	from . import automatedBuild
+	from . import editing
+	from .modules import SimpleFK
+
+	rows = []
+	for method in 'rebuild', 'bulkEdit':
+		newScene()
+		roots = []
+		for index in range(modules):
+			joints = makeTestChain('EDIT%03d_cn_' % index, length)
+			mc.move(0, 0, index * 2.0, joints[0])
+			tagSimpleFK(joints[0], 'edit%03d' % index)
+			roots.append(joints[0])
+		automatedBuild.automatedBuild(*roots)
+
+		if method == 'rebuild':
+			def run():
+				for root in roots:
+					SimpleFK.SimpleFK.rehydrate(root).setParam('fkControllerColor', 'red', type='enum',
+						enumName=utils.colors.enumNames())
+				automatedBuild.automatedBuild(*roots, rebuild=True)
+		else:
+			def run():
+				editing.bulkEdit( {'fkControllerColor':'red'}, type='SimpleFK' )
+
+		seconds, result = timed(run)
+		rows.append( { 'method':method, 'modules':modules, 'seconds':seconds } )
+
+	printTable( 'Bulk edit: fkControllerColor (%d modules)' % modules, rows, ['method', 'modules', 'seconds'] )
+
+	return(rows)
+
+
+## ----------------------------------------------------------------------
+def benchmarkShapeUpdate(modules=20, length=5):
+	'''
+	benchmarkShapeUpdate(modules=20, length=5):
+
+	Changes the fk controller shape, scale and color of built modules with
+	ModuleBase.updateAppearance and reports the time per module. Checks that
+	control transforms and connection counts didn't change.
+	'''
+
+	from . import automatedBuild
+	from . import editing
+	from .modules import SimpleFK
+
+	newScene()
+	roots = []
+	for index in range(modules):
+		joints = makeTestChain('LOOK%03d_cn_' % index, length)
+		mc.move(0, 0, index * 2.0, joints[0])
+		tagSimpleFK(joints[0], 'look%03d' % index)
+		roots.append(joints[0])
+	instances = automatedBuild.automatedBuild(*roots)
+
+	controls = [ str(x) for instance in instances for x in instance._controllers['fk'] ]
+	rotate = dict( (x, (float(index), 0.0, 0.0)) for index, x in enumerate(controls) )
+	for control, value in rotate.items():
+		mc.setAttr(control+'.rotate', *value)
+
+	matrices = dict( (x, mc.xform(x, q=True, ws=True, m=True)) for x in controls )
+	connections = countConnections(controls)
+
+	editing.bulkEdit( { 'fkControllerType':'circle', 'fkControllerScale':2.0, 'fkControllerColor':'red' },
+		type='SimpleFK', apply=False )
+	seconds, result = timed( lambda: [ SimpleFK.SimpleFK.rehydrate(x).updateAppearance(['fk']) for x in roots ] )
+
+	moved = [ x for x in controls if max( abs(a - b) for a, b in
+		zip(matrices[x], mc.xform(x, q=True, ws=True, m=True)) ) > 1e-6 ]
+
+	rows = [ {
+		'modules':modules,
+		'controls':len(controls),
+		'seconds':seconds,
+		'msPerModule':1000.0 * seconds / max(1, modules),
+		'moved':len(moved),
+		'connectionsChanged':countConnections(controls) - connections,
+	} ]
+
+	printTable( 'Controller shape update (%d modules)' % modules, rows,
+		['modules', 'controls', 'seconds', 'msPerModule', 'moved', 'connectionsChanged'] )
+
+	return(rows)
+
+
+## ----------------------------------------------------------------------
+def benchmarkGraphHash(modules=50, length=10):
+	'''
+	benchmarkGraphHash(modules=50, length=10):
+
+	Captures and hashes a rig of SimpleFK modules with graph.captureRig and
+	checks that a second capture and a full rebuild hash the same, and that
+	changing one control shows up as a one-module diff.
+	'''
+
+	from . import automatedBuild
+	from . import graph
+	from .modules import SimpleFK
+
+	newScene()
+	roots = []
+	for index in range(modules):
+		joints = makeTestChain('HASH%03d_cn_' % index, length)
+		mc.move(0, 0, index * 2.0, joints[0])
+		tagSimpleFK(joints[0], 'hash%03d' % index)
+		roots.append(joints[0])
+	automatedBuild.automatedBuild(*roots)
+
+	nodes = countNodes()
+	seconds, first = timed( graph.captureRig )
+	second = graph.captureRig()
+
+	automatedBuild.automatedBuild(*roots, rebuild=True)
+	rebuilt = graph.captureRig()
+
+	control = str( SimpleFK.SimpleFK.rehydrate(roots[0]).getControl('fk', 0) )
+	mc.setAttr(control+'.overrideColor', 4)
+	changed = graph.captureRig()
+	diff = graph.diffRigs(rebuilt, changed)
+
+	rows = [ {
+		'modules':modules,
+		'nodes':nodes,
+		'seconds':seconds,
+		'repeatable':first['hash'] == second['hash'],
+		'rebuildSame':first['hash'] == rebuilt['hash'],
+		'diffModules':len(diff),
+	} ]
+
+	printTable( 'Graph hashing (%d modules, %d joints)' % (modules, length), rows,
+		['modules', 'nodes', 'seconds', 'repeatable', 'rebuildSame', 'diffModules'] )
+	print( graph.formatDiff(diff) )
+
+	return(rows)
+
+
+## ----------------------------------------------------------------------
+def benchmarkExport(modules=50, length=10):
+	'''
+	benchmarkExport(modules=50, length=10):
+
+	Exports a rig of SimpleFK modules with export.exportRig, then compares
+	reading every world matrix from the export (memory mapped and fully
+	loaded) against querying them from the scene with xform, and checks the
+	two agree.
+	'''
+
+	from . import automatedBuild
+	from . import export
+
+	newScene()
+	roots = []
+	for index in range(modules):
+		joints = makeTestChain('EXPORT%03d_cn_' % index, length)
+		mc.move(0, 0, index * 2.0, joints[0])
+		tagSimpleFK(joints[0], 'export%03d' % index)
+		roots.append(joints[0])
+	automatedBuild.automatedBuild(*roots)
+
+	path = tempfile.mkdtemp(prefix='witchExport')
+	exportSeconds, manifest = timed( export.exportRig, path )
+
+	def readScene():
+		data = export.load(path, mmap=False)
+		return( [ mc.xform(x, q=True, ws=True, m=True) for x in data['nodes.name'].tolist() ] )
+
+	def readExport(mmap):
+		data = export.load(path, mmap=mmap)
+		return( data['nodes.world'].sum() )
+
+	sceneSeconds, sceneMatrices = timed( readScene )
+	mmapSeconds, ignored = timed( readExport, True )
+	loadSeconds, ignored = timed( readExport, False )
+
+	data = export.load(path)
+	error = max( [0.0] + [ abs(a - b) for row, matrix in zip(data['nodes.world'], sceneMatrices)
+		for a, b in zip(row.flatten().tolist(), matrix) ] )
+	size = sum( os.path.getsize( os.path.join(path, x) ) for x in os.listdir(path) )
+
+	rows = [ {
+		'modules':modules,
+		'nodes':len(data['nodes.name']),
+		'bytes':size,
+		'export':exportSeconds,
+		'xform':sceneSeconds,
+		'mmap':mmapSeconds,
+		'load':loadSeconds,
+		'maxError':error,
+	} ]
+
+	printTable( 'Columnar export (%d modules, %d joints)' % (modules, length), rows,
+		['modules', 'nodes', 'bytes', 'export', 'xform', 'mmap', 'load', 'maxError'] )
+
+	return(rows)
+
+
+## ----------------------------------------------------------------------
+def benchmarkNodeCache(modules=50, length=5, repeats=5):
+	'''
+	benchmarkNodeCache(modules=50, length=5, repeats=5):
+
+	Reads the params of a set of tagged SimpleFK roots with getAttrSpecial,
+	once through the node cache and once with the cache emptied before
+	every call (the old one-PyNode-per-call behaviour), and reports the
+	cache's hit rate.
+	'''
+
+	from . import nodecache
+	from .modules import SimpleFK
+
+	newScene()
+	roots = []
+	for index in range(modules):
+		joints = makeTestChain('CACHE%03d_cn_' % index, length)
+		SimpleFK.SimpleFK(joints[0])
+		roots.append( str(joints[0]) )
+
+	params = [ 'type', 'token', 'side' ]
+	cache = nodecache.getCache()
+
+	def read(bump):
+		for repeat in range(repeats):
+			for root in roots:
+				for param in params:
+					if bump:
+						cache.bumpEpoch()
+					utils.getAttrSpecial(root, param, prefix=module_base.PARAM_PREFIX)
+
+	cache.bumpEpoch()
+	cache.resetStats()
+	cachedSeconds, ignored = timed( read, False )
+	stats = cache.stats()
+	uncachedSeconds, ignored = timed( read, True )
+
+	rows = [ {
+		'calls':repeats * len(roots) * len(params),
+		'cached':cachedSeconds,
+		'uncached':uncachedSeconds,
+		'speedup':uncachedSeconds / cachedSeconds if cachedSeconds else 0.0,
+		'hitRate':stats['hitRate'],
+	} ]
+
+	printTable( 'Node cache (%d roots, %d repeats)' % (modules, repeats), rows,
+		['calls', 'cached', 'uncached', 'speedup', 'hitRate'] )
+
+	return(rows)
+
+
+## ----------------------------------------------------------------------
+def benchmarkReseam(modules=300, length=3):
+	'''
+	benchmarkReseam(modules=300, length=3):
+
+	Builds a character of SimpleFK modules, each seamed to the last joint of
+	the one before, moves one module to a new parent and times reseaming
+	the whole character incrementally (automatedBuild.reseam) against
+	redoing every seam (force=True). Counts the constraint nodes that were
+	replaced both ways.
+	'''
+
+	from . import automatedBuild
+
+	newScene()
+	roots = []
+	ends = []
+	for index in range(modules):
+		joints = makeTestChain('SEAM%03d_cn_' % index, length)
+		mc.move(0, index * 0.5, 0, joints[0])
+		tagSimpleFK(joints[0], 'seam%03d' % index)
+		if len(ends):
+			utils.setParentAttr(joints[0], ends[-1], type='root')
+		roots.append(joints[0])
+		ends.append(joints[-1])
+	automatedBuild.automatedBuild(*roots)
+
+	def constraintNodes():
+		return( set( mc.ls(type=['constraint', 'multMatrix', 'decomposeMatrix']) ) )
+
+	unchangedSeconds, unchanged = timed( automatedBuild.reseam )
+
+	utils.setParentAttr(roots[modules // 2], ends[0], type='root')
+	before = constraintNodes()
+	incrementalSeconds, incremental = timed( automatedBuild.reseam )
+	incrementalNew = len( constraintNodes() - before )
+
+	before = constraintNodes()
+	forcedSeconds, forced = timed( automatedBuild.reseam, force=True )
+	forcedNew = len( constraintNodes() - before )
+
+	rows = [
+		{ 'pass':'unchanged', 'seconds':unchangedSeconds, 'seams':len(unchanged), 'newNodes':0 },
+		{ 'pass':'one limb', 'seconds':incrementalSeconds, 'seams':len(incremental), 'newNodes':incrementalNew },
+		{ 'pass':'force', 'seconds':forcedSeconds, 'seams':len(forced), 'newNodes':forcedNew },
+	]
+
+	printTable( 'Seam reconciliation (%d modules)' % modules, rows, ['pass', 'seconds', 'seams', 'newNodes'] )
+
+	return(rows)
+
+
+## ----------------------------------------------------------------------
+def benchmarkRetoken(modules=200, length=3):
+	'''
+	benchmarkRetoken(modules=200, length=3):
+
+	Builds SimpleFK modules on the left side, then moves every one of them
+	to the right side with retoken.retokenModules in one call, against
+	removing and rebuilding them with the new side. Checks that the
+	renames kept every connection.
+	'''
+
+	from . import automatedBuild
+	from . import retoken
+	from .modules import SimpleFK
+
+	newScene()
+	roots = []
+	for index in range(modules):
+		joints = makeTestChain('RETOKEN%03d_lf_' % index, length)
+		mc.move(0, 0, index * 2.0, joints[0])
+		instance = SimpleFK.SimpleFK(joints[0])
+		instance.setParam('token', 'limb%03d' % index)
+		roots.append(joints[0])
+	automatedBuild.automatedBuild(*roots)
+
+	before = countConnections( mc.ls(dag=True) )
+	seconds, report = timed( retoken.retokenModules, dict( (x, { 'side':'rt' }) for x in roots ) )
+	after = countConnections( mc.ls(dag=True) )
+	renamed = sum( len(x) for x in report.values() )
+	leftovers = len( [ x for x in mc.ls('*_LF_*', '*_lf_*') if not x.startswith('RETOKEN') ] )
+
+	rebuildSeconds, ignored = timed( automatedBuild.automatedBuild, *roots, rebuild=True )
+
+	rows = [ {
+		'modules':modules,
+		'renamed':renamed,
+		'retoken':seconds,
+		'rebuild':rebuildSeconds,
+		'connectionsKept':before == after,
+		'leftovers':leftovers,
+	} ]
+
+	printTable( 'Retoken (%d modules)' % modules, rows,
+		['modules', 'renamed', 'retoken', 'rebuild', 'connectionsKept', 'leftovers'] )
+
+	return(rows)
+
+
+## ----------------------------------------------------------------------
+def benchmarkOneBoneIK(count=200, frames=20):
+	'''
+	benchmarkOneBoneIK(count=200, frames=20):
+
+	Builds count OneBoneIK modules, and separately count two-joint chains
+	driven by single chain solver ikHandles, and compares the nodes each
+	setup adds and the time it takes to move every goal and read back
+	every tip, frames times over.
+	'''
+
+	from . import automatedBuild
+	from .modules import OneBoneIK
+
+	def evaluate(goals, tips):
+		for frame in range(frames):
+			for goal in goals:
+				mc.setAttr(goal+'.translateY', 0.1 * (frame % 5))
+			for tip in tips:
+				mc.xform(tip, q=True, ws=True, t=True)
+
+	## aim networks
+	newScene()
+	roots = []
+	for index in range(count):
+		joints = makeTestChain('PISTON%03d_cn_' % index, 2)
+		mc.move(0, 0, index * 2.0, joints[0])
+		## the default token would give every module the same MODULE name
+		OneBoneIK.OneBoneIK(joints[0]).setParam('token', 'piston%03d' % index, mirror=False, type='string')
+		roots.append(joints[0])
+	nodes = countNodes()
+	instances = automatedBuild.automatedBuild(*roots)
+	aimNodes = countNodes() - nodes
+	goals = [ str(x.getControl('ik', 0)) for x in instances ]
+	tips = [ str(x.chain[-1]) for x in instances ]
+	aimSeconds, ignored = timed( evaluate, goals, tips )
+
+	## ikHandles
+	newScene()
+	goals = []
+	tips = []
+	nodes = countNodes()
+	for index in range(count):
+		joints = makeTestChain('HANDLE%03d_cn_' % index, 2)
+		mc.move(0, 0, index * 2.0, joints[0])
+		handle = mc.ikHandle(sj=joints[0], ee=joints[1], solver='ikSCsolver')[0]
+		control = mc.createNode('transform', name='HANDLE%03d_CON' % index)
+		mc.xform(control, ws=True, t=mc.xform(joints[1], q=True, ws=True, t=True))
+		mc.parent(handle, control)
+		goals.append(control)
+		tips.append(joints[1])
+	handleNodes = countNodes() - nodes
+	handleSeconds, ignored = timed( evaluate, goals, tips )
+
+	rows = [
+		{ 'setup':'aimMatrix' if OneBoneIK.hasAimMatrix() else 'aimConstraint', 'nodes':aimNodes, 'seconds':aimSeconds },
+		{ 'setup':'ikHandle', 'nodes':handleNodes, 'seconds':handleSeconds },
+	]
+
+	printTable( 'One bone IK (%d chains, %d frames)' % (count, frames), rows, ['setup', 'nodes', 'seconds'] )
+
+	return(rows)
+
+
+## ----------------------------------------------------------------------
+def benchmarkSplineChain(length=500, controls=5):
+	'''
+	benchmarkSplineChain(length=500, controls=5):
+
+	Builds one long chain with SplineChain (controls controls) and the same
+	chain with SimpleFK (a control per joint), and compares build times,
+	node counts and control counts.
+	'''
+
+	from . import automatedBuild
+	from .modules import SimpleFK
+	from .modules import SplineChain
+
+	rows = []
+	for moduleClass in SplineChain.SplineChain, SimpleFK.SimpleFK:
+		newScene()
+		joints = makeTestChain('TAIL_cn_', length, spacing=0.2)
+		instance = moduleClass(joints[0])
+		if moduleClass is SplineChain.SplineChain:
+			instance.setParam('numControls', controls)
+		nodes = countNodes()
+		seconds, instances = timed( automatedBuild.automatedBuild, joints[0] )
+		rows.append( {
+			'module':moduleClass.__name__,
+			'joints':length,
+			'controls':sum( len(x) for x in instances[0]._controllers.values() ),
+			'nodes':countNodes() - nodes,
+			'seconds':seconds,
+		} )
+
+	printTable( 'Spline chain (%d joints)' % length, rows, ['module', 'joints', 'controls', 'nodes', 'seconds'] )
+
+	return(rows)
+
+
+## ----------------------------------------------------------------------
+def benchmarkFKEval(modules=20, length=10, samples=10, batch=10000):
+	'''
+	benchmarkFKEval(modules=20, length=10, samples=10, batch=10000):
+
+	Builds a character of SimpleFK modules, each seamed to the last joint of
+	the one before, captures it with fkeval and checks the evaluator
+	against the scene for samples random poses. Compares evaluating batch
+	poses with numpy against posing the scene and reading the joints back.
+	'''
+
+	from . import automatedBuild
+	from . import fkeval
+
+	newScene()
+	roots = []
+	parent = None
+	for index in range(modules):
+		## world level chains, joined only by their seams: under the one
+		## before, the first chain would take in every other
+		joints = makeTestChain('FKEVAL%03d_cn_' % index, length)
+		tagSimpleFK(joints[0], 'fkeval%03d' % index)
+		if parent is not None:
+			mc.xform(joints[0], ws=True, t=mc.xform(parent, q=True, ws=True, t=True))
+			utils.setParentAttr(joints[0], parent, type='root')
+		roots.append(joints[0])
+		parent = joints[-1]
+	automatedBuild.automatedBuild(*roots)
+
+	captureSeconds, rig = timed( fkeval.capture )
+	result = fkeval.verify(samples=samples, batch=batch)
+
+	## the same number of poses through the scene, for scale
+	free = [ '%s.rotate%s' % (x, y) for x in rig.controls for y in 'XYZ' if not mc.getAttr('%s.rotate%s' % (x, y), lock=True) ]
+	joints = [ name for node, name in rig.joints ]
+	def sceneEvaluate():
+		for sample in range(samples):
+			for plug in free:
+				mc.setAttr(plug, sample)
+			for joint in joints:
+				mc.xform(joint, q=True, ws=True, m=True)
+		for plug in free:
+			mc.setAttr(plug, 0.0)
+	sceneSeconds, ignored = timed( sceneEvaluate )
+
+	rows = [ {
+		'nodes':result['nodes'],
+		'controls':result['controls'],
+		'joints':result['joints'],
+		'capture':captureSeconds,
+		'posesPerSecond':result['posesPerSecond'],
+		'scenePosesPerSecond':samples / sceneSeconds if sceneSeconds else 0.0,
+		'maxError':result['maxError'],
+		'warnings':len(result['warnings']),
+	} ]
+
+	printTable( 'FK evaluation (%d modules, %d joints)' % (modules, length), rows,
+		['nodes', 'controls', 'joints', 'capture', 'posesPerSecond', 'scenePosesPerSecond', 'maxError', 'warnings'] )
+
+	return(rows)
+
+
+## ----------------------------------------------------------------------
+def makeCrowdCharacter(index, spine=1.0, arms=1.0, length=4):
+	## a spine with two arms, each a tagged SimpleFK seamed to the spine's
+	## end. The arms stay at world level: under the spine, its chain would
+	## take in their joints.
+	from .modules import SimpleFK
+
+	name = 'CHAR%03d' % index
+	spineJoints = makeTestChain('%s_spine_cn_' % name, length, spacing=spine, axis='y')
+	mc.move(index * 4.0, 0, 0, spineJoints[0])
+	instance = SimpleFK.SimpleFK(spineJoints[0])
+	instance.setParam('token', '%sSPINE' % name)
+
+	for side, direction in ('lf', 1.0), ('rt', -1.0):
+		armJoints = makeTestChain('%s_arm_%s_' % (name, side), length, spacing=arms * direction)
+		mc.xform(armJoints[0], ws=True, t=mc.xform(spineJoints[-1], q=True, ws=True, t=True))
+		instance = SimpleFK.SimpleFK(armJoints[0])
+		instance.setParam('token', '%sARM' % name)
+		utils.setParentAttr(armJoints[0], spineJoints[-1], type='root')
+
+	return(spineJoints[0])
+
+
+## ----------------------------------------------------------------------
+def benchmarkCrowd(characters=200, seed=3, tolerance=1e-3):
+	'''
+	benchmarkCrowd(characters=200, seed=3, tolerance=1e-3):
+
+	Builds characters with the same skeleton and modules but random
+	proportions, once with automatedBuild on every root and once with
+	crowd.buildCrowd, and compares build time, heap memory and node
+	count, and how far the crowd's variants' joints end up from where the
+	per-character build puts them. Raises a BenchmarkException if that's
+	more than tolerance.
+	'''
+
+	import random
+	from . import automatedBuild
+	from . import crowd
+
+	rows = []
+	positions = {}
+	for method in 'build', 'crowd':
+		newScene()
+		generator = random.Random(seed)
+		tops = [ makeCrowdCharacter( x, generator.uniform(0.8, 1.2), generator.uniform(0.8, 1.2) ) for x in range(characters) ]
+		roots = [ x for top in tops for x in crowd.characterRoots(top) ]
+
+		heap = heapMegabytes()
+		nodes = countNodes()
+		if method == 'build':
+			seconds, instances = timed( automatedBuild.automatedBuild, *roots )
+		else:
+			seconds, result = timed( crowd.buildCrowd, *tops )
+			instances = result['instances']
+
+		joints = [ x for top in tops for x in crowd.characterJoints(top) ]
+		positions[method] = [ mc.xform(x, q=True, ws=True, t=True) for x in joints ]
+
+		rows.append( {
+			'method':method,
+			'characters':characters,
+			'modules':len(instances),
+			'nodes':countNodes() - nodes,
+			'heapMB':heapMegabytes() - heap,
+			'seconds':seconds,
+		} )
+
+	error = max( [0.0] + [ abs(a - b) for x, y in zip(positions['build'], positions['crowd']) for a, b in zip(x, y) ] )
+	for row in rows:
+		row['speedup'] = rows[0]['seconds'] / row['seconds'] if row['seconds'] else 0.0
+		row['maxError'] = error
+
+	printTable( 'Crowd build (%d characters)' % characters, rows,
+		['method', 'characters', 'modules', 'nodes', 'heapMB', 'seconds', 'speedup', 'maxError'] )
+
+	if error > tolerance:
+		raise BenchmarkException('benchmarkCrowd: crowd joints are up to %g off the built ones (tolerance %g).' % (error, tolerance))
+
+	return(rows)
+
+
+## ----------------------------------------------------------------------
+def makeCreature(limbs=95, length=20, spine=100):
+	## a long spine with legs on both sides; limbs * length + spine joints
+	spineJoints = makeTestChain('creature_spine_cn_', spine, axis='z')
+	for index in range(limbs):
+		side = 'lf' if index % 2 == 0 else 'rt'
+		parent = spineJoints[ (index * spine) // limbs ]
+		legJoints = makeTestChain('creature_leg%02d_%s_' % (index, side), length, spacing=0.5 if side == 'lf' else -0.5, parent=parent)
+		mc.move(0, 0, mc.xform(parent, q=True, ws=True, t=True)[2], legJoints[0], ws=True)
+	return(spineJoints[0])
+
+
+## ----------------------------------------------------------------------
+def benchmarkTagging(limbs=95, length=20, spine=100):
+	'''
+	benchmarkTagging(limbs=95, length=20, spine=100):
+
+	Tags a creature (limbs legs of length joints on a spine; 2,000 joints
+	by default) with tagging.tagSkeleton from a rules file, and the same
+	roots the old way, one module instance per root. Tags it a second time
+	from the same file and counts the params that changed (should be 0).
+	'''
+
+	from . import editing
+	from . import tagging
+	from .modules import SimpleFK
+
+	rules = [
+		{ 'name':'legs', 'match':r'_leg(?P<number>\d+)_', 'type':'SimpleFK', 'sides':['lf', 'rt'],
+			'token':'leg{number}', 'params':{ 'fkControllerScale':0.5 }, 'seamRoot':True },
+		{ 'name':'spine', 'match':'_spine_', 'type':'SimpleFK', 'depth':0, 'token':'spine' },
+	]
+	path = os.path.join( tempfile.mkdtemp(prefix='witchTagging'), 'rules.json' )
+	tagging.saveRules(rules, path)
+
+	newScene()
+	makeCreature(limbs, length, spine)
+	joints = len( mc.ls(type='joint') )
+	tagging.paramTemplate('SimpleFK')
+
+	seconds, matches = timed( tagging.tagSkeleton, path )
+
+	## the same file again changes nothing
+	changed = 0
+	for match in tagging.resolveRules( tagging.loadRules(path) ):
+		values = dict( match['params'], type=match['type'], side=match['side'], token=match['token'] )
+		changed += len( editing.diffParams(match['root'], values) )
+
+	newScene()
+	makeCreature(limbs, length, spine)
+	## short names: each instance puts a rig root above its chain, which changes long names
+	roots = [ x['root'].rpartition('|')[2] for x in matches ]
+	instanceSeconds, ignored = timed( lambda: [ SimpleFK.SimpleFK(x) for x in roots ] )
+
+	rows = [
+		{ 'method':'tagSkeleton', 'joints':joints, 'roots':len(matches), 'seconds':seconds, 'changedOnRerun':changed },
+		{ 'method':'instances', 'joints':joints, 'roots':len(roots), 'seconds':instanceSeconds, 'changedOnRerun':'-' },
+	]
+
+	printTable( 'Rule based tagging (%d joints)' % joints, rows, ['method', 'joints', 'roots', 'seconds', 'changedOnRerun'] )
+
+	return(rows)
@@ -0,0 +1,168 @@
+import json
+import hashlib
+
+import maya
+from maya import cmds as mc
+import pymel.core as pm
+
+from . import utils
+from . import graph
+from .modules import module_base
+
+## ----------------------------------------------------------------------
+'''
+
+	CLONE.PY
+
+	Building repeated modules by copying one that's already built.
+
+	Fingers, tentacles and crowd props are often many chains with the same
+	module type, the same params and the same shape. Those roots share a
+	fingerprint (see fingerprint()); only the first of them has to go
+	through build(). The others get a copy of its node graph
+	(graph.cloneModule), renamed for their own token and chain, and moved
+	onto their chain by the offset between the two roots.
+
+	automatedBuild does this for you with clone=True.
+
+'''
+
+## ----------------------------------------------------------------------
+class CloneException(Exception):
+	pass
+
+## constants
+PRECISION = 4		## decimal places compared in the relative pose
+
+## params that don't change what a module builds, just what it's called
+IGNORED_PARAMS = [ 'token' ]
+
+## ----------------------------------------------------------------------
+def _params(root):
+	prefix = module_base.PARAM_PREFIX + '_'
+	results = {}
+	for attr in mc.listAttr(root, ud=True) or []:
+		if not attr.startswith(prefix) or attr.count('.'):
+			continue
+		name = attr[len(prefix):]
+		if name in IGNORED_PARAMS or name.endswith('Input'):
+			continue
+		plug = '%s.%s' % (root, attr)
+		attrType = mc.getAttr(plug, type=True)
+		if attrType == 'message':
+			continue
+		value = mc.getAttr(plug, asString=True) if attrType == 'enum' else mc.getAttr(plug)
+		if isinstance(value, float):
+			value = round(value, PRECISION)
+		elif isinstance(value, list):
+			value = [ [ round(y, PRECISION) for y in x ] if isinstance(x, tuple) else x for x in value ]
+		results[name] = value
+	return(results)
+
+
+## ----------------------------------------------------------------------
+def fingerprint(root):
+	'''
+	fingerprint(root):
+
+	Returns:
+
+	A hash of everything that decides what a module on this root builds:
+	its type and params (but not its token), the chain length and the pose
+	of the chain relative to its root. Roots with the same fingerprint build
+	the same rig, just in different places.
+	'''
+
+	root = str(root)
+	chain = [ str(x) for x in utils.getChain(pm.PyNode(root)) ]
+
+	data = {
+		'params':_params(root),
+		'length':len(chain),
+		'pose':[ [ round(x, PRECISION) + 0.0 for x in mc.xform(joint, q=True, os=True, m=True) ] for joint in chain[1:] ],
+	}
+
+	return( hashlib.sha1( json.dumps(data, sort_keys=True).encode('utf-8') ).hexdigest() )
+
+
+## ----------------------------------------------------------------------
+def groupByFingerprint(roots):
+	'''
+	Returns a list of root lists, one per fingerprint, in the order the
+	fingerprints were first found.
+	'''
+
+	order = []
+	groups = {}
+	for root in roots:
+		key = fingerprint(root)
+		if not key in groups:
+			groups[key] = []
+			order.append(key)
+		groups[key].append( str(root) )
+	return( [ groups[x] for x in order ] )
+
+
+## ----------------------------------------------------------------------
+def cloneModule(source, target, factory=None):
+	'''
+	cloneModule(source, target, factory=None):
+
+	Copies the module built on source onto target, which has to be tagged
+	with the same type and share its fingerprint. Names have the source's
+	token, side and chain names swapped for the target's. Seams aren't
+	copied; run seamRoot / seamGoal on the result.
+
+	Returns:
+
+	The target module instance (rehydrated).
+	'''
+
+	from . import moduleFactory
+	factory = factory or moduleFactory.ModuleFactory()
+
+	source = str(source)
+	target = str(target)
+
+	module = graph.moduleOf(source)
+	if module is None:
+		raise CloneException('cloneModule: %s is not built.' % source)
+	if graph.moduleOf(target) is not None:
+		raise CloneException('cloneModule: %s is already built.' % target)
+
+	moduleType = utils.getAttrSpecial(source, 'type', prefix=module_base.PARAM_PREFIX)
+	moduleClass = factory.getClass(moduleType)
+
+	sourceChain = [ str(x) for x in utils.getChain(pm.PyNode(source)) ]
+	targetChain = [ str(x) for x in utils.getChain(pm.PyNode(target)) ]
+
+	table = dict( zip( [ x.rpartition('|')[2] for x in sourceChain ], [ x.rpartition('|')[2] for x in targetChain ] ) )
+	for key in 'token', 'side':
+		old = utils.getAttrSpecial(source, key, prefix=module_base.PARAM_PREFIX)
+		new = utils.getAttrSpecial(target, key, prefix=module_base.PARAM_PREFIX)
+		if old and new and not old == new:
+			for convert in str.upper, str.lower:
+				table[ '%s_' % convert(str(old)) ] = '%s_' % convert(str(new))
+
+	## everything that isn't parented into the target's hierarchy moves by
+	## the offset between the two roots
+	delta = utils.multMatrix( utils.inverseMatrix( utils.worldMatrix(source, scale=False) ),
+		utils.worldMatrix(target, scale=False) )
+
+	owned = graph.ownedNodes(module)
+	clones = graph.cloneModule( module, targetChain, rename=lambda x: graph.replaceAll(x, table) )
+
+	top = clones[owned['module']]
+	mc.xform( str(top), ws=True, m=utils.multMatrix( mc.xform(str(top), q=True, ws=True, m=True), delta ) )
+	for node in owned['dag'][1:]:
+		name = str(clones[node])
+		if mc.ls(name, type='transform') and not mc.getAttr(name+'.inheritsTransform'):
+			mc.xform( name, os=True, m=utils.multMatrix( mc.xform(name, q=True, os=True, m=True), delta ) )
+
+	instance = moduleClass.rehydrate(target)
+
+	## seams belong to the source's parents-- they're redone by the caller
+	for key, node in instance._inputs.items():
+		utils.removeConstraints(node)
+
+	return(instance)
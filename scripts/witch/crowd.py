@@ -0,0 +1,257 @@
+import json
+import hashlib
+
+import maya
+from maya import cmds as mc
+
+from . import utils
+from . import graph
+from . import descriptors
+from . import clone as cloning
+from .modules import module_base
+
+## ----------------------------------------------------------------------
+'''
+
+	CROWD.PY
+
+	Building crowds: many characters with the same skeleton and modules
+	that differ only in proportions.
+
+	Characters (top joints of whole skeletons) are grouped by a fingerprint
+	of their joint hierarchy and module tags (characterFingerprint), which,
+	unlike clone.fingerprint, leaves the rest pose out. Each group's first
+	character is built with automatedBuild. Every other character in the
+	group gets a copy of each of its modules (clone.cloneModule), which is
+	then fitted to the variant's own rest pose (fitRest): every transform
+	the module owns that isn't driven by something else keeps its offset
+	to the nearest joint of the chain it was built on.
+
+	Variants are copies, not references: a referenced rig can't drive the
+	variant's own bind joints.
+
+	Module types in REBUILT_TYPES bake rest lengths into their DG nodes
+	(stretch), so fitting transforms isn't enough; those modules are built
+	on every character.
+
+'''
+
+## ----------------------------------------------------------------------
+class CrowdException(Exception):
+	pass
+
+## module types that are built for every variant
+REBUILT_TYPES = [ 'OneBoneIK', 'SplineChain' ]
+
+## ----------------------------------------------------------------------
+def characterJoints(top):
+	## the character's joints (long names), depth first in child order
+	results = []
+	pending = mc.ls(str(top), long=True, type='joint')
+	while len(pending):
+		joint = pending.pop()
+		results.append(joint)
+		pending += (mc.listRelatives(joint, c=True, type='joint', f=True) or [])[::-1]
+	return(results)
+
+
+## ----------------------------------------------------------------------
+def characterRoots(top):
+	## the tagged module roots of a character, in joint order
+	return( [ x.root for x in descriptors.scanRoots( characterJoints(top) ) ] )
+
+
+## ----------------------------------------------------------------------
+def characterFingerprint(top):
+	'''
+	characterFingerprint(top):
+
+	Returns:
+
+	A hash of the character's joint hierarchy (as parent indices) and, for
+	every tagged root in it, its position, module type, params (but not
+	token, see clone._params) and seam parents. The rest pose is left out:
+	characters with the same fingerprint differ only in proportions.
+	'''
+
+	joints = characterJoints(top)
+	index = dict( (name, position) for position, name in enumerate(joints) )
+
+	parents = []
+	for joint in joints:
+		parent = mc.listRelatives(joint, p=True, f=True)
+		parents.append( index.get(parent[0], -1) if parent else -1 )
+
+	modules = []
+	for item in descriptors.scanRoots(joints):
+		root = mc.ls(item.root, long=True)[0]
+		seams = dict( (seam, index.get( mc.ls(parent, long=True)[0], -1 )) for seam, parent in item.parents )
+		modules.append( {
+			'root':index[root],
+			'type':item.type,
+			'params':cloning._params(root),
+			'seams':seams,
+		} )
+
+	data = { 'parents':parents, 'modules':modules }
+	return( hashlib.sha1( json.dumps(data, sort_keys=True).encode('utf-8') ).hexdigest() )
+
+
+## ----------------------------------------------------------------------
+def groupCharacters(tops):
+	'''
+	Returns a list of character lists, one per characterFingerprint, in
+	the order the fingerprints were first found.
+	'''
+
+	order = []
+	groups = {}
+	for top in tops:
+		key = characterFingerprint(top)
+		if not key in groups:
+			groups[key] = []
+			order.append(key)
+		groups[key].append( str(top) )
+	return( [ groups[x] for x in order ] )
+
+
+## ----------------------------------------------------------------------
+def _driven(node):
+	## constrained, or with anything connected into its transform channels
+	if len(utils.listConstraints(node)):
+		return(True)
+	channels = ( 'translate', 'rotate', 'scale', 'offsetParentMatrix', 'jointOrient' )
+	for plug in (mc.listConnections(node, s=True, d=False, p=True, c=True) or [])[::2]:
+		if plug.partition('.')[2].startswith(channels):
+			return(True)
+	return(False)
+
+
+## ----------------------------------------------------------------------
+def fitRest(instance, sourceMatrices, targetMatrices):
+	'''
+	fitRest(instance, sourceMatrices, targetMatrices):
+
+	Fits a module copied onto a variant to the variant's rest pose.
+	sourceMatrices are the world matrices of the chain it was copied from,
+	targetMatrices those of the variant's chain (both read before the copy
+	was made). Every undriven transform under the module node keeps the
+	offset to its nearest chain joint it had before anything was moved;
+	they're written parents first.
+
+	Returns:
+
+	The number of transforms moved.
+	'''
+
+	## cloneModule already moved the copy by the offset between the roots
+	delta = utils.multMatrix( utils.inverseMatrix( _rigid(sourceMatrices[0]) ), _rigid(targetMatrices[0]) )
+	moved = [ utils.multMatrix(x, delta) for x in sourceMatrices ]
+
+	owned = graph.ownedNodes(instance.module)
+	nodes = sorted( mc.ls(owned['dag'], type='transform', long=True), key=lambda x: x.count('|') )
+
+	## every offset is read before anything moves: moving a parent first
+	## would carry its children along, and they'd get its correction twice
+	fits = []
+	for node in nodes:
+		if _driven(node):
+			continue
+		world = mc.xform(node, q=True, ws=True, m=True)
+		nearest = min( range(len(moved)), key=lambda x: sum( (a - b) ** 2 for a, b in zip(world[12:15], moved[x][12:15]) ) )
+		fits.append( (node, utils.multMatrix( world, utils.inverseMatrix(moved[nearest]) ), nearest) )
+
+	for node, offset, nearest in fits:
+		mc.xform( node, ws=True, m=utils.multMatrix(offset, targetMatrices[nearest]) )
+
+	return( len(fits) )
+
+
+## ----------------------------------------------------------------------
+def _rigid(matrix):
+	## a flat matrix with its axes normalized (utils.worldMatrix's scale=False)
+	result = list(matrix)
+	for row in range(3):
+		length = sum( x * x for x in result[row*4:row*4+3] ) ** 0.5
+		if length > 0.0:
+			for column in range(3):
+				result[row*4+column] /= length
+	return(result)
+
+
+## ----------------------------------------------------------------------
+def _chainMatrices(root):
+	return( [ mc.xform(str(x), q=True, ws=True, m=True) for x in utils.getChain( utils.resolveNode(root) ) ] )
+
+
+## ----------------------------------------------------------------------
+def buildCrowd(*args, **kwargs):
+	'''
+	buildCrowd(*tops, plan=True):
+
+	Builds a crowd from the given characters (top joints): one full build
+	per group of matching characters (see groupCharacters), copies of its
+	modules for the rest, fitted to each variant's rest pose. Module types
+	in REBUILT_TYPES are built on every character. Characters have to be
+	unbuilt.
+
+	Returns:
+
+	A dict with the module instances ('instances'), the character groups
+	('groups') and how many modules were built ('built') and copied
+	('cloned').
+	'''
+
+	from . import automatedBuild
+	from . import moduleFactory
+
+	plan = kwargs.get('plan', True)
+	factory = moduleFactory.ModuleFactory()
+
+	tops = [ str(x) for x in utils.makeList(args, type='joint') ]
+	groups = groupCharacters(tops)
+
+	print( ">> Crowd: %d character(s), %d group(s)" % (len(tops), len(groups)) )
+
+	## what gets built and what gets copied
+	build = []
+	copies = []
+	for group in groups:
+		sources = characterRoots(group[0])
+		for root in sources:
+			if graph.moduleOf(root) is not None:
+				raise CrowdException('buildCrowd: %s is already built.' % root)
+		build += sources
+		for variant in group[1:]:
+			targets = characterRoots(variant)
+			for source, target in zip(sources, targets):
+				if graph.moduleOf(target) is not None:
+					raise CrowdException('buildCrowd: %s is already built.' % target)
+				moduleType = utils.getAttrSpecial(target, 'type', prefix=module_base.PARAM_PREFIX)
+				if moduleType in REBUILT_TYPES:
+					build.append(target)
+				else:
+					copies.append( (source, target) )
+
+	instances = automatedBuild.automatedBuild( *build, plan=plan )
+
+	print( ">> Crowd: Copying %d module(s)..." % len(copies) )
+	sourceMatrices = {}
+	cloned = []
+	for source, target in copies:
+		if not source in sourceMatrices:
+			sourceMatrices[source] = _chainMatrices(source)
+		targetMatrices = _chainMatrices(target)
+
+		instance = cloning.cloneModule(source, target, factory)
+		fitRest(instance, sourceMatrices[source], targetMatrices)
+		instance.postbuild()
+		cloned.append(instance)
+
+	print( ">> Crowd: Seaming..." )
+	changed = module_base.reconcileSeams(cloned)
+	print( "\t++ %d seam(s) made or redone" % len(changed) )
+
+	print( "++ Crowd: Build complete (%d built, %d copied)" % (len(instances), len(cloned)) )
+
+	return( { 'instances':instances + cloned, 'groups':groups, 'built':len(instances), 'cloned':len(cloned) } )
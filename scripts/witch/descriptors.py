@@ -0,0 +1,178 @@
+import maya
+from maya import cmds as mc
+from maya import OpenMaya as om
+
+from .modules import module_base
+
+## ----------------------------------------------------------------------
+'''
+
+	DESCRIPTORS.PY
+
+	Lightweight, read-only descriptions of tagged module roots.
+
+	Deciding what to build doesn't need a full ModuleBase instance per root
+	(with its PyNodes and the scene writes in its constructor). A
+	ModuleDescriptor holds only plain strings and tuples, uses __slots__, and
+	is filled by scanRoots() straight from the API in one pass over the
+	roots. Turn it into a real module with instantiate() (or rehydrate()
+	for built modules) only when that module actually needs it.
+
+'''
+
+## ----------------------------------------------------------------------
+class DescriptorException(Exception):
+	pass
+
+## ----------------------------------------------------------------------
+class ModuleDescriptor(object):
+	__slots__ = ( 'root', 'type', 'token', 'side', 'chain', 'module', 'parents' )
+
+	def __init__(self, root, type=None, token=None, side=None, chain=(), module=None, parents=()):
+		self.root = root
+		self.type = type
+		self.token = token
+		self.side = side
+		self.chain = tuple(chain)
+		self.module = module
+		self.parents = tuple(parents)		## ( (seam, node), ... )
+
+	def __str__(self):
+		return( "<< Witch Module Descriptor: %s %s_%s (%s, %d joint%s%s)." % (self.type, self.token, self.side,
+			self.root, len(self.chain), '' if len(self.chain) == 1 else 's', ', built' if self.built else '') )
+
+	def __repr__(self):
+		return( self.__str__() )
+
+	@property ## readonly
+	def built(self):
+		return( self.module is not None )
+
+	def parent(self, seam):
+		for key, node in self.parents:
+			if key == seam:
+				return(node)
+		return(None)
+
+	def instantiate(self, factory=None):
+		## full module instance-- this is where the scene writes happen
+		from . import moduleFactory
+		factory = factory or moduleFactory.ModuleFactory()
+		return( factory.getClass(self.type)(self.root) )
+
+	def rehydrate(self, factory=None):
+		## read-only instance of the built module
+		if not self.built:
+			raise DescriptorException('rehydrate: %s is not built.' % self.root)
+		from . import moduleFactory
+		factory = factory or moduleFactory.ModuleFactory()
+		return( factory.getClass(self.type).rehydrate(self.root) )
+
+
+## ----------------------------------------------------------------------
+def _findPlug(fn, attr):
+	try:
+		return( fn.findPlug(attr, False) )
+	except RuntimeError:
+		return(None)
+
+
+## ----------------------------------------------------------------------
+def _sources(plug):
+	if plug is None:
+		return([])
+	plugs = om.MPlugArray()
+	plug.connectedTo(plugs, True, False)
+	results = []
+	for index in range(plugs.length()):
+		node = plugs[index].node()
+		if node.hasFn(om.MFn.kDagNode):
+			results.append( om.MFnDagNode(node).partialPathName() )
+		else:
+			results.append( om.MFnDependencyNode(node).name() )
+	return(results)
+
+
+## ----------------------------------------------------------------------
+def _asString(plug):
+	## enum params come back by field name, like getAttrSpecial does
+	if plug.attribute().hasFn(om.MFn.kEnumAttribute):
+		return( str( om.MFnEnumAttribute( plug.attribute() ).fieldName( plug.asShort() ) ) )
+	return( str(plug.asString()) )
+
+
+## ----------------------------------------------------------------------
+def findRoots():
+	## every tagged root in the scene
+	return( mc.ls('*.MODULEROOT', '*:*.MODULEROOT', o=True, type='joint') or [] )
+
+
+## ----------------------------------------------------------------------
+def scanRoots(roots=None):
+	'''
+	scanRoots(roots=None):
+
+	Describes the given roots (every tagged root in the scene if None).
+	Everything is read through the API in one pass: no PyNodes, no module
+	instances and no scene writes.
+
+	Returns:
+
+	A list of ModuleDescriptors, in the order of roots. Untagged objects are
+	skipped.
+	'''
+
+	if roots is None:
+		roots = findRoots()
+
+	selection = om.MSelectionList()
+	for root in roots:
+		selection.add( str(root) )
+
+	prefix = module_base.PARAM_PREFIX + '_'
+
+	results = []
+	obj = om.MObject()
+	for index in range(selection.length()):
+		selection.getDependNode(index, obj)
+		if not obj.hasFn(om.MFn.kTransform):
+			continue
+
+		dag = om.MFnDagNode(obj)
+		name = dag.partialPathName()
+
+		typePlug = _findPlug(dag, prefix+'type')
+		if typePlug is None:
+			continue
+
+		token = _findPlug(dag, prefix+'token')
+		side = _findPlug(dag, prefix+'side')
+		modules = _sources( _findPlug(dag, 'module') )
+
+		parents = []
+		for seam in 'root', 'goal':
+			found = _sources( _findPlug(dag, 'parent_'+seam) )
+			if len(found):
+				parents.append( (seam, found[0]) )
+
+		## first-child chain, as utils.getChain walks it
+		chain = [ name ]
+		walker = om.MFnDagNode(obj)
+		while walker.childCount():
+			child = walker.child(0)
+			if not child.hasFn(om.MFn.kTransform):
+				break
+			walker.setObject(child)
+			chain.append( walker.partialPathName() )
+
+		results.append( ModuleDescriptor(
+			name,
+			type=_asString(typePlug),
+			token=None if token is None else _asString(token),
+			side=None if side is None else _asString(side),
+			chain=chain,
+			module=modules[0] if len(modules) else None,
+			parents=parents,
+		) )
+
+	return(results)
@@ -0,0 +1,270 @@
+import fnmatch
+
+import maya
+from maya import cmds as mc
+
+from . import utils
+from . import descriptors
+from .modules import module_base
+
+## ----------------------------------------------------------------------
+'''
+
+	EDITING.PY
+
+	Bulk param edits across modules.
+
+	bulkEdit() picks modules with a selector (type, token, side, namespace
+	or an explicit list of roots), writes the changed params in one undo
+	chunk and then redoes only the build phases those params affect:
+
+	appearance:	controller look: shape, scale, orientation and color (see
+				ModuleBase.updateAppearance). Done in place on the existing
+				controls.
+
+	seams:		seam parents (parent_root / parent_goal). The module's seams
+				are redone.
+
+	structure:	anything else. The module is rebuilt.
+
+	The param -> phase mapping is PHASE_RULES (first match wins); params
+	that don't match any rule are structural.
+
+	Mirrored modules (see symmetry.py) get the same edits as their partner,
+	the way ModuleBase.setParam handles it, with seam parents swapped for
+	the other side's (symmetry.mirrorName).
+
+	*ControllerSubColor isn't an appearance param: updateAppearance has
+	nothing to apply it to, so it goes through a rebuild.
+
+'''
+
+## ----------------------------------------------------------------------
+class EditingException(Exception):
+	pass
+
+## phases, cheapest first
+APPEARANCE = 'appearance'
+SEAMS = 'seams'
+STRUCTURE = 'structure'
+PHASES = [ APPEARANCE, SEAMS, STRUCTURE ]
+
+PHASE_RULES = [
+	( '*ControllerType', APPEARANCE ),
+	( '*ControllerColor', APPEARANCE ),
+	( '*ControllerScale', APPEARANCE ),
+	( '*ControllerAim', APPEARANCE ),
+	( '*ControllerUp', APPEARANCE ),
+	( '*ControllerTranslation', APPEARANCE ),
+	( '*ControllerRotation', APPEARANCE ),
+	( 'parent_*', SEAMS ),
+]
+
+## ----------------------------------------------------------------------
+def paramPhase(param):
+	for pattern, phase in PHASE_RULES:
+		if fnmatch.fnmatchcase(param, pattern):
+			return(phase)
+	return(STRUCTURE)
+
+
+## ----------------------------------------------------------------------
+def select(type=None, token=None, side=None, namespace=None, roots=None):
+	'''
+	select(type=None, token=None, side=None, namespace=None, roots=None):
+
+	Returns the descriptors of the module roots matching every given
+	criterion. type and token take wildcards; namespace matches roots in that
+	namespace (or below it).
+	'''
+
+	results = []
+	for item in descriptors.scanRoots(roots):
+		if type is not None and not fnmatch.fnmatchcase(item.type or '', type):
+			continue
+		if token is not None and not fnmatch.fnmatchcase(item.token or '', token):
+			continue
+		if side is not None and not item.side == side:
+			continue
+		if namespace is not None and not item.root.startswith(namespace.rstrip(':') + ':'):
+			continue
+		results.append(item)
+	return(results)
+
+
+## ----------------------------------------------------------------------
+def _currentValue(root, attr):
+	plug = '%s.%s' % (root, attr)
+	attrType = mc.getAttr(plug, type=True)
+	if attrType == 'enum':
+		return( (attrType, mc.getAttr(plug, asString=True)) )
+	value = mc.getAttr(plug)
+	if isinstance(value, list) and len(value) == 1 and isinstance(value[0], tuple):
+		value = list(value[0])
+	return( (attrType, value) )
+
+
+## ----------------------------------------------------------------------
+def _sameValue(a, b, tolerance=1e-6):
+	if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+		return( len(a) == len(b) and all( _sameValue(x, y, tolerance) for x, y in zip(a, b) ) )
+	if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+		return( abs(a - b) <= tolerance )
+	return( a == b )
+
+
+## ----------------------------------------------------------------------
+def _writeParam(root, attr, attrType, value):
+	plug = '%s.%s' % (root, attr)
+	if attrType == 'enum' and not isinstance(value, int):
+		## fields come back as 'a:b:c' or with explicit indices, 'a=0:b=4'
+		fields = {}
+		index = 0
+		for field in mc.attributeQuery(attr, node=root, listEnum=True)[0].split(':'):
+			name, equals, number = field.partition('=')
+			index = int(number) if equals else index
+			fields[name] = index
+			index += 1
+		if not value in fields:
+			raise EditingException("%s: '%s' is not one of %s." % (plug, value, ', '.join(sorted(fields))))
+		value = fields[value]
+	if attrType == 'string':
+		mc.setAttr(plug, str(value), type='string')
+	elif isinstance(value, (list, tuple)):
+		mc.setAttr(plug, *value)
+	else:
+		mc.setAttr(plug, value)
+
+
+## ----------------------------------------------------------------------
+def diffParams(root, changes):
+	'''
+	diffParams(root, changes):
+
+	Returns:
+
+	A dict of param -> (old value, new value) for the changes that would
+	actually change something on root. parent_* keys compare the seam parent.
+	'''
+
+	prefix = module_base.PARAM_PREFIX + '_'
+	results = {}
+	for param, value in changes.items():
+		if param.startswith('parent_'):
+			seam = param[len('parent_'):]
+			old = utils.getParentAttr(root, seam)
+			old = None if old is None else str(old)
+			new = None if value is None else str(value)
+			if not old == new:
+				results[param] = (old, new)
+			continue
+
+		if param.endswith('Input'):
+			raise EditingException('diffParams: %s is set by the build, not by hand.' % param)
+		if not mc.attributeQuery(prefix+param, node=root, exists=True):
+			raise EditingException('diffParams: %s has no param %s.' % (root, param))
+
+		attrType, old = _currentValue(root, prefix+param)
+		if not _sameValue(old, value):
+			results[param] = (old, value)
+
+	return(results)
+
+
+## ----------------------------------------------------------------------
+def writeParams(root, diff):
+	## writes a diffParams result
+	prefix = module_base.PARAM_PREFIX + '_'
+	for param, (old, new) in sorted(diff.items()):
+		if param.startswith('parent_'):
+			seam = param[len('parent_'):]
+			if new is None:
+				utils.removeParentAttr(root, type=seam)
+			else:
+				utils.setParentAttr(root, new, type=seam)
+			continue
+		locked = mc.getAttr('%s.%s' % (root, prefix+param), lock=True)
+		if locked:
+			mc.setAttr('%s.%s' % (root, prefix+param), lock=False)
+		_writeParam(root, prefix+param, mc.getAttr('%s.%s' % (root, prefix+param), type=True), new)
+		if locked:
+			mc.setAttr('%s.%s' % (root, prefix+param), lock=True)
+
+
+## ----------------------------------------------------------------------
+def bulkEdit(changes, apply=True, factory=None, **selector):
+	'''
+	bulkEdit(changes, apply=True, factory=None, **selector):
+
+	Sets the params in changes (a dict of param -> value) on every module
+	matching the selector (see select), then reruns the affected phases of
+	the built ones (see the file docstring). With apply=False the params are
+	written but nothing is rebuilt.
+
+	Returns:
+
+	A dict of root -> { 'changed':diffParams result, 'phases':[...] } for
+	every root that changed.
+	'''
+
+	from . import moduleFactory
+	from . import automatedBuild
+	from . import symmetry
+
+	factory = factory or moduleFactory.ModuleFactory()
+
+	items = select(**selector)
+	byRoot = dict( (x.root, x) for x in items )
+	selected = set(byRoot)
+
+	## mirror partners follow along, minus the per-side params
+	partnerChanges = dict( (key, value) for key, value in changes.items() if not key in module_base.MIRROR_SKIP_PARAMS )
+	for key, value in list(partnerChanges.items()):
+		## seam parents are swapped for their other side, as mirrorBuild does
+		if key.startswith('parent_') and value is not None:
+			mirrored = symmetry.mirrorName( str(value) )
+			partnerChanges[key] = mirrored if mc.objExists(mirrored) else value
+	for item in list(items):
+		partner = module_base.mirrorPartnerOf(item.root)
+		if partner is not None and not partner in byRoot:
+			for found in descriptors.scanRoots([partner]):
+				byRoot[found.root] = found
+				items.append(found)
+
+	report = {}
+	mc.undoInfo(openChunk=True)
+	try:
+		for item in items:
+			diff = diffParams(item.root, changes if item.root in selected else partnerChanges)
+			if not len(diff):
+				continue
+			writeParams(item.root, diff)
+			phases = sorted( set( paramPhase(x) for x in diff ), key=PHASES.index )
+			report[item.root] = { 'changed':diff, 'phases':phases }
+	finally:
+		mc.undoInfo(closeChunk=True)
+
+	if not apply:
+		return(report)
+
+	rebuild = []
+	for root, entry in sorted(report.items()):
+		item = byRoot[root]
+		if not item.built:
+			continue
+		if STRUCTURE in entry['phases']:
+			rebuild.append(root)
+			continue
+
+		instance = item.rehydrate(factory)
+		if APPEARANCE in entry['phases']:
+			categories = sorted( set( x.partition('Controller')[0] for x in entry['changed'] if paramPhase(x) == APPEARANCE ) )
+			instance.updateAppearance(categories)
+		if SEAMS in entry['phases']:
+			instance.seamRoot()
+			instance.seamGoal()
+
+	if len(rebuild):
+		automatedBuild.automatedBuild(*rebuild, rebuild=True)
+
+	return(report)
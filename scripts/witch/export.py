@@ -0,0 +1,327 @@
+import os
+import json
+
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
+## ----------------------------------------------------------------------
+'''
+
+	EXPORT.PY
+
+	Columnar export of a character's rig rest data for pipeline tools.
+
+	exportRig() walks the built modules once (bind chains, controls by
+	category, inputs, WT_ params) and writes one .npy file per column into a
+	directory, plus a manifest.json listing the columns. .npy files (unlike
+	.npz archives) can be memory mapped, so load() gives back arrays that
+	are read from disk lazily: opening a character costs a manifest read.
+
+	Columns:
+
+	nodes.name				(N,) unicode		short names
+	nodes.kind				(N,) int8			KIND_JOINT, KIND_CONTROL, KIND_INPUT or KIND_ZERO
+	nodes.module			(N,) int32			index into modules.*
+	nodes.parent			(N,) int32			index of the DAG parent, -1 if not exported
+	nodes.category			(N,) int16			index into categories.name, -1 if not a control / zero
+	nodes.index				(N,) int32			chain / control index within its module (a zero has its control's)
+	nodes.local				(N,4,4) float64		local matrices (Maya row vector layout)
+	nodes.world				(N,4,4) float64		world matrices
+	nodes.defaultTranslate	(N,3) float64		poseMark's default_* pose, NaN if not marked
+	nodes.defaultRotate		(N,4) float64		quaternion x, y, z, w
+	nodes.defaultScale		(N,3) float64
+	modules.name			(M,) unicode		MODULE node names
+	modules.type, .token, .side (M,) unicode
+	modules.root			(M,) int32			node index of the chain root
+	modules.firstNode		(M,) int32			nodes of module i are firstNode[i]:firstNode[i]+nodeCount[i]
+	modules.nodeCount		(M,) int32
+	categories.name			(C,) unicode
+	params.numericNames		(P,) unicode		float3 params are split into name.x / .y / .z
+	params.numeric			(M,P) float64		NaN where a module doesn't have the param
+	params.stringNames		(Q,) unicode		string and enum params
+	params.string			(M,Q) unicode		'' where a module doesn't have the param
+
+	Needs numpy.
+
+'''
+
+## ----------------------------------------------------------------------
+class ExportException(Exception):
+	pass
+
+## constants
+FORMAT_VERSION = 2
+KIND_JOINT = 0
+KIND_CONTROL = 1
+KIND_INPUT = 2
+KIND_ZERO = 3
+
+## ----------------------------------------------------------------------
+def _requireNumpy():
+	if np is None:
+		raise ExportException('numpy is not available.')
+
+
+## ----------------------------------------------------------------------
+def _strings(items):
+	## fixed width unicode, so the column can be memory mapped
+	return( np.array( [ u'%s' % x for x in items ], dtype='U%d' % max( [1] + [ len(u'%s' % x) for x in items ] ) ) )
+
+
+## ----------------------------------------------------------------------
+def _moduleParams(root):
+	from maya import cmds as mc
+	from .modules import module_base
+
+	prefix = module_base.PARAM_PREFIX + '_'
+	numeric = {}
+	strings = {}
+	for attr in mc.listAttr(root, ud=True) or []:
+		if not attr.startswith(prefix) or attr.count('.'):
+			continue
+		name = attr[len(prefix):]
+		plug = '%s.%s' % (root, attr)
+		attrType = mc.getAttr(plug, type=True)
+		if attrType == 'message':
+			continue
+		elif attrType in ('string', 'enum'):
+			strings[name] = mc.getAttr(plug, asString=True) if attrType == 'enum' else (mc.getAttr(plug) or '')
+		elif attrType in ('float3', 'double3'):
+			for axis, value in zip('xyz', mc.getAttr(plug)[0]):
+				numeric['%s.%s' % (name, axis)] = float(value)
+		else:
+			try:
+				numeric[name] = float( mc.getAttr(plug) )
+			except (TypeError, ValueError):
+				continue
+	return( (numeric, strings) )
+
+
+## ----------------------------------------------------------------------
+def _defaultPose(node):
+	from maya import cmds as mc
+
+	results = []
+	for attr, size in ('default_translation', 3), ('default_rotationV', 3), ('default_rotationW', 1), ('default_scale', 3):
+		if not mc.attributeQuery(attr, node=node, exists=True):
+			results.append( [float('nan')] * size )
+			continue
+		value = mc.getAttr('%s.%s' % (node, attr))
+		results.append( list(value[0]) if isinstance(value, list) else [value] )
+	translate, rotateV, rotateW, scale = results
+	return( (translate, rotateV + rotateW, scale) )
+
+
+## ----------------------------------------------------------------------
+def collectRig(roots=None, factory=None):
+	'''
+	collectRig(roots=None, factory=None):
+
+	Reads the rest data of the built modules on the given roots (every
+	built module if None).
+
+	Returns:
+
+	A dict of column name -> numpy array (see the file docstring).
+	'''
+
+	_requireNumpy()
+
+	from maya import cmds as mc
+	from . import descriptors
+	from . import moduleFactory
+
+	factory = factory or moduleFactory.ModuleFactory()
+
+	nodes = []			## (long name, kind, module, category, index)
+	modules = []
+	categories = []
+	paramRows = []
+
+	for item in descriptors.scanRoots(roots):
+		if not item.built or not item.type in factory.modules:
+			continue
+		instance = item.rehydrate(factory)
+		moduleIndex = len(modules)
+		first = len(nodes)
+
+		for index, joint in enumerate(instance.chain):
+			nodes.append( (str(joint), KIND_JOINT, moduleIndex, -1, index) )
+		for category in instance._controllerCategories:
+			if not category in categories:
+				categories.append(category)
+			for index, con in enumerate(instance._controllers.get(category, [])):
+				## zero layout: the zero goes in too, so controls keep their
+				## control -> zero -> control parents
+				zero = instance.getZero(category, index)
+				if not str(zero) == str(con):
+					nodes.append( (str(zero), KIND_ZERO, moduleIndex, categories.index(category), index) )
+				nodes.append( (str(con), KIND_CONTROL, moduleIndex, categories.index(category), index) )
+		for index, key in enumerate( sorted(instance._inputs) ):
+			nodes.append( (str(instance._inputs[key]), KIND_INPUT, moduleIndex, -1, index) )
+
+		modules.append( {
+			'name':str(instance.module),
+			'type':item.type or '',
+			'token':item.token or '',
+			'side':item.side or '',
+			'root':first,
+			'firstNode':first,
+			'nodeCount':len(nodes) - first,
+		} )
+		paramRows.append( _moduleParams(item.root) )
+
+	longNames = [ (mc.ls(x[0], long=True) or [x[0]])[0] for x in nodes ]
+	lookup = dict( (name, index) for index, name in enumerate(longNames) )
+
+	count = len(nodes)
+	local = np.zeros( (count, 4, 4) )
+	world = np.zeros( (count, 4, 4) )
+	defaultTranslate = np.zeros( (count, 3) )
+	defaultRotate = np.zeros( (count, 4) )
+	defaultScale = np.zeros( (count, 3) )
+	parents = np.full( count, -1, dtype=np.int32 )
+
+	for index, name in enumerate(longNames):
+		local[index] = np.array( mc.xform(name, q=True, os=True, m=True) ).reshape(4, 4)
+		world[index] = np.array( mc.xform(name, q=True, ws=True, m=True) ).reshape(4, 4)
+		defaultTranslate[index], defaultRotate[index], defaultScale[index] = _defaultPose(name)
+		parents[index] = lookup.get( name.rpartition('|')[0], -1 )
+
+	numericNames = sorted( set( key for numeric, strings in paramRows for key in numeric ) )
+	stringNames = sorted( set( key for numeric, strings in paramRows for key in strings ) )
+	numeric = np.full( (len(modules), len(numericNames)), np.nan )
+	strings = [ [ row[1].get(key, '') for key in stringNames ] for row in paramRows ]
+	for row, (values, ignored) in enumerate(paramRows):
+		for column, key in enumerate(numericNames):
+			if key in values:
+				numeric[row, column] = values[key]
+
+	stringColumn = _strings( [ x for row in strings for x in row ] ).reshape( (len(modules), len(stringNames)) )
+
+	return( {
+		'nodes.name':_strings( [ x.rpartition('|')[2] for x in longNames ] ),
+		'nodes.kind':np.array( [ x[1] for x in nodes ], dtype=np.int8 ),
+		'nodes.module':np.array( [ x[2] for x in nodes ], dtype=np.int32 ),
+		'nodes.parent':parents,
+		'nodes.category':np.array( [ x[3] for x in nodes ], dtype=np.int16 ),
+		'nodes.index':np.array( [ x[4] for x in nodes ], dtype=np.int32 ),
+		'nodes.local':local,
+		'nodes.world':world,
+		'nodes.defaultTranslate':defaultTranslate,
+		'nodes.defaultRotate':defaultRotate,
+		'nodes.defaultScale':defaultScale,
+		'modules.name':_strings( [ x['name'] for x in modules ] ),
+		'modules.type':_strings( [ x['type'] for x in modules ] ),
+		'modules.token':_strings( [ x['token'] for x in modules ] ),
+		'modules.side':_strings( [ x['side'] for x in modules ] ),
+		'modules.root':np.array( [ x['root'] for x in modules ], dtype=np.int32 ),
+		'modules.firstNode':np.array( [ x['firstNode'] for x in modules ], dtype=np.int32 ),
+		'modules.nodeCount':np.array( [ x['nodeCount'] for x in modules ], dtype=np.int32 ),
+		'categories.name':_strings(categories),
+		'params.numericNames':_strings(numericNames),
+		'params.numeric':numeric,
+		'params.stringNames':_strings(stringNames),
+		'params.string':stringColumn,
+	} )
+
+
+## ----------------------------------------------------------------------
+def writeColumns(columns, path):
+	## one .npy per column plus the manifest
+	_requireNumpy()
+
+	if not os.path.isdir(path):
+		os.makedirs(path)
+
+	manifest = { 'version':FORMAT_VERSION, 'columns':{} }
+	for name, array in sorted(columns.items()):
+		array = np.ascontiguousarray(array)
+		np.save( os.path.join(path, name + '.npy'), array, allow_pickle=False )
+		manifest['columns'][name] = { 'dtype':array.dtype.str, 'shape':list(array.shape) }
+
+	with open( os.path.join(path, 'manifest.json'), 'w' ) as handle:
+		json.dump(manifest, handle, indent=1, sort_keys=True)
+
+	return(manifest)
+
+
+## ----------------------------------------------------------------------
+def exportRig(path, roots=None, factory=None):
+	'''
+	exportRig(path, roots=None, factory=None):
+
+	Collects the rig (see collectRig) and writes it to the directory at
+	path. Returns the manifest.
+	'''
+
+	return( writeColumns( collectRig(roots, factory), path ) )
+
+
+## ----------------------------------------------------------------------
+class RigData(object):
+	'''
+	A loaded export. Columns are opened on first access (memory mapped by
+	default) and read with data['nodes.world'] or data.column('nodes.world').
+	'''
+
+	def __init__(self, path, mmap=True):
+		_requireNumpy()
+		self.path = path
+		self.mmap = mmap
+		with open( os.path.join(path, 'manifest.json'), 'r' ) as handle:
+			self.manifest = json.load(handle)
+		if self.manifest.get('version', 0) > FORMAT_VERSION:
+			raise ExportException('RigData: %s was written by a newer exporter (version %s).' % (path, self.manifest['version']))
+		self._columns = {}
+		self._names = None
+
+	def __repr__(self):
+		return( "<< Witch Rig Data: %s (%d columns)." % (self.path, len(self.columns)) )
+
+	def __getitem__(self, name):
+		return( self.column(name) )
+
+	def __contains__(self, name):
+		return( name in self.manifest['columns'] )
+
+	@property ## readonly
+	def columns(self):
+		return( sorted(self.manifest['columns']) )
+
+	def column(self, name):
+		if not name in self._columns:
+			if not name in self:
+				raise KeyError(name)
+			self._columns[name] = np.load( os.path.join(self.path, name + '.npy'),
+				mmap_mode='r' if self.mmap else None, allow_pickle=False )
+		return( self._columns[name] )
+
+	def nodeIndex(self, name):
+		if self._names is None:
+			self._names = dict( (x, index) for index, x in enumerate(self.column('nodes.name').tolist()) )
+		return( self._names[name] )
+
+	def moduleNodes(self, moduleIndex):
+		first = int( self.column('modules.firstNode')[moduleIndex] )
+		return( slice( first, first + int( self.column('modules.nodeCount')[moduleIndex] ) ) )
+
+	def children(self, index):
+		return( np.nonzero( self.column('nodes.parent') == index )[0] )
+
+	def param(self, name):
+		## one param for every module: a float column, or a string column
+		names = self.column('params.numericNames').tolist()
+		if name in names:
+			return( self.column('params.numeric')[:, names.index(name)] )
+		names = self.column('params.stringNames').tolist()
+		if name in names:
+			return( self.column('params.string')[:, names.index(name)] )
+		raise KeyError(name)
+
+
+## ----------------------------------------------------------------------
+def load(path, mmap=True):
+	return( RigData(path, mmap) )
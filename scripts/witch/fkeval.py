@@ -0,0 +1,563 @@
+import json
+import time
+
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
+## ----------------------------------------------------------------------
+'''
+
+	FKEVAL.PY
+
+	Evaluating FK rig poses without Maya.
+
+	capture() reads the parts of a built rig that move the bind joints:
+	the control / zero hierarchy with its rest channels and
+	offsetParentMatrices, connectChains' direct channel links and the
+	parent / scale constraints (constraint nodes or matrixConstraint
+	networks) with their offsets. The result is an FKRig, which can be
+	saved to an .npz and loaded anywhere numpy is.
+
+	FKRig.evaluate() takes a batch of control poses, (B, controls, 9)
+	arrays of translate, rotate (degrees) and scale, and returns the bind
+	joints' world matrices for all of them at once, (B, joints, 4, 4), by
+	walking the nodes in dependency order with batched matrix products.
+
+	Every node is one of:
+
+	LOCAL:		world = local channels * offsetParentMatrix * parent world.
+				Controls take their channels from the pose.
+	COPY:		like LOCAL, with translate / rotate / scale taken from
+				other nodes' channels (connectChains).
+	CONSTRAINT:	world = offset * driver world, with the driver's scale
+				left out for parent-only constraints.
+	STATIC:		anything else (a solver, a blend, a node that isn't part of
+				the rig); it keeps its rest world matrix and is listed in
+				FKRig.warnings.
+
+	Pivots, rotate axes, shear and segment scale compensation aren't
+	modeled; the rig chains have them off. verify() checks a capture
+	against the live scene.
+
+'''
+
+## ----------------------------------------------------------------------
+class FKEvalException(Exception):
+	pass
+
+## node kinds
+LOCAL = 0
+COPY = 1
+CONSTRAINT = 2
+STATIC = 3
+
+ORDERS = [ 'xyz', 'yzx', 'zxy', 'xzy', 'yxz', 'zyx' ]
+CHANNELS = [ 'translate', 'rotate', 'scale' ]
+
+## ----------------------------------------------------------------------
+def _requireNumpy():
+	if np is None:
+		raise FKEvalException('numpy is not available.')
+
+
+## ----------------------------------------------------------------------
+def axisRotation(radians, axis):
+	## (B, 3, 3) row vector rotations about one axis
+	c, s = np.cos(radians), np.sin(radians)
+	i, j = [ (1, 2), (2, 0), (0, 1) ][axis]
+	result = np.zeros( (len(radians), 3, 3) )
+	result[:, axis, axis] = 1.0
+	result[:, i, i] = c
+	result[:, j, j] = c
+	result[:, i, j] = s
+	result[:, j, i] = -s
+	return(result)
+
+
+## ----------------------------------------------------------------------
+def eulerToMatrix(degrees, order=0):
+	## (B, 3) angles -> (B, 3, 3), applied in rotate order (Maya's enum or name)
+	order = ORDERS[order] if isinstance(order, int) else order
+	radians = np.radians(degrees)
+	result = None
+	for letter in order:
+		axis = 'xyz'.index(letter)
+		rotation = axisRotation(radians[:, axis], axis)
+		result = rotation if result is None else np.matmul(result, rotation)
+	return(result)
+
+
+## ----------------------------------------------------------------------
+def matrixToEuler(matrices, order=0):
+	## inverse of eulerToMatrix, (B, 3, 3) -> (B, 3) degrees
+	order = ORDERS[order] if isinstance(order, int) else order
+	a, b, c = [ 'xyz'.index(x) for x in order ]
+	sign = 1.0 if order in ('xyz', 'yzx', 'zxy') else -1.0
+
+	## the same rotation with column vectors
+	m = lambda row, column: matrices[:, column, row]
+
+	result = np.zeros( (len(matrices), 3) )
+	result[:, b] = np.arcsin( np.clip( -sign * m(c, a), -1.0, 1.0 ) )
+	result[:, a] = np.arctan2( sign * m(c, b), m(c, c) )
+	result[:, c] = np.arctan2( sign * m(b, a), m(a, a) )
+	return( np.degrees(result) )
+
+
+## ----------------------------------------------------------------------
+def compose(translate, rotate, scale, order=0, orient=None):
+	'''
+	compose(translate, rotate, scale, order=0, orient=None):
+
+	Local matrices from batched channels ((B, 3) each; rotate in degrees),
+	scale * rotate * jointOrient * translate.
+
+	Returns:
+
+	A (B, 4, 4) array.
+	'''
+
+	rotation = eulerToMatrix(rotate, order)
+	if orient is not None:
+		rotation = np.matmul( rotation, eulerToMatrix( np.asarray(orient, dtype=np.float64).reshape(1, 3), 0 ) )
+	result = np.zeros( (len(rotation), 4, 4) )
+	result[:, :3, :3] = rotation * scale[:, :, None]
+	result[:, 3, :3] = translate
+	result[:, 3, 3] = 1.0
+	return(result)
+
+
+## ----------------------------------------------------------------------
+def decompose(matrices, order=0, orient=None):
+	## (B, 4, 4) -> (translate, rotate, scale), each (B, 3); compose's inverse
+	scale = np.linalg.norm(matrices[:, :3, :3], axis=2)
+	rotation = matrices[:, :3, :3] / scale[:, :, None]
+	if orient is not None:
+		rotation = np.matmul( rotation, eulerToMatrix( np.asarray(orient, dtype=np.float64).reshape(1, 3), 0 ).transpose(0, 2, 1) )
+	return( (matrices[:, 3, :3].copy(), matrixToEuler(rotation, order), scale) )
+
+
+## ----------------------------------------------------------------------
+def _rigid(matrices):
+	## scale taken out of the rows
+	result = matrices.copy()
+	result[:, :3, :3] /= np.linalg.norm(matrices[:, :3, :3], axis=2)[:, :, None]
+	return(result)
+
+
+## ----------------------------------------------------------------------
+class FKRig(object):
+	'''
+	A captured rig. nodes is a list of dicts in evaluation order:
+
+		name, kind, parent (index, -1 for world), control (index, -1),
+		translate / rotate / scale (rest channels), order, orient (joint
+		orient or None), opm (4x4 or None), sources (channel -> node index
+		for COPY), driver / offset / rigid (CONSTRAINT), world (rest)
+
+	controls are the control names in pose order, joints the (node index,
+	name) pairs evaluate() returns.
+	'''
+
+	def __init__(self, nodes, controls, joints, warnings=None):
+		_requireNumpy()
+		self.nodes = nodes
+		self.controls = controls
+		self.joints = joints
+		self.warnings = list(warnings or [])
+
+		## channels are only kept for nodes something copies from
+		self._sources = set( x for node in nodes for x in (node.get('sources') or {}).values() )
+
+	def __repr__(self):
+		return( "<< Witch FK Rig: %d nodes, %d controls, %d joints." % (len(self.nodes), len(self.controls), len(self.joints)) )
+
+	def restPoses(self, count=1):
+		## (count, controls, 9): every control at its rest channels
+		rest = np.zeros( (len(self.controls), 9) )
+		for node in self.nodes:
+			if node['control'] >= 0:
+				rest[node['control']] = list(node['translate']) + list(node['rotate']) + list(node['scale'])
+		return( np.tile(rest, (count, 1, 1)) )
+
+	def evaluate(self, poses):
+		'''
+		evaluate(poses):
+
+		poses:	(B, controls, 9) array, in self.controls order.
+
+		Returns:
+
+		(B, joints, 4, 4) world matrices of the bind joints.
+		'''
+
+		poses = np.asarray(poses, dtype=np.float64)
+		if poses.ndim == 2:
+			poses = poses[None]
+		count = len(poses)
+
+		worlds = []
+		channels = {}
+		for index, node in enumerate(self.nodes):
+			kind = node['kind']
+			parent = worlds[node['parent']] if node['parent'] >= 0 else None
+
+			if kind == STATIC:
+				world = np.broadcast_to( np.asarray(node['world']).reshape(1, 4, 4), (count, 4, 4) )
+
+			elif kind == CONSTRAINT:
+				driver = worlds[node['driver']]
+				if node['rigid']:
+					driver = _rigid(driver)
+				world = np.matmul( np.asarray(node['offset']).reshape(1, 4, 4), driver )
+				if index in self._sources:
+					local = world if parent is None else np.matmul( world, np.linalg.inv( self._parentSpace(node, parent) ) )
+					channels[index] = decompose(local, node['order'], node['orient'])
+
+			else:
+				if node['control'] >= 0:
+					values = poses[:, node['control']]
+					translate, rotate, scale = values[:, 0:3], values[:, 3:6], values[:, 6:9]
+				else:
+					translate, rotate, scale = [ np.broadcast_to( np.asarray(node[x], dtype=np.float64), (count, 3) ) for x in CHANNELS ]
+				if kind == COPY:
+					found = [ translate, rotate, scale ]
+					for slot, name in enumerate(CHANNELS):
+						if name in node['sources']:
+							found[slot] = channels[ node['sources'][name] ][slot]
+					translate, rotate, scale = found
+				if index in self._sources:
+					channels[index] = (translate, rotate, scale)
+
+				world = compose(translate, rotate, scale, node['order'], node['orient'])
+				if node['opm'] is not None:
+					world = np.matmul( world, np.asarray(node['opm']).reshape(1, 4, 4) )
+				if parent is not None:
+					world = np.matmul(world, parent)
+
+			worlds.append(world)
+
+		return( np.stack( [ worlds[x] for x, name in self.joints ], axis=1 ) )
+
+	def _parentSpace(self, node, parent):
+		if node['opm'] is None:
+			return(parent)
+		return( np.matmul( np.asarray(node['opm']).reshape(1, 4, 4), parent ) )
+
+	def save(self, path):
+		## an .npz holding the structure as JSON; no pickles
+		data = { 'nodes':self.nodes, 'controls':self.controls, 'joints':self.joints, 'warnings':self.warnings }
+		np.savez_compressed( path, structure=np.array( json.dumps(data) ) )
+
+	@classmethod
+	def load(cls, path):
+		_requireNumpy()
+		with np.load(path, allow_pickle=False) as archive:
+			data = json.loads( str(archive['structure']) )
+		return( cls( data['nodes'], data['controls'], [ tuple(x) for x in data['joints'] ], data['warnings'] ) )
+
+
+## ----------------------------------------------------------------------
+def _drivers(node):
+	## (driver, rigid) from the constraints on a node, or None; raises
+	## FKEvalException for anything evaluate() can't reproduce
+	from maya import cmds as mc
+	from . import utils
+
+	drivers = set()
+	translateRotate = False
+	scale = False
+	for item in utils.listConstraints(node):
+		nodeType = mc.nodeType(item)
+		if nodeType in ('parentConstraint', 'scaleConstraint'):
+			found = mc.ls( mc.listConnections(item+'.target', s=True, d=False) or [], long=True )
+			targets = set(found) - set( mc.ls(item, long=True) )
+			if not len(targets) == 1:
+				raise FKEvalException('%s: %s has %d targets.' % (node, item, len(targets)))
+			drivers |= targets
+			translateRotate = translateRotate or nodeType == 'parentConstraint'
+			scale = scale or nodeType == 'scaleConstraint'
+		elif nodeType == 'multMatrix':
+			found = mc.listConnections(item+'.matrixIn[1]', s=True, d=False) or []
+			if not len(found):
+				## compensateOffset's node: static inputs only
+				continue
+			drivers |= set( mc.ls(found, long=True) )
+			driven = [ x for x in ('translate', 'offsetParentMatrix') if mc.listConnections(node+'.'+x, s=True, d=False) ]
+			translateRotate = True
+			scale = scale or 'offsetParentMatrix' in driven or bool( mc.listConnections(node+'.scale', s=True, d=False) )
+		elif nodeType == 'decomposeMatrix':
+			continue
+		else:
+			raise FKEvalException('%s: %s constraints are not supported.' % (node, nodeType))
+
+	if not len(drivers):
+		return(None)
+	if len(drivers) > 1 or not translateRotate:
+		raise FKEvalException('%s: only single driver parent (+ scale) constraints are supported.' % node)
+	return( (drivers.pop(), not scale) )
+
+
+## ----------------------------------------------------------------------
+def _sources(node):
+	## channel -> source transform for direct channel connections
+	from maya import cmds as mc
+
+	results = {}
+	for channel in CHANNELS:
+		found = mc.listConnections(node+'.'+channel, s=True, d=False, p=True) or []
+		if not len(found):
+			continue
+		source, dot, attr = found[0].partition('.')
+		if not attr == channel or not mc.ls(source, type='transform'):
+			raise FKEvalException('%s.%s is driven by %s.' % (node, channel, found[0]))
+		results[channel] = mc.ls(source, long=True)[0]
+	return(results)
+
+
+## ----------------------------------------------------------------------
+def capture(roots=None, factory=None):
+	'''
+	capture(roots=None, factory=None):
+
+	Captures the built modules on the given roots (every built module if
+	None), at the scene's current pose, which is taken as the rest pose.
+
+	Returns:
+
+	An FKRig.
+	'''
+
+	_requireNumpy()
+
+	from maya import cmds as mc
+	from . import descriptors
+	from . import moduleFactory
+
+	factory = factory or moduleFactory.ModuleFactory()
+
+	controls = []
+	joints = []
+	for item in descriptors.scanRoots(roots):
+		if not item.built or not item.type in factory.modules:
+			continue
+		instance = item.rehydrate(factory)
+		for category in instance._controllerCategories:
+			controls += mc.ls( [ str(x) for x in instance._controllers.get(category, []) ], long=True )
+		joints += mc.ls( [ str(x) for x in instance.chain ], long=True )
+
+	controlIndex = dict( (name, index) for index, name in enumerate(controls) )
+
+	## what every node depends on, walking back from the joints
+	records = {}
+	warnings = []
+	pending = list(joints)
+	while len(pending):
+		name = pending.pop()
+		if name in records:
+			continue
+
+		parent = mc.listRelatives(name, p=True, f=True)
+		record = {
+			'name':name,
+			'kind':LOCAL,
+			'parent':parent[0] if parent else None,
+			'control':controlIndex.get(name, -1),
+			'translate':list( mc.getAttr(name+'.translate')[0] ),
+			'rotate':list( mc.getAttr(name+'.rotate')[0] ),
+			'scale':list( mc.getAttr(name+'.scale')[0] ),
+			'order':mc.getAttr(name+'.rotateOrder'),
+			'orient':list( mc.getAttr(name+'.jointOrient')[0] ) if mc.nodeType(name) == 'joint' else None,
+			'opm':None,
+			'sources':{},
+			'driver':None,
+			'offset':None,
+			'rigid':False,
+			'world':mc.xform(name, q=True, ws=True, m=True),
+		}
+		if mc.attributeQuery('offsetParentMatrix', node=name, exists=True) and \
+				not mc.listConnections(name+'.offsetParentMatrix', s=True, d=False):
+			record['opm'] = mc.getAttr(name+'.offsetParentMatrix')
+
+		try:
+			drivers = _drivers(name)
+			sources = {} if drivers is not None else _sources(name)
+		except FKEvalException as error:
+			record['kind'] = STATIC
+			record['parent'] = None
+			warnings.append( str(error) )
+			records[name] = record
+			continue
+
+		if drivers is not None:
+			record['kind'] = CONSTRAINT
+			record['driver'], record['rigid'] = drivers
+			record['opm'] = None if mc.listConnections(name+'.offsetParentMatrix', s=True, d=False) else record['opm']
+		elif len(sources):
+			record['kind'] = COPY
+			record['sources'] = sources
+
+		records[name] = record
+		pending += [ x for x in [ record['parent'], record['driver'] ] + list(sources.values()) if x is not None ]
+
+	## dependency order
+	order = []
+	placed = set()
+	def place(name):
+		if name in placed:
+			return
+		placed.add(name)
+		record = records[name]
+		for dependency in [ record['parent'], record['driver'] ] + list(record['sources'].values()):
+			if dependency is not None:
+				place(dependency)
+		order.append(name)
+
+	for name in sorted(records):
+		place(name)
+
+	index = dict( (name, position) for position, name in enumerate(order) )
+	nodes = []
+	for name in order:
+		record = dict(records[name])
+		record['parent'] = index[record['parent']] if record['parent'] is not None else -1
+		record['sources'] = dict( (key, index[value]) for key, value in record['sources'].items() )
+		if record['kind'] == CONSTRAINT:
+			world = np.array(record['world']).reshape(1, 4, 4)
+			driver = np.array(records[record['driver']]['world']).reshape(1, 4, 4)
+			if record['rigid']:
+				driver = _rigid(driver)
+			record['offset'] = np.matmul( world, np.linalg.inv(driver) )[0].flatten().tolist()
+			record['driver'] = index[record['driver']]
+		nodes.append(record)
+
+	return( FKRig( nodes, controls, [ (index[x], x) for x in joints ], warnings ) )
+
+
+## ----------------------------------------------------------------------
+def randomPoses(rig, count, rotate=30.0, translate=0.5, seed=None):
+	## rest poses with random rotate / translate offsets on every control
+	random = np.random.RandomState(seed)
+	poses = rig.restPoses(count)
+	poses[:, :, 0:3] += random.uniform(-translate, translate, (count, len(rig.controls), 3))
+	poses[:, :, 3:6] += random.uniform(-rotate, rotate, (count, len(rig.controls), 3))
+	return(poses)
+
+
+## ----------------------------------------------------------------------
+def verify(roots=None, samples=10, batch=10000, seed=1):
+	'''
+	verify(roots=None, samples=10, batch=10000, seed=1):
+
+	Captures the rig, poses the scene's controls samples times at random
+	(free channels only) and compares the evaluated joint matrices with
+	the scene's, then times evaluating batch poses at once. The controls
+	are put back afterwards.
+
+	Returns:
+
+	A dict with maxError, posesPerSecond, nodes, controls, joints and
+	warnings.
+	'''
+
+	from maya import cmds as mc
+
+	rig = capture(roots)
+	poses = randomPoses(rig, samples, seed=seed)
+	rest = rig.restPoses(1)[0]
+
+	## locked or driven channels stay at rest, the same as in the scene
+	free = []
+	names = [ '%s%s' % (x, y) for x in CHANNELS for y in 'XYZ' ]
+	for index, control in enumerate(rig.controls):
+		for slot, channel in enumerate(names):
+			plug = '%s.%s' % (control, channel)
+			if mc.getAttr(plug, lock=True) or mc.listConnections(plug, s=True, d=False):
+				poses[:, index, slot] = rest[index, slot]
+			else:
+				free.append( (index, slot, plug) )
+
+	evaluated = rig.evaluate(poses)
+	error = 0.0
+	try:
+		for sample in range(samples):
+			for index, slot, plug in free:
+				mc.setAttr(plug, poses[sample, index, slot])
+			for position, (node, name) in enumerate(rig.joints):
+				scene = np.array( mc.xform(name, q=True, ws=True, m=True) ).reshape(4, 4)
+				error = max( error, float( np.abs(scene - evaluated[sample, position]).max() ) )
+	finally:
+		for index, slot, plug in free:
+			mc.setAttr(plug, rest[index, slot])
+
+	poses = randomPoses(rig, batch, seed=seed)
+	start = time.time()
+	rig.evaluate(poses)
+	seconds = time.time() - start
+
+	return( {
+		'maxError':error,
+		'posesPerSecond':batch / seconds if seconds else float('inf'),
+		'nodes':len(rig.nodes),
+		'controls':len(rig.controls),
+		'joints':len(rig.joints),
+		'warnings':rig.warnings,
+	} )
+
+
+## ----------------------------------------------------------------------
+def selfCheck(count=100, seed=2):
+	'''
+	Checks the math without Maya: Euler round trips in every rotate order,
+	compose / decompose, and a small hand-built rig (control -> constrained
+	rig joint -> copied bind joint) against the same chain done by hand.
+
+	Returns:
+
+	A list of failure messages; empty if everything behaved.
+	'''
+
+	_requireNumpy()
+
+	failures = []
+	def check(condition, message):
+		if not condition:
+			failures.append(message)
+
+	random = np.random.RandomState(seed)
+	angles = random.uniform(-80.0, 80.0, (count, 3))
+	for order in range(6):
+		matrices = eulerToMatrix(angles, order)
+		back = eulerToMatrix( matrixToEuler(matrices, order), order )
+		check( np.abs(matrices - back).max() < 1e-9, 'euler round trip failed for %s' % ORDERS[order] )
+
+	translate = random.uniform(-5.0, 5.0, (count, 3))
+	scale = random.uniform(0.5, 2.0, (count, 3))
+	orient = [ 10.0, -20.0, 30.0 ]
+	local = compose(translate, angles, scale, 2, orient)
+	t, r, s = decompose(local, 2, orient)
+	check( np.abs( compose(t, r, s, 2, orient) - local ).max() < 1e-9, 'compose / decompose round trip failed' )
+
+	## control under a zero, rig joint parent constrained to the control,
+	## bind joint with the rig joint's channels and an orient of its own
+	identity = np.eye(4).flatten().tolist()
+	zero = np.eye(4)
+	zero[3, :3] = [ 1.0, 2.0, 0.0 ]
+	base = dict( control=-1, translate=[0.0]*3, rotate=[0.0]*3, scale=[1.0]*3, order=0, orient=None, opm=None,
+		sources={}, driver=None, offset=None, rigid=False, world=identity )
+	nodes = [
+		dict( base, name='zero', kind=LOCAL, parent=-1, translate=[ 1.0, 2.0, 0.0 ] ),
+		dict( base, name='control', kind=LOCAL, parent=0, control=0 ),
+		dict( base, name='rigJoint', kind=CONSTRAINT, parent=-1, driver=1, rigid=True, offset=identity ),
+		dict( base, name='bindJoint', kind=COPY, parent=-1, orient=[ 0.0, 0.0, 0.0 ], sources={ 'translate':2, 'rotate':2 } ),
+	]
+	rig = FKRig( nodes, ['control'], [ (3, 'bindJoint') ] )
+	poses = rig.restPoses(count)
+	poses[:, 0, 3:6] = angles
+	result = rig.evaluate(poses)[:, 0]
+	expected = np.matmul( compose( np.zeros((count, 3)), angles, np.ones((count, 3)) ), zero[None] )
+	check( np.abs(result - expected).max() < 1e-9, 'hand built rig: max error %g' % np.abs(result - expected).max() )
+
+	return(failures)
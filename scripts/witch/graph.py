@@ -0,0 +1,792 @@
+import re
+import json
+import hashlib
+
+import maya
+from maya import cmds as mc
+from maya import OpenMaya as om
+import pymel.core as pm
+
+from . import utils
+
+## ----------------------------------------------------------------------
+'''
+
+	GRAPH.PY
+
+	Module subgraph utilities: finding every node a built module owns,
+	duplicating that subgraph onto another chain, and canonical hashing /
+	diffing of module graphs.
+
+	A module owns its MODULE node and everything below it, plus the nodes
+	registered with it through a module message connection (see
+	ModuleBase.registerNodes): utility networks and constraints parented
+	under the chain's rig root. The bind chain is not owned; it's where the
+	module connects to the skeleton.
+
+	Canonical form (canonicalModule) describes each owned node by an id
+	that depends on neither creation order nor names: DAG nodes by their
+	child index path below the MODULE node ('~/1/0'), bind joints by chain
+	index ('chain[2]'), registered and utility nodes by type plus the first
+	labeled node they connect to, nodes connected to nothing labeled by
+	type plus a digest of their values, and nodes outside the module by
+	their child index path from the world ('ext/3/0') or, for DG nodes,
+	their type ('ext:time'). Each node record holds its type, parent, a
+	fixed set of attribute values (HASH_ATTRS, plus keyable and user
+	defined attributes that aren't driven) and its incoming connections.
+
+	Values are read through the API, with the attributes looked up once
+	per node type. canonicalRecords yields the records in id order, and
+	they're hashed as they come, so equal graphs always give equal hashes
+	and a module is never held whole just to hash it.
+
+'''
+
+## constants
+PRECISION = 6
+
+## attributes hashed per node type, on top of keyable and user defined ones
+TRANSFORM_ATTRS = [ 'translate', 'rotate', 'scale', 'shear', 'rotateOrder', 'rotateAxis',
+	'inheritsTransform', 'visibility', 'offsetParentMatrix', 'overrideEnabled', 'overrideColor' ]
+HASH_ATTRS = {
+	'transform':TRANSFORM_ATTRS,
+	'joint':TRANSFORM_ATTRS + [ 'jointOrient', 'segmentScaleCompensate' ],
+	'nurbsCurve':[ 'degree', 'spans', 'form' ],
+	'pairBlend':[ 'rotInterpolation' ],
+	'remapValue':[ 'inputMin', 'inputMax', 'outputMin', 'outputMax' ],
+	'multiplyDivide':[ 'operation', 'input1', 'input2' ],
+	'blendColors':[ 'blender' ],
+	'decomposeMatrix':[],
+	'composeMatrix':[ 'inputTranslate', 'inputRotate', 'inputScale' ],
+}
+
+## multi attributes hashed per node type (listAttr patterns)
+HASH_MULTI_ATTRS = {
+	'multMatrix':[ 'matrixIn' ],
+	'parentConstraint':[ 'targetOffsetTranslate', 'targetOffsetRotate', 'targetWeight' ],
+	'pointConstraint':[ 'offset', 'targetWeight' ],
+	'orientConstraint':[ 'offset', 'targetWeight' ],
+	'scaleConstraint':[ 'offset', 'targetWeight' ],
+	'aimConstraint':[ 'offset', 'aimVector', 'upVector', 'worldUpVector', 'targetWeight' ],
+}
+
+## ----------------------------------------------------------------------
+class GraphException(Exception):
+	pass
+
+## ----------------------------------------------------------------------
+def _long(nodes):
+	return( mc.ls(nodes, long=True) or [] )
+
+
+## ----------------------------------------------------------------------
+def _links(node, attr):
+	## message links of a (multi) attribute, in index order
+	if not mc.attributeQuery(attr, node=node, exists=True):
+		return([])
+	plugs = mc.listConnections('%s.%s' % (node, attr), s=True, d=False, c=True, fullPath=True) or []
+	index = lambda plug: int(plug.rpartition('[')[2].rstrip(']')) if plug.endswith(']') else 0
+	return( _long( [ node for plug, node in sorted(zip(plugs[0::2], plugs[1::2]), key=lambda x: index(x[0])) ] ) )
+
+
+## ----------------------------------------------------------------------
+def replaceAll(name, table):
+	## substring swaps in a single pass (longest first), so a swapped part
+	## is never swapped again
+	if not table:
+		return(name)
+	pattern = '|'.join( re.escape(x) for x in sorted(table, key=len, reverse=True) )
+	return( re.sub( pattern, lambda x: table[x.group(0)], name ) )
+
+
+## ----------------------------------------------------------------------
+def moduleOf(root):
+	## the MODULE node of a built root, or None
+	root = str(root)
+	if not mc.attributeQuery('module', node=root, exists=True):
+		return(None)
+	found = mc.listConnections(root+'.module', s=True, d=False)
+	return( _long(found)[0] if found else None )
+
+
+## ----------------------------------------------------------------------
+def ownedNodes(module):
+	'''
+	ownedNodes(module):
+
+	Returns:
+
+	A dict with the module's long name ('module'), its bind chain ('chain'),
+	the DAG nodes under it ('dag', module first), registered DAG nodes
+	outside of it ('external') and registered DG nodes ('dg').
+	'''
+
+	module = _long(module)[0]
+	chain = _links(module, 'chain')
+
+	dag = _long( [module] + (mc.listRelatives(module, ad=True, fullPath=True) or [])[::-1] )
+	inside = set(dag)
+	skip = inside | set(chain)
+
+	external = []
+	dg = []
+	for node in _long( mc.listConnections(module+'.message', s=False, d=True) or [] ):
+		if node in skip:
+			continue
+		skip.add(node)
+		if mc.ls(node, dag=True):
+			external.append(node)
+		else:
+			dg.append(node)
+
+	return( { 'module':module, 'chain':chain, 'dag':dag, 'external':external, 'dg':dg } )
+
+
+## ----------------------------------------------------------------------
+def connections(nodes):
+	'''
+	Every connection touching the given nodes, as a sorted list of
+	(source plug, destination plug) pairs with long node names.
+	'''
+
+	names = {}
+	results = set()
+	for node in nodes:
+		for plugs, flip in ( mc.listConnections(node, s=True, d=False, c=True, p=True, fullPath=True) or [], True ), \
+				( mc.listConnections(node, s=False, d=True, c=True, p=True, fullPath=True) or [], False ):
+			for mine, other in zip(plugs[0::2], plugs[1::2]):
+				mine = _plugLong(mine, names)
+				other = _plugLong(other, names)
+				results.add( (other, mine) if flip else (mine, other) )
+
+	return( sorted(results) )
+
+
+## ----------------------------------------------------------------------
+def _plugLong(plug, names):
+	node, dot, attr = plug.partition('.')
+	if not node in names:
+		names[node] = ( _long(node) or [node] )[0]
+	return( names[node] + dot + attr )
+
+
+## ----------------------------------------------------------------------
+def _ensureAttr(sourceNode, targetNode, attr):
+	## dynamic message attributes (module links, inputs) have to exist on
+	## the target before they can be connected
+	base = attr.partition('[')[0].rpartition('.')[2]
+	if mc.attributeQuery(base, node=targetNode, exists=True):
+		return(True)
+	if not mc.attributeQuery(base, node=sourceNode, exists=True):
+		return(False)
+	if not mc.getAttr('%s.%s' % (sourceNode, base), type=True) == 'message':
+		return(False)
+	multi = mc.attributeQuery(base, node=sourceNode, multi=True)
+	mc.addAttr(targetNode, ln=base, at='message', multi=multi)
+	return(True)
+
+
+## ----------------------------------------------------------------------
+def cloneModule(module, targetChain, rename=None):
+	'''
+	cloneModule(module, targetChain, rename=None):
+
+	Duplicates everything a module owns and rewires the copy onto another
+	chain of the same length: connections between owned nodes are copied,
+	connections to and from the source chain (including its rig root and
+	the module / input links on the root) move to the target chain, and
+	connections from anything else are kept as they are.
+
+	The copy is not moved; callers place it (see symmetry.py and clone.py).
+
+	rename:		function taking a node's short name and returning the short
+				name for its copy. Copies keep their names if None.
+
+	Returns:
+
+	A dict of source long name -> PyNode of the copy (the chain mapping
+	is included).
+	'''
+
+	owned = ownedNodes(module)
+	sourceChain = owned['chain']
+	targetChain = _long( [ str(x) for x in targetChain ] )
+
+	if not len(sourceChain) == len(targetChain):
+		raise GraphException('cloneModule: chain lengths differ (%d, %d).' % (len(sourceChain), len(targetChain)))
+
+	mapping = dict( zip(sourceChain, targetChain) )
+
+	## the chains' rig roots map onto each other too
+	sourceRigRoot = _long( mc.listRelatives(sourceChain[0], p=True, fullPath=True) or [] )
+	if len(sourceRigRoot) and sourceRigRoot[0].endswith('_rigRoot'):
+		targetRigRoot = mc.listRelatives(targetChain[0], p=True, fullPath=True) or []
+		if not len(targetRigRoot) or not targetRigRoot[0].endswith('_rigRoot'):
+			targetRigRoot = [ str( utils.addRigRoot(targetChain[0]) ) ]
+			targetChain = _long( [ targetChain[0].rpartition('|')[2] ] + [ x.rpartition('|')[2] for x in targetChain[1:] ] )
+			mapping = dict( zip(sourceChain, targetChain) )
+		mapping[sourceRigRoot[0]] = _long(targetRigRoot)[0]
+
+	## DAG: one duplicate for the whole hierarchy. Children keep their names,
+	## so relative paths line up.
+	top = owned['module']
+	newTop = _long( mc.duplicate(top, rr=True)[0] )[0]
+	for node in owned['dag']:
+		mapping[node] = newTop + node[len(top):]
+
+	for node in owned['external']:
+		copy = mc.duplicate(node, rr=True)[0]
+		parent = _long( mc.listRelatives(node, p=True, fullPath=True) or [] )
+		if len(parent) and parent[0] in mapping:
+			copy = mc.parent(copy, mapping[parent[0]])[0]
+		mapping[node] = _long(copy)[0]
+
+	if len(owned['dg']):
+		copies = mc.duplicate(owned['dg'])
+		for node, copy in zip(owned['dg'], copies):
+			mapping[node] = copy
+
+	## handles survive the renames below
+	clones = {}
+	for node in owned['dag'] + owned['external'] + owned['dg']:
+		clones[node] = pm.PyNode(mapping[node])
+
+	## rewire
+	for source, destination in connections( owned['dag'] + owned['external'] + owned['dg'] ):
+		sourceNode, dot, sourceAttr = source.partition('.')
+		destinationNode, dot, destinationAttr = destination.partition('.')
+
+		## outputs into things that aren't ours (other modules' seams, say)
+		## stay with the original
+		if not destinationNode in mapping:
+			continue
+
+		newSource = '%s.%s' % (mapping.get(sourceNode, sourceNode), sourceAttr)
+		newDestination = '%s.%s' % (mapping[destinationNode], destinationAttr)
+
+		if not _ensureAttr(destinationNode, mapping[destinationNode], destinationAttr):
+			continue
+		if sourceNode in mapping and not _ensureAttr(sourceNode, mapping[sourceNode], sourceAttr):
+			continue
+
+		if not mc.isConnected(newSource, newDestination):
+			mc.connectAttr(newSource, newDestination, force=True)
+
+	## rename children before parents so the stored paths stay valid
+	if rename is not None:
+		for node in sorted( clones, key=lambda x: x.count('|'), reverse=True ):
+			clone = clones[node]
+			clone.rename( rename( node.rpartition('|')[2] ) )
+
+	for node in sourceChain:
+		clones[node] = pm.PyNode(mapping[node])
+
+	return(clones)
+
+
+## ----------------------------------------------------------------------
+def _canonicalValue(value):
+	if isinstance(value, float):
+		return( round(value, PRECISION) + 0.0 )
+	if isinstance(value, (list, tuple)):
+		return( [ _canonicalValue(x) for x in value ] )
+	return(value)
+
+
+## ----------------------------------------------------------------------
+def _ownedClosure(module):
+	## ownedNodes plus the unregistered utility nodes hanging off them
+	## (same rules as analysis.analyzeModule)
+	owned = ownedNodes(module)
+	members = set( owned['dag'] + owned['external'] + owned['dg'] )
+	boundary = set(owned['chain'])
+	dg = list(owned['dg'])
+
+	frontier = list(members)
+	while len(frontier):
+		found = mc.listConnections(frontier, shapes=False) or []
+		frontier = []
+		for node in set( mc.ls(found, long=True) or [] ):
+			if node in members or node in boundary or mc.ls(node, dag=True):
+				continue
+			if mc.attributeQuery('module', node=node, exists=True):
+				continue
+			if mc.ls(node, defaultNodes=True) or mc.nodeType(node) in ('time', 'dagPose', 'objectSet'):
+				continue
+			members.add(node)
+			dg.append(node)
+			frontier.append(node)
+
+	owned['dg'] = dg
+	return(owned)
+
+
+## ----------------------------------------------------------------------
+def _isDriven(plug):
+	## connected as a destination, or any child is
+	found = om.MPlugArray()
+	plug.connectedTo(found, True, False)
+	if found.length():
+		return(True)
+	if plug.isCompound():
+		return( any( _isDriven( plug.child(x) ) for x in range(plug.numChildren()) ) )
+	return(False)
+
+
+## ----------------------------------------------------------------------
+def _plugValue(plug):
+	## a plug's value through the API, in the units getAttr uses; None for
+	## data that isn't hashed (messages, geometry)
+	attr = plug.attribute()
+	if plug.isCompound():
+		return( [ _plugValue( plug.child(x) ) for x in range(plug.numChildren()) ] )
+
+	if attr.hasFn(om.MFn.kNumericAttribute):
+		unit = om.MFnNumericAttribute(attr).unitType()
+		if unit == om.MFnNumericData.kBoolean:
+			return( plug.asBool() )
+		if unit in (om.MFnNumericData.kByte, om.MFnNumericData.kChar, om.MFnNumericData.kShort, om.MFnNumericData.kInt):
+			return( plug.asInt() )
+		return( _canonicalValue( plug.asDouble() ) )
+
+	if attr.hasFn(om.MFn.kUnitAttribute):
+		unit = om.MFnUnitAttribute(attr).unitType()
+		if unit == om.MFnUnitAttribute.kAngle:
+			return( _canonicalValue( plug.asMAngle().asDegrees() ) )
+		return( _canonicalValue( plug.asDouble() ) )
+
+	if attr.hasFn(om.MFn.kEnumAttribute):
+		return( plug.asShort() )
+
+	matrix = attr.hasFn(om.MFn.kMatrixAttribute)
+	if attr.hasFn(om.MFn.kTypedAttribute):
+		dataType = om.MFnTypedAttribute(attr).attrType()
+		if dataType == om.MFnData.kString:
+			return( plug.asString() )
+		matrix = dataType == om.MFnData.kMatrix
+
+	if matrix:
+		try:
+			value = om.MFnMatrixData( plug.asMObject() ).matrix()
+		except RuntimeError:
+			return(None)
+		return( [ _canonicalValue( value(row, column) ) for row in range(4) for column in range(4) ] )
+
+	return(None)
+
+
+## ----------------------------------------------------------------------
+def _elementPlugs(obj, attr):
+	## (name, plug) for every existing plug of an attribute, through the
+	## arrays above it: 'matrixIn[0]', 'target[1].targetOffsetTranslate'
+	chain = []
+	current = attr
+	while not current.isNull():
+		chain.insert(0, current)
+		current = om.MFnAttribute(current).parent()
+
+	results = [ ( om.MFnAttribute(chain[0]).name(), om.MPlug(obj, chain[0]) ) ]
+	for level, item in enumerate(chain):
+		if level:
+			child = om.MFnAttribute(item).name()
+			results = [ ( '%s.%s' % (name, child), plug.child(item) ) for name, plug in results ]
+		expanded = []
+		for name, plug in results:
+			if not plug.isArray():
+				expanded.append( (name, plug) )
+				continue
+			for index in range( plug.numElements() ):
+				element = plug.elementByPhysicalIndex(index)
+				expanded.append( ( '%s[%d]' % (name, element.logicalIndex()), element ) )
+		results = expanded
+	return(results)
+
+
+## ----------------------------------------------------------------------
+def _typeAttrs(nodeType, obj, cache):
+	'''
+	The attributes hashed for a node type, looked up once per type: the
+	HASH_ATTRS / HASH_MULTI_ATTRS ones and the static attributes that are
+	keyable by default, as MObjects (the same for every node of the type),
+	plus the number of static attributes. Dynamic (user defined)
+	attributes come after those, per node.
+	'''
+
+	if nodeType in cache:
+		return(cache[nodeType])
+
+	fn = om.MFnDependencyNode(obj)
+	def find(name):
+		try:
+			found = fn.attribute(name)
+		except RuntimeError:
+			return(None)
+		return( None if found.isNull() else found )
+
+	fixed = [ (x, find(x)) for x in HASH_ATTRS.get(nodeType, []) ]
+	multi = [ (x, find(x)) for x in HASH_MULTI_ATTRS.get(nodeType, []) ]
+
+	static = 0
+	keyable = []
+	for index in range( fn.attributeCount() ):
+		attr = fn.attribute(index)
+		info = om.MFnAttribute(attr)
+		if info.isDynamic():
+			break
+		static += 1
+		if info.parent().isNull() and not info.isArray() and info.isKeyable():
+			keyable.append( (info.name(), attr) )
+
+	cache[nodeType] = {
+		'fixed':[ x for x in fixed if x[1] is not None ],
+		'multi':[ x for x in multi if x[1] is not None ],
+		'keyable':keyable,
+		'static':static,
+	}
+	return(cache[nodeType])
+
+
+## ----------------------------------------------------------------------
+def _attrValues(obj, nodeType, cache):
+	attrs = _typeAttrs(nodeType, obj, cache)
+	fn = om.MFnDependencyNode(obj)
+
+	plugs = [ (name, om.MPlug(obj, attr)) for name, attr in attrs['fixed'] ]
+	for name, attr in attrs['keyable']:
+		plug = om.MPlug(obj, attr)
+		if plug.isKeyable() or ( plug.isCompound() and any( plug.child(x).isKeyable() for x in range(plug.numChildren()) ) ):
+			plugs.append( (name, plug) )
+	for index in range( attrs['static'], fn.attributeCount() ):
+		attr = fn.attribute(index)
+		info = om.MFnAttribute(attr)
+		if info.parent().isNull():
+			plugs += _elementPlugs(obj, attr) if info.isArray() else [ (info.name(), om.MPlug(obj, attr)) ]
+	for name, attr in attrs['multi']:
+		plugs += _elementPlugs(obj, attr)
+
+	results = {}
+	for name, plug in plugs:
+		if name in results or _isDriven(plug):
+			continue
+		value = _plugValue(plug)
+		if value is not None:
+			results[name] = value
+
+	if nodeType == 'nurbsCurve':
+		points = om.MPointArray()
+		om.MFnNurbsCurve(obj).getCVs(points, om.MSpace.kObject)
+		results['cv'] = [ _canonicalValue( [ points[x].x, points[x].y, points[x].z ] ) for x in range( points.length() ) ]
+
+	return(results)
+
+
+## ----------------------------------------------------------------------
+def _indexPaths(nodes, prefix, top=None):
+	'''
+	Labels from child indices, so renaming doesn't change them: '~/1/0' is
+	the first child of the MODULE node's second child. Without top, paths
+	start at the world ('ext/3/0').
+	'''
+
+	children = {}
+	def index(node):
+		parent = node.rpartition('|')[0]
+		if not parent in children:
+			children[parent] = ( mc.listRelatives(parent, c=True, f=True) if parent else mc.ls(assemblies=True, long=True) ) or []
+		return( children[parent].index(node) )
+
+	labels = {}
+	for node in sorted( set(nodes), key=lambda x: x.count('|') ):
+		if node == top:
+			labels[node] = prefix
+			continue
+		path = []
+		current = node
+		while current and not current == top:
+			path.insert(0, str( index(current) ))
+			current = current.rpartition('|')[0]
+		labels[node] = '/'.join( [prefix] + path )
+	return(labels)
+
+
+## ----------------------------------------------------------------------
+def canonicalRecords(module, cache=None):
+	'''
+	canonicalRecords(module, cache=None):
+
+	The module's canonical form (see the file docstring) as a generator of
+	(canonical node id, record), in id order. Ids and connections are
+	worked out first; each record is read as it's yielded, so hashing
+	never has to hold the whole module. cache keeps the per node type
+	attribute lookups (see _typeAttrs) between calls.
+	'''
+
+	cache = {} if cache is None else cache
+
+	owned = _ownedClosure(module)
+	top = owned['module']
+	nodes = owned['dag'] + owned['external'] + owned['dg']
+
+	labels = _indexPaths(owned['dag'], '~', top)
+	for index, node in enumerate(owned['chain']):
+		labels[node] = 'chain[%d]' % index
+
+	## every connection into an owned node, gathered in one call
+	incoming = []
+	plugs = (mc.listConnections(nodes, s=True, d=False, c=True, p=True, fullPath=True) or []) if len(nodes) else []
+	names = {}
+	for destination, source in zip(plugs[0::2], plugs[1::2]):
+		incoming.append( (_plugLong(source, names), _plugLong(destination, names)) )
+	outgoing = []
+	unplaced = owned['external'] + owned['dg']
+	plugs = (mc.listConnections(unplaced, s=False, d=True, c=True, p=True, fullPath=True) or []) if len(unplaced) else []
+	for source, destination in zip(plugs[0::2], plugs[1::2]):
+		outgoing.append( (_plugLong(source, names), _plugLong(destination, names)) )
+
+	types = {}
+	if len(nodes):
+		found = mc.ls(nodes, showType=True, long=True) or []
+		types = dict( zip(found[0::2], found[1::2]) )
+
+	## the nodes outside the module that connect in, by their place in
+	## the world hierarchy (DAG) or their type (DG)
+	inside = set(nodes) | set(owned['chain'])
+	outside = set( x[0].partition('.')[0] for x in incoming ) - inside
+	outsideDag = mc.ls(list(outside), long=True, dag=True) or []
+	labels.update( _indexPaths(outsideDag, 'ext') )
+	for node in outside - set(outsideDag):
+		labels[node] = 'ext:%s' % mc.nodeType(node)
+
+	## registered and utility nodes get their ids from what they connect to
+	pending = list(unplaced)
+	pendingSet = set(pending)
+	while len(pending):
+		candidates = {}
+		for source, destination in outgoing + incoming:
+			sourceNode, dot, sourceAttr = source.partition('.')
+			destinationNode, dot, destinationAttr = destination.partition('.')
+			if sourceNode in pendingSet and not sourceNode in labels and destinationNode in labels:
+				key = '%s>%s.%s' % (sourceAttr, labels[destinationNode], destinationAttr)
+				candidates.setdefault(sourceNode, []).append(key)
+			if destinationNode in pendingSet and not destinationNode in labels and sourceNode in labels:
+				key = '%s.%s>%s' % (labels[sourceNode], sourceAttr, destinationAttr)
+				candidates.setdefault(destinationNode, []).append(key)
+
+		if not len(candidates):
+			break
+
+		used = set( labels.values() )
+		for node in sorted( candidates, key=lambda x: min(candidates[x]) ):
+			labels[node] = _unique( '%s(%s)' % (types.get(node) or mc.nodeType(node), min(candidates[node])), used )
+		pending = [ x for x in pending if not x in labels ]
+
+	selection = om.MSelectionList()
+	for node in nodes:
+		selection.add(node)
+	objects = {}
+	for index, node in enumerate(nodes):
+		obj = om.MObject()
+		selection.getDependNode(index, obj)
+		objects[node] = obj
+
+	## nothing connects these to anything labeled: type and content it is
+	used = set( labels.values() )
+	for node in sorted(pending):
+		nodeType = types.get(node) or mc.nodeType(node)
+		content = json.dumps( _attrValues(objects[node], nodeType, cache), sort_keys=True ).encode('utf-8')
+		labels[node] = _unique( '%s{%s}' % (nodeType, hashlib.sha1(content).hexdigest()[:12]), used )
+
+	inputs = {}
+	for source, destination in incoming:
+		sourceNode, dot, sourceAttr = source.partition('.')
+		destinationNode, dot, destinationAttr = destination.partition('.')
+		inputs.setdefault(destinationNode, []).append( '%s.%s>%s' % (labels.get(sourceNode, 'ext:?'), sourceAttr, destinationAttr) )
+
+	for key, node in sorted( (labels[x], x) for x in nodes ):
+		nodeType = types.get(node) or mc.nodeType(node)
+		parent = node.rpartition('|')[0] if node.startswith('|') else ''
+		if parent and not parent in labels:
+			labels.update( _indexPaths([parent], 'ext') )
+		yield( key, {
+			'type':nodeType,
+			'parent':labels[parent] if parent else None,
+			'attrs':_attrValues(objects[node], nodeType, cache),
+			'in':sorted( inputs.get(node, []) ),
+		} )
+
+
+## ----------------------------------------------------------------------
+def _unique(label, used):
+	unique = label
+	count = 1
+	while unique in used:
+		count += 1
+		unique = '%s#%d' % (label, count)
+	used.add(unique)
+	return(unique)
+
+
+## ----------------------------------------------------------------------
+def canonicalModule(module):
+	'''
+	canonicalModule(module):
+
+	Returns:
+
+	The module's canonical form (see the file docstring): a dict of
+	canonical node id -> record.
+	'''
+
+	return( dict( canonicalRecords(module) ) )
+
+
+## ----------------------------------------------------------------------
+def hashRecords(records):
+	## streaming hash of a canonical form, one record at a time: a dict,
+	## or (id, record) pairs in id order (canonicalRecords)
+	digest = hashlib.sha1()
+	items = sorted( records.items() ) if isinstance(records, dict) else records
+	for key, record in items:
+		digest.update( json.dumps( [ key, record ], sort_keys=True ).encode('utf-8') )
+	return( digest.hexdigest() )
+
+
+## ----------------------------------------------------------------------
+def hashModule(module):
+	return( hashRecords( canonicalRecords(module) ) )
+
+
+## ----------------------------------------------------------------------
+def captureRig(modules=None, keepRecords=True):
+	'''
+	captureRig(modules=None, keepRecords=True):
+
+	Canonical capture of the given MODULE nodes (every module in the scene
+	if None). keepRecords=False keeps only the hashes.
+
+	Returns:
+
+	A dict: { 'hash':character hash, 'modules':{ module name:{ 'hash':...,
+	'records':canonicalModule result } } }. The character hash only depends
+	on the module names and hashes.
+	'''
+
+	if modules is None:
+		from . import analysis
+		modules = analysis.findModules()
+
+	## one pass per module: records are hashed as they're read, and only
+	## kept if asked for
+	cache = {}
+	results = {}
+	for module in modules:
+		records = {}
+		def stream():
+			for key, record in canonicalRecords(module, cache):
+				if keepRecords:
+					records[key] = record
+				yield( key, record )
+		entry = { 'hash':hashRecords( stream() ) }
+		if keepRecords:
+			entry['records'] = records
+		results[ str(module).rpartition('|')[2] ] = entry
+
+	digest = hashlib.sha1()
+	for name in sorted(results):
+		digest.update( ('%s:%s;' % (name, results[name]['hash'])).encode('utf-8') )
+
+	return( { 'hash':digest.hexdigest(), 'modules':results } )
+
+
+## ----------------------------------------------------------------------
+def saveCapture(capture, path):
+	with open(path, 'w') as handle:
+		json.dump(capture, handle, sort_keys=True)
+
+
+## ----------------------------------------------------------------------
+def loadCapture(path):
+	with open(path, 'r') as handle:
+		return( json.load(handle) )
+
+
+## ----------------------------------------------------------------------
+def diffRecords(a, b):
+	## node level differences between two canonical forms
+	result = { 'added':sorted( set(b) - set(a) ), 'removed':sorted( set(a) - set(b) ), 'changed':{} }
+	for key in sorted( set(a) & set(b) ):
+		first, second = a[key], b[key]
+		changes = []
+		for field in 'type', 'parent':
+			if not first[field] == second[field]:
+				changes.append( '%s: %s -> %s' % (field, first[field], second[field]) )
+		for attr in sorted( set(first['attrs']) | set(second['attrs']) ):
+			old = first['attrs'].get(attr)
+			new = second['attrs'].get(attr)
+			if not old == new:
+				changes.append( '%s: %s -> %s' % (attr, old, new) )
+		for item in sorted( set(first['in']) - set(second['in']) ):
+			changes.append( '- %s' % item )
+		for item in sorted( set(second['in']) - set(first['in']) ):
+			changes.append( '+ %s' % item )
+		if len(changes):
+			result['changed'][key] = changes
+	return(result)
+
+
+## ----------------------------------------------------------------------
+def diffRigs(a, b):
+	'''
+	diffRigs(a, b):
+
+	Compares two captureRig results (with records). Only modules whose
+	hashes differ are compared node by node.
+
+	Returns:
+
+	A dict of module name -> diffRecords result, with None for modules that
+	only exist on one side ('added' / 'removed' keys at the top level list
+	those). Empty if the rigs match.
+	'''
+
+	results = {}
+	modulesA = a['modules']
+	modulesB = b['modules']
+	added = sorted( set(modulesB) - set(modulesA) )
+	removed = sorted( set(modulesA) - set(modulesB) )
+	for name in sorted( set(modulesA) & set(modulesB) ):
+		if modulesA[name]['hash'] == modulesB[name]['hash']:
+			continue
+		if not 'records' in modulesA[name] or not 'records' in modulesB[name]:
+			results[name] = None
+			continue
+		results[name] = diffRecords( modulesA[name]['records'], modulesB[name]['records'] )
+
+	if len(added) or len(removed):
+		results['added'] = added
+		results['removed'] = removed
+
+	return(results)
+
+
+## ----------------------------------------------------------------------
+def formatDiff(diff):
+	lines = []
+	for name in sorted( x for x in diff if not x in ('added', 'removed') ):
+		entry = diff[name]
+		lines.append( '>> %s' % name )
+		if entry is None:
+			lines.append( '\thash differs (no records captured)' )
+			continue
+		for key in entry['added']:
+			lines.append( '\t+ %s' % key )
+		for key in entry['removed']:
+			lines.append( '\t- %s' % key )
+		for key, changes in sorted( entry['changed'].items() ):
+			lines.append( '\t~ %s' % key )
+			for change in changes:
+				lines.append( '\t\t%s' % change )
+	for key in 'added', 'removed':
+		for name in diff.get(key, []):
+			lines.append( '%s %s' % ('+' if key == 'added' else '-', name) )
+	return( '\n'.join(lines) )
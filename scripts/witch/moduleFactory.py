@@ -27,6 +27,9 @@ class ModuleFactory(object):
 					and not x.count('__init') 
 					and not x.count('module_base') ]
 
+		## classes are reloaded once per factory, not on every lookup
+		self._classes = {}
+
 	## ----------------------------------------------------------------------
 
 	def __getitem__(self, key):
@@ -37,6 +40,8 @@ class ModuleFactory(object):
 
 	## ----------------------------------------------------------------------
 	def getClass(self, name):
+		if name in self._classes:
+			return(self._classes[name])
 
 		for item in self.modules:
 			modName = item.split('.')[0]
@@ -44,8 +49,13 @@ class ModuleFactory(object):
 				impmod = __import__('witch.modules.'+modName, {}, {}, [modName])
 				reload(impmod)
 				theClass = impmod.__getattribute__( modName )
+				self._classes[name] = theClass
 				return(theClass)
 
 		## class not found!
 		raise ModuleFactoryException('Class not found or unloadable: %s.' % name)
 
+	def rehydrate(self, root):
+		## read-only instance of an already built module; see ModuleBase.rehydrate
+		cType = utils.getAttrSpecial( root, 'type', prefix=module_base.PARAM_PREFIX )
+		return( self.getClass(cType).rehydrate(root) )
@@ -13,35 +13,177 @@ from .module_base import ModuleBase, ModuleBaseException
 
 	A module for building a simple IK control on a single bone chain.
 
+	There's no IK solver: with one bone, IK is just an aim. The bone's
+	rotation comes from an aimMatrix node (aimed at the ik control, with
+	the twist taken from an up control or the chain's rest orientation),
+	which is cheaper to evaluate than an ikHandle and scales to hundreds
+	of instances (pistons, say). Maya versions without aimMatrix (before
+	2022) get an aimConstraint instead.
+
+	The ik control follows the goal input; the bone stretches to reach it
+	when the stretch param is on (blend it off with the control's stretch
+	attribute). The tip joint takes the control's rotation.
+
 '''
 
+## cached: allNodeTypes is slow
+_aimMatrix = None
+
+def hasAimMatrix():
+	global _aimMatrix
+	if _aimMatrix is None:
+		_aimMatrix = 'aimMatrix' in (mc.allNodeTypes() or [])
+	return(_aimMatrix)
+
+
+## ----------------------------------------------------------------------
+def _normalize(v):
+	length = sum( x * x for x in v ) ** 0.5
+	if length < 1e-9:
+		raise ModuleBaseException('OneBoneIK: zero length bone.')
+	return( [ x / length for x in v ] )
+
+
+## ----------------------------------------------------------------------
 class OneBoneIK(ModuleBase):
 	_defaultToken = 'ONEBONEIK'
 	_module_type = 'OneBoneIK'
 	_minChainLength = 2
 	_maxChainLength = 2
 	_defaultControllerType = 'cube'
-	_defaultRotationOrder = 'zxy'	 
+	_defaultRotationOrder = 'zxy'
 	_usesGoal = True
 
 	def __init__(self, *args):
 		super(OneBoneIK, self).__init__(*args)
 
-	## commenting out for now; will fill in later
-	# def build(self, **kwargs):
-	# 	pass
-
-	# def validate(self):
-	# 	result = super(OneBoneIK, self).validate()
-	# 	return( result )
-
-	def postbuild(self):
-		pass
+	def build(self, **kwargs):
+		self.pushState()
+
+		self.createModule()
+		self.ikChain = self.createRigChain('IK', 2.0)
+		base, tip = [ str(x) for x in self.ikChain ]
+		rigRoot = str( self.ikChain[0].getParent() )
+
+		self.connectChains( self.ikChain, self.chain )
+
+		## the bone in the base joint's space; with the rig chain's rotations
+		## frozen, that's also rigRoot space
+		rest = list( mc.getAttr(tip+'.translate')[0] )
+		length = sum( x * x for x in rest ) ** 0.5
+		aim = _normalize(rest)
+		axis = min( range(3), key=lambda x: abs(aim[x]) )
+		## up: the local axis furthest from the bone, made perpendicular to it
+		up = [ 1.0 if x == axis else 0.0 for x in range(3) ]
+		dot = sum( a * b for a, b in zip(aim, up) )
+		up = _normalize( [ u - a * dot for u, a in zip(up, aim) ] )
+
+		## controls
+		con = self.createControl('ik', 'goal', tip, side=self['side'])
+		self.constrainTransform(self['goalInput'], self.getZero('ik', 0), mo=True)
+
+		upCon = None
+		if self['upVector']:
+			matrix = mc.xform(rigRoot, q=True, ws=True, m=True)
+			worldUp = [ sum( up[row] * matrix[row*4+column] for row in range(3) ) for column in range(3) ]
+			target = mc.createNode('transform')
+			mc.xform(target, ws=True, m=matrix)
+			mc.xform(target, ws=True, t=[ p + u * length for p, u in zip(matrix[12:15], worldUp) ])
+			upCon = self.createControl('ik', 'up', target, side=self['side'])
+			mc.delete(target)
+			utils.lock(upCon, r=True, s=True, v=True)
+
+		nodes = []
+		if hasAimMatrix():
+			aimer = mc.createNode('aimMatrix', name=self.makeName('#t_#s_aim_AIM', upper=True))
+			mc.connectAttr(rigRoot+'.worldMatrix[0]', aimer+'.inputMatrix')
+			mc.setAttr(aimer+'.primaryInputAxis', *aim)
+			mc.setAttr(aimer+'.primaryMode', 1)
+			mc.connectAttr(str(con)+'.worldMatrix[0]', aimer+'.primaryTargetMatrix')
+			mc.setAttr(aimer+'.secondaryInputAxis', *up)
+			if upCon is not None:
+				## aim the up axis at the up control
+				mc.setAttr(aimer+'.secondaryMode', 1)
+				mc.connectAttr(str(upCon)+'.worldMatrix[0]', aimer+'.secondaryTargetMatrix')
+			else:
+				## keep the up axis where the chain's rest has it
+				mc.setAttr(aimer+'.secondaryMode', 2)
+				mc.setAttr(aimer+'.secondaryTargetVector', *up)
+				mc.connectAttr(rigRoot+'.worldMatrix[0]', aimer+'.secondaryTargetMatrix')
+
+			local = mc.createNode('multMatrix', name=self.makeName('#t_#s_aim_MULT', upper=True))
+			mc.connectAttr(aimer+'.outputMatrix', local+'.matrixIn[0]')
+			mc.connectAttr(base+'.parentInverseMatrix[0]', local+'.matrixIn[1]')
+			decompose = mc.createNode('decomposeMatrix', name=self.makeName('#t_#s_aim_DECOMP', upper=True))
+			mc.connectAttr(local+'.matrixSum', decompose+'.inputMatrix')
+			mc.connectAttr(base+'.rotateOrder', decompose+'.inputRotateOrder')
+			mc.setAttr(base+'.jointOrient', 0, 0, 0)
+			mc.connectAttr(decompose+'.outputRotate', base+'.rotate', force=True)
+			nodes += [aimer, local, decompose]
+		else:
+			if upCon is not None:
+				mc.aimConstraint(str(con), base, aimVector=aim, upVector=up, worldUpType='object', worldUpObject=str(upCon))
+			else:
+				mc.aimConstraint(str(con), base, aimVector=aim, upVector=up, worldUpType='objectrotation',
+					worldUpVector=up, worldUpObject=rigRoot)
+
+		self.constrain(con, self.ikChain[1], type='orient', mo=True)
+
+		if self['stretch']:
+			## distance to the control in rigRoot space, so the rig's scale
+			## doesn't count as stretch
+			mc.addAttr(str(con), ln='stretch', at='float', min=0, max=1, dv=1, k=True)
+
+			space = mc.createNode('multMatrix', name=self.makeName('#t_#s_stretch_SPACE', upper=True))
+			mc.connectAttr(str(con)+'.worldMatrix[0]', space+'.matrixIn[0]')
+			mc.connectAttr(rigRoot+'.worldInverseMatrix[0]', space+'.matrixIn[1]')
+			distance = mc.createNode('distanceBetween', name=self.makeName('#t_#s_stretch_DIST', upper=True))
+			mc.connectAttr(space+'.matrixSum', distance+'.inMatrix2')
+
+			ratio = mc.createNode('multiplyDivide', name=self.makeName('#t_#s_stretch_RATIO', upper=True))
+			mc.setAttr(ratio+'.operation', 2)
+			mc.connectAttr(distance+'.distance', ratio+'.input1X')
+			mc.setAttr(ratio+'.input2X', length)
+
+			## stretch only; the bone never gets shorter than its rest
+			limit = mc.createNode('clamp', name=self.makeName('#t_#s_stretch_CLAMP', upper=True))
+			mc.setAttr(limit+'.minR', 1.0)
+			mc.setAttr(limit+'.maxR', 1e6)
+			mc.connectAttr(ratio+'.outputX', limit+'.inputR')
+
+			blend = mc.createNode('blendColors', name=self.makeName('#t_#s_stretch_BLEND', upper=True))
+			mc.connectAttr(str(con)+'.stretch', blend+'.blender')
+			mc.connectAttr(limit+'.outputR', blend+'.color1R')
+			mc.setAttr(blend+'.color2R', 1.0)
+
+			scale = mc.createNode('multiplyDivide', name=self.makeName('#t_#s_stretch_MULT', upper=True))
+			mc.setAttr(scale+'.input1', *rest)
+			for axis in 'XYZ':
+				mc.connectAttr(blend+'.outputR', scale+'.input2'+axis)
+			mc.connectAttr(scale+'.output', tip+'.translate', force=True)
+
+			nodes += [space, distance, ratio, limit, blend, scale]
+
+		self.registerNodes(nodes)
+		utils.lock(con, s=True, v=True)
+
+		self.popState()
 
 	def calculateDefaults(self):
-		pass
-
+		## no fk controls
+		self.registerControllerCategory('ik')
 
+	def createParams(self):
+		super(OneBoneIK, self).createParams()
 
+		params = [
+			{ 'name':'stretch', 'type':'bool', 'value':True },
+			{ 'name':'upVector', 'type':'bool', 'value':False },
+		]
 
+		for param in params:
+			name = param.pop('name')
+			self.setParam(name, preserveValue=True, **param)
 
+	def postbuild(self):
+		pass
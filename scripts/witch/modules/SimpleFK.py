@@ -40,12 +40,9 @@ class SimpleFK(ModuleBase):
 			if not self['addControlToTip']:
 				targetControls.pop(-1)
 
-		for index, item in enumerate( targetControls ):
-			name = item.partition("_")[0]
-			con = self.createControl('fk', name, item, constrain='parent')
-			utils.lock(con, s=True, v=True)
-			if self.numControls('fk') > 1:
-				pm.parent(self.getZero('fk', index), self.getControl('fk', index-1))
+		names = [ item.partition("_")[0] for item in targetControls ]
+		cons = self.createControls('fk', names, targetControls, constrain='parent', chain=True)
+		utils.lock(cons, s=True, v=True)
 
 		self.popState()
 
@@ -0,0 +1,313 @@
+import maya
+from maya import cmds as mc
+import pymel.core as pm
+
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
+from witch import utils
+
+from .module_base import ModuleBase, ModuleBaseException
+
+## ----------------------------------------------------------------------
+'''
+
+	SPLINECHAIN.PY
+
+	A module for long chains (tails, cables, tentacles) driven by a handful
+	of controls instead of one per joint.
+
+	A B-spline with numControls CVs is fitted to the chain (least squares
+	over the joints' chord length parameters, ends pinned to the first and
+	last joint), and each control drives one CV. The rig chain follows the
+	curve through an ikSplineHandle, with twist taken from the first and
+	last control. With stretch on, the chain scales to the curve's length.
+
+	Each control's up (y) axis is the joints' own rest up axis, interpolated
+	at the control's Greville parameter over the joints' chord length
+	parameters (restUps), so the end controls' twist matches the rest pose
+	however the chain bends. The joints keep their rest orientation; posing
+	them is left to the ikSplineSolver.
+
+	The fit, the control frames and the twist axes are worked out for the
+	whole chain at once with numpy, so build time hardly depends on the
+	chain length. Needs numpy (validate() says so if it's missing).
+
+'''
+
+## ----------------------------------------------------------------------
+def knotVector(count, degree):
+	## clamped, uniform; the full de Boor vector (count + degree + 1 knots)
+	spans = count - degree
+	interior = [ float(x) / spans for x in range(1, spans) ]
+	return( np.array( [0.0] * (degree+1) + interior + [1.0] * (degree+1) ) )
+
+
+## ----------------------------------------------------------------------
+def basis(u, knots, degree):
+	'''
+	basis(u, knots, degree):
+
+	Cox-de Boor, for every parameter in u at once.
+
+	Returns:
+
+	A (len(u), len(knots) - degree - 1) array of basis function values.
+	'''
+
+	u = np.clip( np.asarray(u, dtype=np.float64), knots[0], knots[-1] - 1e-9 )[:, None]
+	values = ( (knots[:-1] <= u) & (u < knots[1:]) ).astype(np.float64)
+
+	def ratio(top, bottom):
+		with np.errstate(divide='ignore', invalid='ignore'):
+			return( np.where( bottom > 0.0, top / np.where(bottom > 0.0, bottom, 1.0), 0.0 ) )
+
+	for d in range(1, degree+1):
+		left = ratio( u - knots[:-(d+1)], knots[d:-1] - knots[:-(d+1)] )
+		right = ratio( knots[d+1:] - u, knots[d+1:] - knots[1:-d] )
+		values = left * values[:, :-1] + right * values[:, 1:]
+
+	return(values)
+
+
+## ----------------------------------------------------------------------
+def fitSpline(points, count, degree=3):
+	'''
+	fitSpline(points, count, degree=3):
+
+	Least squares B-spline through points (an (N, 3) array) with count CVs,
+	the first and last CV pinned to the first and last point. degree drops
+	to count - 1 for fewer than degree + 1 CVs.
+
+	Returns:
+
+	(cvs, knots, degree, parameters): the (count, 3) CVs, the full knot
+	vector, the degree used and each point's (chord length) parameter.
+	'''
+
+	points = np.asarray(points, dtype=np.float64)
+	degree = min(degree, count - 1)
+
+	lengths = np.linalg.norm( np.diff(points, axis=0), axis=1 )
+	parameters = np.concatenate( [ [0.0], np.cumsum(lengths) ] ) / lengths.sum()
+
+	knots = knotVector(count, degree)
+	weights = basis(parameters, knots, degree)
+
+	cvs = np.empty( (count, 3) )
+	cvs[0] = points[0]
+	cvs[-1] = points[-1]
+	if count > 2:
+		rest = points - np.outer(weights[:, 0], cvs[0]) - np.outer(weights[:, -1], cvs[-1])
+		cvs[1:-1] = np.linalg.lstsq(weights[:, 1:-1], rest, rcond=None)[0]
+
+	return( (cvs, knots, degree, parameters) )
+
+
+## ----------------------------------------------------------------------
+def tangents(u, cvs, knots, degree, step=1e-4):
+	## unit tangents of the spline at every parameter in u (central differences)
+	u = np.asarray(u, dtype=np.float64)
+	ahead = basis( np.clip(u + step, 0.0, 1.0), knots, degree ).dot(cvs)
+	behind = basis( np.clip(u - step, 0.0, 1.0), knots, degree ).dot(cvs)
+	result = ahead - behind
+	return( result / np.linalg.norm(result, axis=1)[:, None] )
+
+
+## ----------------------------------------------------------------------
+def restUps(u, parameters, axes):
+	'''
+	restUps(u, parameters, axes):
+
+	The joints' rest up axes (axes, (N, 3), one per joint at its chord
+	length parameter) interpolated at every parameter in u. Axes that
+	flip sign from one joint to the next are turned around first.
+
+	Returns:
+
+	A (len(u), 3) array of unit vectors.
+	'''
+
+	axes = np.array(axes, dtype=np.float64)
+	flips = np.concatenate( [ [1.0], np.sign( np.sum(axes[1:] * axes[:-1], axis=1) ) ] )
+	axes *= np.cumprod( np.where(flips == 0.0, 1.0, flips) )[:, None]
+
+	result = np.stack( [ np.interp(u, parameters, axes[:, x]) for x in range(3) ], axis=1 )
+	return( result / np.linalg.norm(result, axis=1)[:, None] )
+
+
+## ----------------------------------------------------------------------
+def frames(positions, aims, ups):
+	'''
+	frames(positions, aims, ups):
+
+	Row vector matrices (x along aims, y as close to ups as it can be, z
+	completing a right handed frame) for every position. ups is one vector
+	for every frame, or one per frame.
+
+	Returns:
+
+	An (N, 4, 4) array.
+	'''
+
+	aims = np.asarray(aims, dtype=np.float64)
+	ups = np.broadcast_to( np.asarray(ups, dtype=np.float64), aims.shape )
+	ups = ups - aims * np.sum(aims * ups, axis=1)[:, None]
+	ups /= np.linalg.norm(ups, axis=1)[:, None]
+	sides = np.cross(aims, ups)
+
+	result = np.zeros( (len(aims), 4, 4) )
+	result[:, 0, :3] = aims
+	result[:, 1, :3] = ups
+	result[:, 2, :3] = sides
+	result[:, 3, :3] = positions
+	result[:, 3, 3] = 1.0
+	return(result)
+
+
+## ----------------------------------------------------------------------
+def _closestAxis(matrix, vector):
+	## (axis index, sign) of the row of a 4x4 matrix closest to vector
+	dots = matrix[:3, :3].dot(vector)
+	index = int( np.argmax( np.abs(dots) ) )
+	return( (index, 1 if dots[index] >= 0.0 else -1) )
+
+
+## ----------------------------------------------------------------------
+class SplineChain(ModuleBase):
+	_defaultToken = 'SPLINECHAIN'
+	_module_type = 'SplineChain'
+	_minChainLength = 3
+	_defaultControllerType = 'circle'
+
+	def __init__(self, *args):
+		super(SplineChain, self).__init__(*args)
+
+	def build(self, **kwargs):
+		self.pushState()
+
+		self.createModule()
+		self.splineChain = self.createRigChain('SPL', 1.0)
+		joints = [ str(x) for x in self.splineChain ]
+		rigRoot = str( self.splineChain[0].getParent() )
+
+		self.connectChains( self.splineChain, self.chain )
+
+		## one query for the whole chain
+		points = np.array( mc.xform(joints, q=True, ws=True, t=True) ).reshape(-1, 3)
+		jointMatrices = np.array( mc.xform(joints, q=True, ws=True, m=True) ).reshape(-1, 4, 4)
+		rootMatrix = jointMatrices[0]
+
+		count = int(self['numControls'])
+		cvs, knots, degree, parameters = fitSpline(points, count)
+
+		## control frames at the CVs' Greville parameters. The up axis is the
+		## root joint's axis furthest from the chain's start direction; each
+		## control takes the joints' own rest up there, so it doesn't flip
+		## on chains that don't lie in a plane
+		greville = np.array( [ knots[x+1:x+degree+1].mean() for x in range(count) ] )
+		aims = tangents(greville, cvs, knots, degree)
+		axis = int( np.argmin( np.abs( rootMatrix[:3, :3].dot(aims[0]) ) ) )
+		ups = restUps(greville, parameters, jointMatrices[:, axis, :3])
+		matrices = frames(cvs, aims, ups)
+
+		## controls, placed from temporary targets
+		targets = []
+		for matrix in matrices:
+			target = mc.createNode('transform')
+			mc.xform(target, ws=True, m=matrix.flatten().tolist())
+			targets.append(target)
+		cons = self.createControls('spline', 'spline', targets, side=self['side'])
+		mc.delete(targets)
+
+		## the curve lives in world space under extras; each control drives a CV
+		curve = mc.curve( d=degree, p=cvs.tolist(), k=knots[1:-1].tolist(),
+			n=self.makeName('#t_#s_spline_CRV', upper=True) )
+		curve = mc.parent(curve, str(self.extras), r=True)[0]
+		mc.setAttr(curve+'.inheritsTransform', False)
+		shape = mc.listRelatives(curve, s=True, f=True)[0]
+
+		nodes = []
+		for index, con in enumerate(cons):
+			decompose = mc.createNode('decomposeMatrix', name=str(con)+'_CV')
+			mc.connectAttr(str(con)+'.worldMatrix[0]', decompose+'.inputMatrix')
+			mc.connectAttr(decompose+'.outputTranslate', '%s.controlPoints[%d]' % (shape, index))
+			nodes.append(decompose)
+
+		handle = mc.ikHandle( sj=joints[0], ee=joints[-1], sol='ikSplineSolver', c=curve, ccv=False, pcv=False,
+			n=self.makeName('#t_#s_spline_IKH', upper=True) )[0]
+		mc.parent(handle, str(self.extras))
+
+		## twist from the end controls: their y axis is the chain's up
+		forward, forwardSign = _closestAxis(rootMatrix, aims[0])
+		upAxis, upSign = _closestAxis(rootMatrix, matrices[0, 1, :3])
+		mc.setAttr(handle+'.dTwistControlEnable', True)
+		mc.setAttr(handle+'.dWorldUpType', 4)
+		mc.setAttr(handle+'.dForwardAxis', forward * 2 + (0 if forwardSign > 0 else 1))
+		mc.setAttr(handle+'.dWorldUpAxis', { 1:0, 2:3, 0:6 }[upAxis] + (0 if upSign > 0 else 1))
+		mc.setAttr(handle+'.dWorldUpVector', 0, 1, 0)
+		mc.setAttr(handle+'.dWorldUpVectorEnd', 0, 1, 0)
+		mc.connectAttr(str(cons[0])+'.worldMatrix[0]', handle+'.dWorldUpMatrix')
+		mc.connectAttr(str(cons[-1])+'.worldMatrix[0]', handle+'.dWorldUpMatrixEnd')
+
+		if self['stretch']:
+			## curve length over rest length, with the rig's own scale taken out
+			info = mc.createNode('curveInfo', name=self.makeName('#t_#s_spline_INFO', upper=True))
+			mc.connectAttr(shape+'.worldSpace[0]', info+'.inputCurve')
+			scale = mc.createNode('decomposeMatrix', name=self.makeName('#t_#s_spline_SCALE', upper=True))
+			mc.connectAttr(rigRoot+'.worldMatrix[0]', scale+'.inputMatrix')
+
+			rest = mc.createNode('multiplyDivide', name=self.makeName('#t_#s_spline_REST', upper=True))
+			mc.setAttr(rest+'.input1X', mc.getAttr(info+'.arcLength') / mc.getAttr(scale+'.outputScaleX'))
+			mc.connectAttr(scale+'.outputScaleX', rest+'.input2X')
+
+			ratio = mc.createNode('multiplyDivide', name=self.makeName('#t_#s_spline_RATIO', upper=True))
+			mc.setAttr(ratio+'.operation', 2)
+			mc.connectAttr(info+'.arcLength', ratio+'.input1X')
+			mc.connectAttr(rest+'.outputX', ratio+'.input2X')
+			nodes += [info, scale, rest, ratio]
+
+			for joint in joints[1:]:
+				stretch = mc.createNode('multiplyDivide', name=joint.rpartition('|')[2]+'_stretch')
+				mc.setAttr(stretch+'.input1', *mc.getAttr(joint+'.translate')[0])
+				for axis in 'XYZ':
+					mc.connectAttr(ratio+'.outputX', stretch+'.input2'+axis)
+				mc.connectAttr(stretch+'.output', joint+'.translate', force=True)
+				nodes.append(stretch)
+
+		self.registerNodes(nodes)
+		utils.lock(cons, s=True, v=True)
+
+		self.popState()
+
+	def calculateDefaults(self):
+		## spline controls only
+		self.registerControllerCategory('spline')
+
+	def createParams(self):
+		super(SplineChain, self).createParams()
+
+		params = [
+			{ 'name':'numControls', 'type':'long', 'value':4, 'min':2 },
+			{ 'name':'stretch', 'type':'bool', 'value':True },
+		]
+
+		for param in params:
+			name = param.pop('name')
+			self.setParam(name, preserveValue=True, **param)
+
+	def validate(self):
+		if not super(SplineChain, self).validate():
+			return(False)
+
+		if np is None:
+			self._message = 'SplineChain needs numpy.'
+			return(False)
+
+		if not 2 <= self['numControls'] <= self.chainLength:
+			self._message = 'numControls has to be between 2 and the chain length (%d).' % self.chainLength
+			return(False)
+
+		return(True)
@@ -49,6 +49,28 @@ class ModuleBaseException(Exception):
 ## constants
 PARAM_PREFIX = 'WT'
 
+## params that setParam doesn't copy to a module's mirror partner
+MIRROR_SKIP_PARAMS = [ 'side' ]
+
+## seams a module can have, and how far a recorded seam offset can drift
+## before reconcileSeams redoes the seam
+SEAMS = [ 'root', 'goal' ]
+SEAM_TOLERANCE = 1e-4
+
+## ----------------------------------------------------------------------
+
+def mirrorPartnerOf(root):
+	## the root a root is mirrored with (see symmetry.py), or None
+	root = str(root)
+	if mc.attributeQuery('mirrorOf', node=root, exists=True):
+		found = mc.listConnections(root+'.mirrorOf', s=True, d=False)
+		if found:
+			return(found[0])
+	for plug in mc.listConnections(root+'.message', s=False, d=True, p=True) or []:
+		if plug.endswith('.mirrorOf'):
+			return( plug.partition('.')[0] )
+	return(None)
+
 ## ----------------------------------------------------------------------
 
 class ModuleBase(object):
@@ -63,25 +85,14 @@ class ModuleBase(object):
 	_isIkFk = False
 	_usesRoot = True		## this is turned off for special modules, like GOD
 	_usesGoal = False
+	_defaultControlLayout = 'zero'	## 'zero' groups or 'offset' parent matrices
+	_defaultConstraintMode = 'standard'	## 'standard' constraint nodes or 'matrix' networks
+	_defaultSharedShapes = False	## controls instance one master curve per shape
 
 	## ----------------------------------------------------------------------
 	## python-y methods
 	def __init__(self, *args):
-		self._message = None
-		
-		## different types of controls with their own Param collections
-		self._controllerCategories = []
-
-		## these are targets for constraints
-		self._inputs = {}
-		
-		## these are automatically populated if the module author uses
-		## the createControl function in the module and not in utils
-		## these are sorted into list bins by category, IE, self._controlers['fk']
-		self._controllers = {}
-		self._controllerZeros = {}
-
-		self.module = self.rig = self.controls = self.extras = None
+		self._resetState()
 
 		## grab the chain
 		oblist = utils.makeList(args, type='joint')
@@ -99,8 +110,98 @@ class ModuleBase(object):
 		self.calculateDefaults()
 		self.createParams()
 
-		##!FIXME: If the module already exists, pull info from the extant nodes
-		## If it doesn't exist, create the base parts
+		## To inspect a module that's already built without touching the
+		## scene, use rehydrate() instead of the constructor.
+
+	def _resetState(self):
+		self._message = None
+		
+		## different types of controls with their own Param collections
+		self._controllerCategories = []
+
+		## these are targets for constraints
+		self._inputs = {}
+		
+		## these are automatically populated if the module author uses
+		## the createControl function in the module and not in utils
+		## these are sorted into list bins by category, IE, self._controlers['fk']
+		self._controllers = {}
+		self._controllerZeros = {}
+
+		self.module = self.rig = self.controls = self.extras = None
+
+	@classmethod
+	def rehydrate(cls, root):
+		'''
+		rehydrate(root):
+
+		Read-only constructor for a module that's already built. Rebuilds the
+		instance (module, controls, rig, extras, inputs, controllers and
+		zeros) from the MODULE node's message links and the controls'
+		con_index / con_category attributes. Unlike the constructor, nothing
+		in the scene is written: no rig root, params or segment scale changes.
+		'''
+
+		root = str(root)
+		instance = cls.__new__(cls)
+		instance._resetState()
+
+		module = mc.listConnections(root+'.module', s=True, d=False) if \
+			mc.attributeQuery('module', node=root, exists=True) else None
+		if not module:
+			raise ModuleBaseException('rehydrate: %s has no built module.' % root)
+		module = module[0]
+
+		def links(attr):
+			## multi message attrs come back in index order
+			plugs = mc.listConnections('%s.%s' % (module, attr), s=True, d=False, c=True, p=False) or []
+			pairs = zip(plugs[0::2], plugs[1::2])
+			index = lambda plug: int(plug.rpartition('[')[2].rstrip(']')) if plug.endswith(']') else 0
+			return( [ node for plug, node in sorted(pairs, key=lambda x: index(x[0])) ] )
+
+		instance.module = pm.PyNode(module)
+		instance.chain = [ pm.PyNode(x) for x in links('chain') ] or [ pm.PyNode(root) ]
+		instance.rigRoot = instance.chain[0].getParent()
+
+		for attr in 'controls', 'rig', 'extras':
+			found = links(attr)
+			setattr( instance, attr, pm.PyNode(found[0]) if len(found) else None )
+
+		## categories and inputs come from the params on the root
+		prefix = PARAM_PREFIX + '_'
+		for attr in mc.listAttr(root, ud=True) or []:
+			if not attr.startswith(prefix) or attr.count('.'):
+				continue
+			name = attr[len(prefix):]
+			if name.endswith('ControllerType'):
+				instance.registerControllerCategory( name[:-len('ControllerType')] )
+			elif name.endswith('Input'):
+				found = mc.listConnections('%s.%s' % (root, attr), s=True, d=False) or []
+				if len(found):
+					instance._inputs[ name[:-len('Input')] ] = pm.PyNode(found[0])
+
+		if instance.controls is not None:
+			offsetLayout = instance.controlLayout == 'offset'
+			found = {}
+			for node in mc.listRelatives(str(instance.controls), ad=True, type='transform', f=True) or []:
+				if not mc.attributeQuery('con_index', node=node, exists=True):
+					continue
+				category = mc.getAttr(node+'.con_category') if \
+					mc.attributeQuery('con_category', node=node, exists=True) else None
+				if not category in instance._controllers:
+					## controls from before categories were recorded
+					category = instance._controllerCategories[0] if len(instance._controllerCategories) else 'fk'
+					if not category in instance._controllers:
+						instance.registerControllerCategory(category)
+				found.setdefault(category, []).append( (mc.getAttr(node+'.con_index'), node) )
+
+			for category, items in found.items():
+				for index, node in sorted(items):
+					control = pm.PyNode(node)
+					instance._controllers[category].append(control)
+					instance._controllerZeros[category].append( control if offsetLayout else control.getParent() )
+
+		return(instance)
 
 	def __str__(self):
 		joints = 's' if self.chainLength > 1 else ''
@@ -127,6 +228,9 @@ class ModuleBase(object):
 		return(self._controllers[category][index])
 
 	def getZero(self, category, index):
+		## The node holding the control's rest transform: its zero group,
+		## or the control itself when the module uses the offset layout.
+		## Either way, parent things to this to move the control's rest.
 		return(self._controllerZeros[category][index])
 
 	def numControls(self, category):
@@ -156,6 +260,9 @@ class ModuleBase(object):
 			{ 'name':'type', 'type':'string', 'value':self._module_type },
 			{ 'name':'token', 'type':'string', 'value':self._defaultToken },
 			{ 'name':'hideModule', 'type':'bool', 'value':False },
+			{ 'name':'controlLayout', 'type':'enum', 'enumName':'zero:offset', 'value':self._defaultControlLayout },
+			{ 'name':'constraintMode', 'type':'enum', 'enumName':'standard:matrix', 'value':self._defaultConstraintMode },
+			{ 'name':'sharedShapes', 'type':'bool', 'value':self._defaultSharedShapes },
 		]
 
 		## This is the simplest way to identify rig module chain roots in the scene
@@ -176,35 +283,11 @@ class ModuleBase(object):
 		pass
 
 	def seamGoal(self):
-		goalParent = utils.getParentAttr(self.root, 'goal')
-		if goalParent is not None and self['goalInput'] is not None:
-			##!FIXME: 	offer other types of constraining apart from parent / scale?
-			##			This could mean that the constraint listing below wouldn't 
-			##			work if the constraint were more exotic
-
-			## clean out prior constraints
-			oldCnsts = self['goalInput'].getChildren(type='constraint')
-			for item in oldCnsts:
-				pm.delete(item)
-
-			self.constrain(goalParent, self['goalInput'], mo=True, type='parent')
-			self.constrain(goalParent, self['goalInput'], mo=True, type='scale')
+		## only redone if the goal parent or offset changed (see seamStatus)
+		reconcileSeams([self], seams=['goal'])
 
 	def seamRoot(self):
-		rootParent = utils.getParentAttr(self.root, 'root')
-		if rootParent is not None and self['rootInput'] is not None:
-			##!FIXME: 	Offer other types of constraining apart from parent / scale?
-			##			This could mean that the constraint listing below wouldn't 
-			##			work if the constraint were more exotic, and I'll have to
-			##			keep track of constraint nodes
-
-			## clean out prior constraints
-			oldCnsts = self['rootInput'].getChildren(type='constraint')
-			for item in oldCnsts:
-				pm.delete(item)
-
-			self.constrain(rootParent, self['rootInput'], mo=True, type='parent')
-			self.constrain(rootParent, self['rootInput'], mo=True, type='scale')
+		reconcileSeams([self], seams=['root'])
 
 	def validate(self):
 		if not self._minChainLength == 0 and self.chainLength < self._minChainLength:
@@ -229,6 +312,14 @@ class ModuleBase(object):
 	def chainLength(self):
 		return len(self.chain)
 
+	@property ## readonly
+	def constraintMode(self):
+		return( self.getParam('constraintMode') or self._defaultConstraintMode )
+
+	@property ## readonly
+	def controlLayout(self):
+		return( self.getParam('controlLayout') or self._defaultControlLayout )
+
 	@property ## readonly
 	def root(self):
 		if self.chainLength:
@@ -247,7 +338,38 @@ class ModuleBase(object):
 		for ob in oblist:
 			if not ob.hasAttr('module'):
 				ob.addAttr('module', at='message')
-			self.module.message >> ob.module
+			if not self.module.message.isConnectedTo(ob.module):
+				self.module.message >> ob.module
+
+	def applySeam(self, seam, clean=True):
+		## Redoes one seam ('root' or 'goal') from scratch and records its
+		## source, offset and constraint mode on the input for seamStatus.
+		## clean=False skips removing the old constraints, for callers that
+		## already did (reconcileSeams does them all at once).
+		target = self[seam+'Input']
+		if target is None:
+			return
+		target = str(target)
+		if clean:
+			utils.removeConstraints(target)
+
+		parent = utils.getParentAttr(self.root, seam)
+		if parent is None:
+			for attr in 'seamSource', 'seamOffset', 'seamMode':
+				if mc.attributeQuery(attr, node=target, exists=True):
+					mc.deleteAttr(target+'.'+attr)
+			return
+
+		parent = str(parent)
+		self.constrainTransform(parent, target, mo=True)
+
+		if not mc.attributeQuery('seamOffset', node=target, exists=True):
+			mc.addAttr(target, ln='seamSource', at='message')
+			mc.addAttr(target, ln='seamOffset', dt='matrix')
+			mc.addAttr(target, ln='seamMode', dt='string')
+		mc.connectAttr(parent+'.message', target+'.seamSource', force=True)
+		mc.setAttr(target+'.seamOffset', self._seamOffset(target, parent), type='matrix')
+		mc.setAttr(target+'.seamMode', self.constraintMode, type='string')
 
 	def calculateSide(self):
 		if self.root is None:
@@ -260,6 +382,13 @@ class ModuleBase(object):
 	def connectChains(self, *args, **kwargs):
 		## pass in the roots to connect
 		## arguments to args are expected to be lists or tuples
+		##
+		## The last chain is the target. With one source chain, each joint's
+		## translate, rotate and scale are connected as compound plugs.
+		## With more, the sources are blended by a single weight going from
+		## 0 (first chain) to N-1 (last chain): pass an existing plug as
+		## weight='node.attr', or a chainBlend attribute is added to the module.
+		## Returns the weight plug (None for a direct connection).
 
 		chains = []
 		for arg in args:
@@ -276,22 +405,73 @@ class ModuleBase(object):
 
 		targetChain = chains.pop(-1)
 
+		## because we checked earlier the rigRoots should be present at this point.
+		## Rig chain roots all share the chain's rest transform, so the first
+		## one is enough to place the target root when blending.
+		sourceRoot = chains[0][0].getParent()
+		targetRoot = targetChain[0].getParent()
+
 		if len(chains) == 1:
 			## direct connection
 			for source, target in zip(chains[0], targetChain ):
 				for attr in 'translate','rotate','scale':
-					for axis in 'XYZ':
-						source.attr(attr+axis) >> target.attr(attr+axis)
+					mc.connectAttr( '%s.%s' % (source, attr), '%s.%s' % (target, attr), force=True )
 
-			## because we checked earlier the rigRoots should be present at this point
-			sourceRoot = chains[0][0].getParent()
-			targetRoot = targetChain[0].getParent()
+			self.registerNodes( self.constrainTransform(sourceRoot, targetRoot, mo=True) )
+			return(None)
 
-			pm.parentConstraint(sourceRoot, targetRoot, mo=True)
-			pm.scaleConstraint(sourceRoot, targetRoot, mo=True)
-
-		else:
-			raise NotImplementedError("Multiple chains aren't finished yet, sorry.")
+		weight = kwargs.get('weight', None)
+		if weight is None:
+			if self.module is None:
+				raise ModuleBaseException('connectChains: blending needs a weight plug or a created module.')
+			if not self.module.hasAttr('chainBlend'):
+				self.module.addAttr('chainBlend', at='float', min=0, max=len(chains)-1, dv=0, k=True)
+			weight = '%s.chainBlend' % self.module
+
+		## one shared 0-1 weight per blend stage: stage k fades chain k in
+		## over the weight range [k-1, k]
+		stages = []
+		for index in range(1, len(chains)):
+			stage = mc.createNode( 'remapValue', name=self.makeName('#t_#s_chainBlend%d_REMAP' % index, upper=True) )
+			mc.connectAttr(weight, stage+'.inputValue')
+			mc.setAttr(stage+'.inputMin', index-1)
+			mc.setAttr(stage+'.inputMax', index)
+			stages.append(stage)
+
+		nodes = stages[:]
+		for joints in zip(*(chains + [targetChain])):
+			sources = [ str(x) for x in joints[:-1] ]
+			target = str(joints[-1])
+
+			translate, rotate, scale = [ '%s.%s' % (sources[0], x) for x in ('translate', 'rotate', 'scale') ]
+			for source, stage in zip(sources[1:], stages):
+				## pairBlend does translate and rotate (as quaternions) in one
+				## node, blendColors handles scale
+				pair = mc.createNode('pairBlend', name=target.rpartition('|')[2]+'_chainBlend')
+				mc.setAttr(pair+'.rotInterpolation', 1)
+				mc.connectAttr(target+'.rotateOrder', pair+'.rotateOrder')
+				mc.connectAttr(stage+'.outValue', pair+'.weight')
+				mc.connectAttr(translate, pair+'.inTranslate1')
+				mc.connectAttr(rotate, pair+'.inRotate1')
+				mc.connectAttr(source+'.translate', pair+'.inTranslate2')
+				mc.connectAttr(source+'.rotate', pair+'.inRotate2')
+
+				blend = mc.createNode('blendColors', name=target.rpartition('|')[2]+'_chainBlendScale')
+				mc.connectAttr(stage+'.outValue', blend+'.blender')
+				mc.connectAttr(source+'.scale', blend+'.color1')
+				mc.connectAttr(scale, blend+'.color2')
+
+				translate, rotate, scale = pair+'.outTranslate', pair+'.outRotate', blend+'.output'
+				nodes += [pair, blend]
+
+			mc.connectAttr(translate, target+'.translate', force=True)
+			mc.connectAttr(rotate, target+'.rotate', force=True)
+			mc.connectAttr(scale, target+'.scale', force=True)
+
+		self.registerNodes(nodes)
+		self.registerNodes( self.constrainTransform(sourceRoot, targetRoot, mo=True) )
+
+		return(weight)
 
 	def constrain(self, *args, **kwargs):
 		cType = kwargs.pop('type', None)
@@ -299,15 +479,33 @@ class ModuleBase(object):
 		## I want to be able to provide more than the standard Maya constraints in the
 		## at some point, while also offering the module creator the ease of use of specifying 
 		## names through these strings if the system is ported to another DCC in the future.
-		validConstraints = ['point','orient','pointorient','parent','normal','axis','scale']
+		validConstraints = ['point','orient','pointorient','parent','normal','axis','scale','matrix']
 
 		if not cType in validConstraints:
 			raise ValueError('constraint type invalid -- must be one of ' ', '.join(validConstraints) + '.')
 
 		oblist = utils.makeList(args)
 
+		## In matrix mode the single-driver transform constraints are swapped
+		## for matrix networks, so existing modules switch over without changes.
+		## Anything with weights or extra flags keeps the real constraint.
+		matrixChannels = { 'point':'t', 'orient':'r', 'pointorient':'tr', 'parent':'tr', 'scale':'s' }
+		if self.constraintMode == 'matrix' and cType in matrixChannels and len(oblist) == 2 \
+				and not [ x for x in kwargs if not x in ('mo', 'maintainOffset') ]:
+			kwargs['channels'] = matrixChannels[cType]
+			cType = 'matrix'
+
 		results = []
-		if cType == 'point' or cType == 'pointorient':
+		if cType == 'matrix':
+			if not len(oblist) == 2:
+				raise ModuleBaseException('constrain: matrix constraints take exactly one driver.')
+			mo = kwargs.get('mo', kwargs.get('maintainOffset', False))
+			nodes = utils.matrixConstraint( oblist[0], oblist[1], mo=mo,
+				channels=kwargs.get('channels', 'trs'), opm=kwargs.get('opm', False) )
+			if self.module is not None:
+				self.registerNodes(nodes)
+			return( pm.PyNode(nodes[0]) )
+		elif cType == 'point' or cType == 'pointorient':
 			results.append( pm.pointConstraint(*oblist, **kwargs) )
 		elif  cType == 'orient' or cType == 'pointorient':
 			results.append( pm.orientConstraint(*oblist, **kwargs) )
@@ -318,36 +516,31 @@ class ModuleBase(object):
 		else:
 			raise NotImplementedError('Constraint type not yet implemented.')
 
+		## objects using the offset layout need the constraint to
+		## account for their offsetParentMatrix
+		if utils.hasOffset(oblist[-1]):
+			for item in results:
+				self.registerNodes( utils.compensateOffset(item, oblist[-1]) )
+
 		if len(results) == 1:
 			return(results[0])
 		else:
 			return(results)
 
-	def createControl(self, category, name, target=None, constrain=None, **kwargs):
-		data = self.loadControllerParams(category)
-
-		data['name'] = self['token']+"__"+name+"_#s_#d_CON"
-
-		zero, con = utils.createControl(target, **data)[0]
-		pm.parent(zero, self.controls)
-
-		if constrain is not None and target is not None:
-			if not (isinstance(constrain, tuple) or isinstance(constrain, list)):
-				constrain = [constrain]
-			for cType in constrain:
-				self.constrain(con, target, type=cType, mo=True)
-
-		self._controllers[category].append(con)
-		self._controllerZeros[category].append(zero)
+	def constrainTransform(self, driver, target, mo=True):
+		## Full transform follow (translate, rotate and scale), used for inputs,
+		## seams and rig roots: a parent / scale constraint pair normally, or a
+		## single matrix network in matrix mode.
+		if self.constraintMode == 'matrix':
+			return( [ self.constrain(driver, target, type='matrix', mo=mo) ] )
 
-		## this is for introspection
-		utils.setAttrSpecial(con, 'con_index', len(self._controllers[category])-1 , channelBox=False)
-		
-		##!FIXME: setAttrSpecial's channelBox flag
-		con.con_index.set(k=False, cb=False)
-		con.con_index.lock()
+		return( [
+			self.constrain(driver, target, type='parent', mo=mo),
+			self.constrain(driver, target, type='scale', mo=mo),
+		] )
 
-		return(con)
+	def createControl(self, category, name, target=None, constrain=None, **kwargs):
+		return( self.createControls(category, [name], [target], constrain=constrain, **kwargs)[0] )
 
 	def createControllerParams(self):
 		for controlType in self._controllerCategories:
@@ -369,6 +562,48 @@ class ModuleBase(object):
 				name = param.pop('name')
 				self.setParam(name, preserveValue=True, **param)
 
+	def createControls(self, category, names, targets, constrain=None, chain=False, **kwargs):
+		## Creates one control per target in a single pass. names is either one
+		## name for every control or a list with one name per target. With
+		## chain=True each zero is parented under the previous control.
+		## Returns the new controls; their indices follow on from any controls
+		## already in the category.
+		data = self.loadControllerParams(category)
+		data.update(**kwargs)
+
+		if isinstance(names, str) or isinstance(names, unicode):
+			names = [names] * len(targets)
+		names = [ self['token']+"__"+name+"_#s_#d_CON" for name in names ]
+
+		parent = self.controls
+		if chain and self.numControls(category):
+			parent = self.getControl(category, -1)
+
+		pairs = utils.createControls(targets, names=names, parent=parent, chain=chain,
+			layout=self.controlLayout, shared=bool(self.getParam('sharedShapes')), **data)
+
+		if constrain is not None:
+			if not (isinstance(constrain, tuple) or isinstance(constrain, list)):
+				constrain = [constrain]
+			for (zero, con), target in zip(pairs, targets):
+				if target is None:
+					continue
+				for cType in constrain:
+					self.constrain(con, target, type=cType, mo=True)
+
+		start = self.numControls(category)
+		for index, (zero, con) in enumerate(pairs):
+			self._controllers[category].append(con)
+			self._controllerZeros[category].append(zero)
+
+			## this is for introspection
+			mc.addAttr(str(con), ln='con_index', at='long')
+			mc.setAttr(str(con)+'.con_index', start+index, lock=True)
+			mc.addAttr(str(con), ln='con_category', dt='string')
+			mc.setAttr(str(con)+'.con_category', category, type='string', lock=True)
+
+		return( [ con for zero, con in pairs ] )
+
 	def createModule(self):
 		moduleName = self.makeName('#t_#s_MODULE', upper=True)
 		if pm.objExists(moduleName):
@@ -475,6 +710,9 @@ class ModuleBase(object):
 		result = utils.makeName(name, token=self['token'], side=self['side'], **kwargs)
 		return(result)
 
+	def mirrorPartner(self):
+		return( mirrorPartnerOf(self.root) )
+
 	def moduleConnect(self, *args):
 		utils.setAttrSpecial( self.module, 'nodes', args, multi=True, append=True )
 
@@ -494,7 +732,10 @@ class ModuleBase(object):
 		group = pm.createNode('transform', name=self.makeName("#t_"+key+"_#s_#d_INPUT", upper=True))
 		utils.snap(group, self.module)
 		pm.parent(group, self.module)
-		utils.addZero(group)
+		if self.controlLayout == 'offset':
+			utils.addOffset(group)
+		else:
+			utils.addZero(group)
 		self._inputs[key] = group
 
 		## allow the input to be picked up in the same 
@@ -505,8 +746,53 @@ class ModuleBase(object):
 		## root is a special input
 		## when registered, set it up to move the controls group
 		if key == 'root':
-			self.constrain(group, self.controls, type='parent', mo=True)
-			self.constrain(group, self.controls, type='scale', mo=True)
+			self.constrainTransform(group, self.controls, mo=True)
+
+	def registerNodes(self, *args):
+		## Marks nodes outside the module's hierarchy (utility nodes, or
+		## constraints parented under the chain's rig root) as belonging to the
+		## module, so they're found again when it's removed, cloned or analyzed.
+		if self.module is not None:
+			self.addModuleAttr(args)
+
+	def _seamOffset(self, target, parent):
+		return( utils.multMatrix( mc.xform(target, q=True, ws=True, m=True),
+			utils.inverseMatrix( mc.xform(parent, q=True, ws=True, m=True) ) ) )
+
+	def seamStatus(self, seam):
+		## What a seam ('root' or 'goal') needs, compared with what applySeam
+		## recorded last time: None if the module has no such input, 'ok' if
+		## nothing, otherwise why it has to be redone-- 'new' (never seamed),
+		## 'parent' (parent_* changed), 'mode' (constraintMode changed),
+		## 'broken' (its constraints are gone), 'offset' (the input moved
+		## off its recorded offset) or 'removed' (parent_* was cleared).
+		target = self[seam+'Input']
+		if target is None:
+			return(None)
+		target = str(target)
+
+		parent = utils.getParentAttr(self.root, seam)
+		stamped = mc.attributeQuery('seamOffset', node=target, exists=True)
+		if parent is None:
+			return( 'removed' if stamped else 'ok' )
+		if not stamped:
+			return('new')
+
+		parent = str(parent)
+		source = mc.listConnections(target+'.seamSource', s=True, d=False) or []
+		if not len(source) or not mc.ls(source[0], long=True) == mc.ls(parent, long=True):
+			return('parent')
+		if not mc.getAttr(target+'.seamMode') == self.constraintMode:
+			return('mode')
+		if not len( utils.listConstraints(target) ):
+			return('broken')
+
+		recorded = mc.getAttr(target+'.seamOffset')
+		current = self._seamOffset(target, parent)
+		if max( abs(a - b) for a, b in zip(recorded, current) ) > SEAM_TOLERANCE:
+			return('offset')
+
+		return('ok')
 
 	def segmentScaleCompensateDisable(self, *args):
 		oblist = utils.makeList(args, type='joint')
@@ -518,19 +804,90 @@ class ModuleBase(object):
 		for item in oblist:
 			item.segmentScaleCompensate.set(True)
 
-	def setParam(self, param, value, **kwargs):
+	def setParam(self, param, value, mirror=True, **kwargs):
 		if self.debug:
 			print(">> Setting Param: %s (value %s)" % (param, str(value)))
 
 		utils.setAttrSpecial(self.root, param, value, prefix=PARAM_PREFIX, **kwargs)
 
+		## keep mirrored modules in sync; inputs are per module
+		if mirror and not param in MIRROR_SKIP_PARAMS and not param.endswith('Input'):
+			partner = self.mirrorPartner()
+			if partner is not None:
+				utils.setAttrSpecial(partner, param, value, prefix=PARAM_PREFIX, **kwargs)
+
+	def updateAppearance(self, categories=None):
+		## Regenerates the controls' curves and colors from the current
+		## controller params, in place-- transforms, constraints, connections
+		## and animation are left alone. Works on rehydrated instances.
+		root = str(self.root)
+		mirrored = mc.attributeQuery('mirrorOf', node=root, exists=True) and \
+			bool( mc.listConnections(root+'.mirrorOf', s=True, d=False) )
+
+		for category in categories or self._controllerCategories:
+			data = self.loadControllerParams(category)
+			if data['type'] is None:
+				continue
+
+			points = utils.shapes.getPoints( data['type'], data['scale'], data['aim'], data['up'],
+				data['translation'], data['rotation'] )
+			if mirrored:
+				## see symmetry.mirrorNodes
+				points = tuple( tuple( -x for x in point ) for point in points )
+
+			color = data['color']
+			if isinstance(color, str) or isinstance(color, unicode):
+				color = utils.colors.indexForColor(color)
+
+			for con in self._controllers.get(category, []):
+				name = str(con)
+				utils.setControlShape(name, points, data['type'])
+
+				mc.setAttr(name+'.overrideEnabled', True)
+				mc.setAttr(name+'.overrideColor', color)
+
+				## keep the recorded look in step with the curve
+				for attr, value in ('origScale', data['scale']), ('aim', data['aim']), ('up', data['up']):
+					if not mc.attributeQuery(attr, node=name, exists=True):
+						continue
+					mc.setAttr(name+'.'+attr, lock=False)
+					if attr == 'origScale':
+						mc.setAttr(name+'.'+attr, value)
+					else:
+						mc.setAttr(name+'.'+attr, value, type='string')
+					mc.setAttr(name+'.'+attr, lock=True)
 
 
+## ----------------------------------------------------------------------
 
+def reconcileSeams(instances, seams=None, force=False):
+	'''
+	reconcileSeams(instances, seams=None, force=False):
 
+	Brings the seams of every given module in line with its parent_root /
+	parent_goal params in one pass: every seam is checked first (see
+	ModuleBase.seamStatus), the constraints of the ones that changed are
+	deleted together, and only those are made again. Seams that are already
+	right aren't touched. force=True redoes every seam.
 
+	seams:	the seam names to look at (SEAMS by default).
 
+	Returns:
 
+	A list of (instance, seam, status) for the seams that were redone.
+	'''
 
+	dirty = []
+	for instance in instances:
+		for seam in seams or SEAMS:
+			status = instance.seamStatus(seam)
+			if status is None or (status == 'ok' and not force):
+				continue
+			dirty.append( (instance, seam, status) )
 
+	if len(dirty):
+		utils.removeConstraints( [ instance[seam+'Input'] for instance, seam, status in dirty ] )
+		for instance, seam, status in dirty:
+			instance.applySeam(seam, clean=False)
 
+	return(dirty)
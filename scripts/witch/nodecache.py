@@ -0,0 +1,452 @@
+from collections import OrderedDict
+
+## ----------------------------------------------------------------------
+'''
+
+	NODECACHE.PY
+
+	Cached name -> node handle lookups.
+
+	Building a string into a pm.PyNode is one of the slowest things pymel
+	does, and the utils functions do it for every call. A NodeCache keeps
+	the handles it has made in an LRU keyed by the node's UUID, which stays
+	the same through renames and reparenting, plus a name index pointing
+	names (as they were asked for) at UUIDs.
+
+	Entries are dropped when:
+
+		-	the node is deleted (forget)
+		-	the node is renamed (renamed); long names are dropped on any
+			rename or reparent, since a parent's change moves every path
+			below it (pathsChanged)
+		-	another node gets the same short name, by creation or rename
+			(added): the name is ambiguous now, so lookups fail the way
+			pm.PyNode does
+		-	the epoch is bumped (bumpEpoch), which empties the cache; do this
+			after anything the callbacks don't see, and on new / open scene
+		-	a handle turns out to be stale on a hit, as a last line of defense
+
+	MayaBackend hooks those up to OpenMaya message callbacks with install().
+	Nothing in this file imports maya at load time; FakeBackend is a
+	scene made of dicts that simulates creates, renames and deletes (see
+	selfCheck).
+
+	utils resolves node names through the shared cache (getCache).
+	uninstall() removes its callbacks; reloading this file does too, so
+	reload(nodecache) doesn't leave a second set registered.
+
+'''
+
+## ----------------------------------------------------------------------
+class NodeCacheException(Exception):
+	pass
+
+## constants
+CACHE_SIZE = 4096
+
+## ----------------------------------------------------------------------
+class MayaBackend(object):
+	'''
+	Handles are pymel PyNodes. install() registers the callbacks that keep
+	a cache current; uninstall() removes them.
+	'''
+
+	def __init__(self):
+		self.callbacks = []
+
+	def lookup(self, name):
+		## (uuid, handle) for a node name, None for attributes, components,
+		## missing or ambiguous names
+		import pymel.core as pm
+
+		if '.' in name:
+			return(None)
+		try:
+			node = pm.PyNode(name)
+		except Exception:
+			return(None)
+		if not isinstance(node, pm.nt.DependNode):
+			return(None)
+		return( (node.__apimfn__().uuid().asString(), node) )
+
+	def valid(self, handle):
+		return( handle.exists() )
+
+	def install(self, cache):
+		from maya import OpenMaya as om
+
+		def uuidOf(node):
+			return( om.MFnDependencyNode(node).uuid().asString() )
+
+		def added(node, clientData):
+			cache.added( om.MFnDependencyNode(node).name() )
+
+		def removed(node, clientData):
+			cache.forget( uuidOf(node) )
+
+		def nameChanged(node, previous, clientData):
+			cache.renamed( uuidOf(node) )
+			cache.added( om.MFnDependencyNode(node).name() )
+
+		def dagChanged(message, child, parent, clientData):
+			cache.pathsChanged()
+
+		def sceneChanged(clientData):
+			cache.bumpEpoch()
+
+		self.uninstall()
+		self.callbacks = [
+			om.MDGMessage.addNodeAddedCallback(added, 'dependNode'),
+			om.MDGMessage.addNodeRemovedCallback(removed, 'dependNode'),
+			om.MNodeMessage.addNameChangedCallback(om.MObject(), nameChanged),
+			om.MDagMessage.addAllDagChangesCallback(dagChanged),
+			om.MSceneMessage.addCallback(om.MSceneMessage.kBeforeNew, sceneChanged),
+			om.MSceneMessage.addCallback(om.MSceneMessage.kBeforeOpen, sceneChanged),
+		]
+
+	def uninstall(self):
+		from maya import OpenMaya as om
+
+		for callback in self.callbacks:
+			om.MMessage.removeCallback(callback)
+		self.callbacks = []
+
+
+## ----------------------------------------------------------------------
+class FakeHandle(object):
+	def __init__(self, uuid, backend):
+		self.uuid = uuid
+		self.backend = backend
+
+	def __repr__(self):
+		return( "<< Fake Node: %s." % self.name() )
+
+	def name(self):
+		return( self.backend.nodes.get(self.uuid) )
+
+
+## ----------------------------------------------------------------------
+class FakeBackend(object):
+	'''
+	Stand-in scene: nodes is a dict of uuid -> name. create / rename /
+	delete notify the installed cache the way MayaBackend's callbacks
+	would (unless silent=True, to simulate changes the callbacks miss).
+	Names held by more than one node don't resolve. lookups counts the
+	expensive name resolutions.
+	'''
+
+	def __init__(self, names=None):
+		self.nodes = {}
+		self.cache = None
+		self.lookups = 0
+		self._next = 0
+		for name in names or []:
+			self.create(name)
+
+	def create(self, name, silent=False):
+		self._next += 1
+		uuid = 'UUID-%06d' % self._next
+		self.nodes[uuid] = name
+		if self.cache is not None and not silent:
+			self.cache.added(name)
+		return(uuid)
+
+	def uuidOf(self, name):
+		for uuid, found in self.nodes.items():
+			if found == name:
+				return(uuid)
+		return(None)
+
+	def rename(self, name, newName, silent=False):
+		uuid = self.uuidOf(name)
+		self.nodes[uuid] = newName
+		if self.cache is not None and not silent:
+			self.cache.renamed(uuid)
+			self.cache.added(newName)
+
+	def delete(self, name, silent=False):
+		uuid = self.uuidOf(name)
+		del self.nodes[uuid]
+		if self.cache is not None and not silent:
+			self.cache.forget(uuid)
+
+	def lookup(self, name):
+		self.lookups += 1
+		found = [ uuid for uuid, x in self.nodes.items() if x == name ]
+		if not len(found) == 1:
+			return(None)
+		return( (found[0], FakeHandle(found[0], self)) )
+
+	def valid(self, handle):
+		return( handle.uuid in self.nodes )
+
+	def install(self, cache):
+		self.cache = cache
+
+	def uninstall(self):
+		self.cache = None
+
+
+## ----------------------------------------------------------------------
+class NodeCache(object):
+	'''
+	NodeCache(backend, capacity=CACHE_SIZE):
+
+	resolve(name) returns the backend's handle for name, or None if there's
+	no such node.
+	'''
+
+	def __init__(self, backend, capacity=CACHE_SIZE):
+		self.backend = backend
+		self.capacity = capacity
+		self.epoch = 0
+
+		self._handles = OrderedDict()	## uuid -> handle, oldest first
+		self._names = {}				## name -> uuid
+		self._keys = {}					## uuid -> names pointing at it
+		self._paths = set()				## names with a '|' in them
+
+		self.hits = 0
+		self.misses = 0
+		self.stale = 0
+		self.evictions = 0
+		self.invalidations = 0
+
+	def __repr__(self):
+		return( "<< Witch Node Cache: %d/%d handles, epoch %d, %.1f%% hits." % (len(self._handles),
+			self.capacity, self.epoch, 100.0 * self.hitRate()) )
+
+	def __len__(self):
+		return( len(self._handles) )
+
+	def resolve(self, name):
+		uuid = self._names.get(name)
+		if uuid is not None:
+			handle = self._handles.get(uuid)
+			if handle is not None and self.backend.valid(handle):
+				## most recently used goes to the back
+				del self._handles[uuid]
+				self._handles[uuid] = handle
+				self.hits += 1
+				return(handle)
+			self.stale += 1
+			self.forget(uuid)
+
+		self.misses += 1
+		found = self.backend.lookup(name)
+		if found is None:
+			return(None)
+
+		uuid, handle = found
+		if not uuid in self._handles:
+			while len(self._handles) >= self.capacity:
+				self._drop( next(iter(self._handles)) )
+				self.evictions += 1
+		else:
+			del self._handles[uuid]
+		self._handles[uuid] = handle
+		self._names[name] = uuid
+		self._keys.setdefault(uuid, set()).add(name)
+		if '|' in name:
+			self._paths.add(name)
+
+		return(handle)
+
+	def _drop(self, uuid):
+		self._handles.pop(uuid, None)
+		for name in self._keys.pop(uuid, []):
+			self._names.pop(name, None)
+			self._paths.discard(name)
+
+	def forget(self, uuid):
+		## the node is gone
+		if uuid in self._handles:
+			self.invalidations += 1
+		self._drop(uuid)
+
+	def _unname(self, name):
+		uuid = self._names.pop(name, None)
+		if uuid in self._keys:
+			self._keys[uuid].discard(name)
+		self._paths.discard(name)
+
+	def renamed(self, uuid):
+		## the handle still works, the names pointing at it don't
+		for name in self._keys.pop(uuid, []):
+			self._names.pop(name, None)
+			self._paths.discard(name)
+		self.pathsChanged()
+
+	def added(self, name):
+		## a node now has this short name: it, and any partial path ending
+		## in it, may point at more than one node
+		short = name.rpartition('|')[2]
+		partial = [ x for x in self._paths if not x.startswith('|') and x.endswith('|' + short) ]
+		for key in [short] + partial:
+			if key in self._names:
+				self.invalidations += 1
+			self._unname(key)
+
+	def pathsChanged(self):
+		for name in self._paths:
+			uuid = self._names.pop(name, None)
+			if uuid in self._keys:
+				self._keys[uuid].discard(name)
+		self._paths = set()
+
+	def bumpEpoch(self):
+		self._handles.clear()
+		self._names.clear()
+		self._keys.clear()
+		self._paths.clear()
+		self.epoch += 1
+		self.invalidations += 1
+
+	def hitRate(self):
+		total = self.hits + self.misses
+		return( float(self.hits) / total if total else 0.0 )
+
+	def stats(self):
+		return( {
+			'size':len(self._handles),
+			'capacity':self.capacity,
+			'epoch':self.epoch,
+			'hits':self.hits,
+			'misses':self.misses,
+			'stale':self.stale,
+			'evictions':self.evictions,
+			'invalidations':self.invalidations,
+			'hitRate':self.hitRate(),
+		} )
+
+	def resetStats(self):
+		self.hits = self.misses = self.stale = self.evictions = self.invalidations = 0
+
+
+## ----------------------------------------------------------------------
+## a reload runs this over the old module's globals: take the previous
+## shared cache's callbacks down, or they'd stay registered for good
+if globals().get('_cache') is not None:
+	_cache.backend.uninstall()
+_cache = None
+
+def getCache():
+	'''
+	The shared cache utils resolves through, on a MayaBackend with its
+	callbacks installed. Made on first use; see uninstall().
+	'''
+
+	global _cache
+	if _cache is None:
+		backend = MayaBackend()
+		_cache = NodeCache(backend)
+		backend.install(_cache)
+	return(_cache)
+
+
+## ----------------------------------------------------------------------
+def resolve(name):
+	return( getCache().resolve(name) )
+
+
+## ----------------------------------------------------------------------
+def bumpEpoch():
+	if _cache is not None:
+		_cache.bumpEpoch()
+
+
+## ----------------------------------------------------------------------
+def uninstall():
+	## removes the shared cache's callbacks and drops it; the next
+	## getCache() makes a new one
+	global _cache
+	if _cache is not None:
+		_cache.backend.uninstall()
+	_cache = None
+
+
+## ----------------------------------------------------------------------
+def selfCheck():
+	'''
+	Exercises a NodeCache against a FakeBackend: hits, renames, deletes,
+	names made ambiguous, changes the callbacks missed, long name
+	invalidation, LRU eviction and epoch bumps.
+
+	Returns:
+
+	A list of failure messages; empty if everything behaved.
+	'''
+
+	failures = []
+	def check(condition, message):
+		if not condition:
+			failures.append(message)
+
+	backend = FakeBackend( ['root', 'arm', 'hand', '|root|arm'] )
+	cache = NodeCache(backend, capacity=3)
+	backend.install(cache)
+
+	## repeat lookups don't touch the backend
+	first = cache.resolve('arm')
+	for index in range(10):
+		check( cache.resolve('arm') is first, 'hit returned a different handle' )
+	check( backend.lookups == 1, 'expected 1 lookup, got %d' % backend.lookups )
+	check( abs(cache.hitRate() - 10.0 / 11) < 1e-9, 'wrong hit rate %s' % cache.hitRate() )
+
+	## rename: the old name misses, the handle is the same node
+	backend.rename('arm', 'arm_renamed')
+	check( cache.resolve('arm') is None, 'renamed node still found by its old name' )
+	check( cache.resolve('arm_renamed').uuid == first.uuid, 'renamed node has a new identity' )
+
+	## a new node can take the old name
+	backend.create('arm')
+	check( not cache.resolve('arm').uuid == first.uuid, 'old name resolved to the renamed node' )
+
+	## ...and a second one makes it ambiguous, as does renaming onto it
+	backend.create('arm')
+	check( cache.resolve('arm') is None, 'ambiguous name still resolved' )
+	backend.delete('arm')
+	check( cache.resolve('arm') is not None, 'name stayed ambiguous after a delete' )
+	backend.create('spare')
+	backend.rename('spare', 'arm')
+	check( cache.resolve('arm') is None, 'name taken by a rename still resolved' )
+	backend.delete('arm')
+
+	## delete
+	hand = cache.resolve('hand')
+	backend.delete('hand')
+	check( cache.resolve('hand') is None, 'deleted node still resolved' )
+
+	## a delete the callbacks missed is caught by the validity check
+	root = cache.resolve('root')
+	backend.delete('root', silent=True)
+	check( cache.resolve('root') is None, 'silently deleted node still resolved' )
+	check( cache.stale == 1, 'expected 1 stale entry, got %d' % cache.stale )
+
+	## long names go on any rename
+	cache.resolve('|root|arm')
+	lookups = backend.lookups
+	backend.rename('arm_renamed', 'arm2')
+	cache.resolve('|root|arm')
+	check( backend.lookups == lookups + 1, 'long name survived a rename' )
+
+	## LRU: capacity 3, the least recently used goes
+	backend = FakeBackend( ['a', 'b', 'c', 'd'] )
+	cache = NodeCache(backend, capacity=3)
+	backend.install(cache)
+	for name in 'a', 'b', 'c', 'a', 'd':
+		cache.resolve(name)
+	check( len(cache) == 3 and cache.evictions == 1, 'eviction: %s' % cache.stats() )
+	lookups = backend.lookups
+	cache.resolve('a')
+	check( backend.lookups == lookups, 'recently used entry was evicted' )
+	cache.resolve('b')
+	check( backend.lookups == lookups + 1, 'least recently used entry survived' )
+
+	## epoch bump empties everything
+	backend.rename('c', 'e', silent=True)
+	cache.bumpEpoch()
+	check( len(cache) == 0 and cache.epoch == 1, 'epoch bump left %d entries' % len(cache) )
+	check( cache.resolve('c') is None and cache.resolve('e') is not None, 'lookup after epoch bump' )
+
+	return(failures)
@@ -0,0 +1,373 @@
+import os
+import sys
+import multiprocessing
+
+## ----------------------------------------------------------------------
+'''
+
+	PLANNING.PY
+
+	Pre-build planning and validation.
+
+	Everything in here works on plain data only (dicts, lists and strings) so
+	that it can be shipped off to worker processes. Nothing in this file may
+	import maya or pymel-- the scene is snapshotted by the caller (see
+	automatedBuild.snapshotRoot) before any of this runs.
+
+	A snapshot is a dict with the following keys:
+
+	root:			name of the chain root
+	type:			module type (WT_type)
+	token, side:	the module's token and side params
+	detectedSide:	side as guessed from the root's name by utils.determineSide
+	chain:			list of joint names in the chain
+	params:			dict of every WT_ param on the root (without the prefix)
+	parents:		dict of seam type -> { 'node':name, 'owner':root or None }
+	limits:			dict with the module class' minChainLength, maxChainLength,
+					usesRoot, usesGoal and defaultControllerType
+
+'''
+
+## ----------------------------------------------------------------------
+class PlanningException(Exception):
+	pass
+
+## constants
+ERROR = 'error'
+WARNING = 'warning'
+
+## Below this many modules the pool startup costs more than it saves.
+PARALLEL_THRESHOLD = 64
+
+## Params every controller category needs for createControl to succeed.
+CONTROLLER_PARAMS = [ 'Type', 'Color', 'Scale', 'Aim', 'Up', 'RotateOrder' ]
+
+## ----------------------------------------------------------------------
+class BuildReport(object):
+	'''
+	The consolidated result of planning a build: every diagnostic found
+	plus the per-module plans, ordered by root name.
+	'''
+
+	def __init__(self, diagnostics=None, plans=None):
+		self.diagnostics = diagnostics or []
+		self.plans = plans or []
+
+	def __str__(self):
+		return( self.format() )
+
+	def __repr__(self):
+		return( "<< Witch Build Report: %d module(s), %d error(s), %d warning(s)." %
+			(len(self.plans), len(self.errors), len(self.warnings)) )
+
+	@property ## readonly
+	def errors(self):
+		return( [ x for x in self.diagnostics if x['level'] == ERROR ] )
+
+	@property ## readonly
+	def warnings(self):
+		return( [ x for x in self.diagnostics if x['level'] == WARNING ] )
+
+	@property ## readonly
+	def ok(self):
+		return( len(self.errors) == 0 )
+
+	def format(self):
+		lines = [ ">> Build plan: %d module(s), %d error(s), %d warning(s)" %
+			(len(self.plans), len(self.errors), len(self.warnings)) ]
+		for item in self.diagnostics:
+			lines.append( "\t%s %s [%s] %s" % ( '!!' if item['level'] == ERROR else '--',
+				item['root'], item['code'], item['message'] ) )
+		return( '\n'.join(lines) )
+
+
+## ----------------------------------------------------------------------
+def diagnostic(level, root, code, message):
+	return( { 'level':level, 'root':root, 'code':code, 'message':message } )
+
+
+## ----------------------------------------------------------------------
+def moduleName(token, side):
+	## mirrors ModuleBase.createModule's '#t_#s_MODULE'
+	return( ('%s_%s_MODULE' % (token, side)).upper() )
+
+
+## ----------------------------------------------------------------------
+def validateSnapshot(job):
+	'''
+	validateSnapshot(job):
+
+	Checks a single module snapshot. This is the function run in the worker
+	processes, so it takes a single (snapshot, shapeNames) tuple.
+
+	Returns:
+
+	A (diagnostics, plan) tuple. The plan holds everything the host needs for
+	the cross-module checks: the module name and the seam parents.
+	'''
+
+	snapshot, shapeNames = job
+	shapeNames = set(shapeNames)
+
+	root = snapshot['root']
+	params = snapshot.get('params', {})
+	limits = snapshot.get('limits', {})
+	chain = snapshot.get('chain', [])
+	results = []
+
+	## chain length
+	minLength = limits.get('minChainLength', 0)
+	maxLength = limits.get('maxChainLength', 0)
+	if not minLength == 0 and len(chain) < minLength:
+		results.append( diagnostic(ERROR, root, 'chain-short',
+			'Chain is shorter than min chain length (found %d; requires %d).' % (len(chain), minLength)) )
+	if not maxLength == 0 and len(chain) > maxLength:
+		results.append( diagnostic(ERROR, root, 'chain-long',
+			'Chain is longer than max chain length (found %d; requires %d).' % (len(chain), maxLength)) )
+	if limits.get('usesGoal', False) and len(chain) < 2:
+		results.append( diagnostic(ERROR, root, 'chain-goal',
+			'Module uses a goal but the chain has no joint to put it on.') )
+
+	## token / side
+	token = snapshot.get('token')
+	if not token:
+		results.append( diagnostic(ERROR, root, 'token', 'Module has no token.') )
+
+	side = snapshot.get('side')
+	detectedSide = snapshot.get('detectedSide')
+	if side not in ('cn', 'lf', 'rt'):
+		results.append( diagnostic(ERROR, root, 'side', "Invalid side '%s'." % side) )
+	elif detectedSide is not None and not side == detectedSide:
+		## a center root tagged as a side is sometimes on purpose (tails, etc.),
+		## a left root tagged as right never is
+		level = WARNING if 'cn' in (side, detectedSide) else ERROR
+		results.append( diagnostic(level, root, 'side-mismatch',
+			"Side param is '%s' but the root name says '%s'." % (side, detectedSide)) )
+
+	## controller categories and shapes
+	categories = sorted( set( x[:-len('ControllerType')] for x in params if x.endswith('ControllerType') ) )
+	for category in categories:
+		for key in CONTROLLER_PARAMS:
+			if not '%sController%s' % (category, key) in params:
+				results.append( diagnostic(ERROR, root, 'param-missing',
+					"Controller category '%s' has no %sController%s param." % (category, category, key)) )
+
+		shape = params.get('%sControllerType' % category)
+		if shape is not None and not shape in shapeNames:
+			results.append( diagnostic(ERROR, root, 'shape',
+				"Unknown controller shape '%s' for category '%s'." % (shape, category)) )
+
+		for key in 'Scale', 'SubScale':
+			value = params.get('%sController%s' % (category, key))
+			if value is not None and value <= 0.0:
+				results.append( diagnostic(ERROR, root, 'param-range',
+					'%sController%s must be greater than zero (found %s).' % (category, key, value)) )
+
+		if params.get('%sControllerAim' % category) is not None and \
+			params.get('%sControllerAim' % category, '').strip('-') == params.get('%sControllerUp' % category, '').strip('-'):
+			results.append( diagnostic(ERROR, root, 'param-axes',
+				"Controller category '%s' has the same aim and up axis." % category) )
+
+	if not len(categories):
+		## params haven't been created yet (tagged but never instantiated), so
+		## the class default is what will end up being used
+		shape = limits.get('defaultControllerType')
+		if shape is not None and not shape in shapeNames:
+			results.append( diagnostic(ERROR, root, 'shape',
+				"Unknown default controller shape '%s'." % shape) )
+
+	## seams
+	parents = snapshot.get('parents', {})
+	for seam, uses in ('root', limits.get('usesRoot', True)), ('goal', limits.get('usesGoal', False)):
+		if parents.get(seam) is not None and not uses:
+			results.append( diagnostic(WARNING, root, 'seam-unused',
+				"parent_%s is set but the module has no %s input." % (seam, seam)) )
+		if parents.get(seam) is not None and parents[seam]['node'] in chain:
+			results.append( diagnostic(ERROR, root, 'seam-self',
+				"parent_%s points into the module's own chain (%s)." % (seam, parents[seam]['node'])) )
+
+	plan = {
+		'root':root,
+		'type':snapshot.get('type'),
+		'moduleName':moduleName(token or '', side or ''),
+		'chain':chain,
+		'parents':parents,
+	}
+
+	return( (results, plan) )
+
+
+## ----------------------------------------------------------------------
+def findSeamCycles(plans):
+	'''
+	findSeamCycles(plans):
+
+	Builds the module -> parent module graph from the plans' seam parents and
+	returns every cycle found as a list of root names.
+	'''
+
+	owners = {}
+	for plan in plans:
+		for joint in plan['chain']:
+			owners[joint] = plan['root']
+
+	graph = {}
+	for plan in plans:
+		edges = set()
+		for seam in plan['parents'].values():
+			if seam is None:
+				continue
+			owner = seam.get('owner') or owners.get(seam['node'])
+			if owner is not None and not owner == plan['root']:
+				edges.add(owner)
+		graph[plan['root']] = sorted(edges)
+
+	## iterative DFS-- recursion depth isn't safe on thousand-module rigs
+	WHITE, GREY, BLACK = 0, 1, 2
+	state = dict( (x, WHITE) for x in graph )
+	cycles = []
+
+	for start in sorted(graph):
+		if not state[start] == WHITE:
+			continue
+		stack = [ (start, iter(graph[start])) ]
+		path = [ start ]
+		state[start] = GREY
+		while len(stack):
+			node, children = stack[-1]
+			child = next(children, None)
+			if child is None:
+				state[node] = BLACK
+				stack.pop()
+				path.pop()
+			elif state.get(child, BLACK) == GREY:
+				cycles.append( path[path.index(child):] + [child] )
+			elif state.get(child) == WHITE:
+				state[child] = GREY
+				stack.append( (child, iter(graph[child])) )
+				path.append(child)
+
+	return(cycles)
+
+
+## ----------------------------------------------------------------------
+def findNameCollisions(plans, existing=None):
+	'''
+	Returns diagnostics for modules that would generate the same MODULE node
+	name, or a name that's already taken in the scene (existing).
+	'''
+
+	existing = set(existing or [])
+	results = []
+
+	byName = {}
+	for plan in plans:
+		byName.setdefault(plan['moduleName'], []).append(plan['root'])
+
+	for name in sorted(byName):
+		roots = byName[name]
+		if len(roots) > 1:
+			for root in roots:
+				results.append( diagnostic(ERROR, root, 'name-collision',
+					'Module name %s is shared by: %s.' % (name, ', '.join(roots))) )
+		if name in existing:
+			results.append( diagnostic(ERROR, roots[0], 'name-exists',
+				'Module name %s already exists in the scene.' % name) )
+
+	return(results)
+
+
+## ----------------------------------------------------------------------
+def _executable():
+	## Inside a GUI session sys.executable is the maya binary; workers
+	## have to be started with mayapy instead or they'll open a new Maya.
+	exe = sys.executable
+	folder, name = os.path.split(exe)
+	if name.lower().startswith('maya') and not name.lower().startswith('mayapy'):
+		candidate = os.path.join(folder, 'mayapy' + os.path.splitext(name)[1])
+		if os.path.exists(candidate):
+			return(candidate)
+	return(exe)
+
+
+## ----------------------------------------------------------------------
+def _currentExecutable():
+	## whatever set_executable last set: it lives in multiprocessing.spawn
+	## on python 3 and multiprocessing.forking on python 2
+	try:
+		from multiprocessing import spawn
+		return( spawn.get_executable() )
+	except ImportError:
+		from multiprocessing import forking
+		return( getattr(forking, '_python_exe', sys.executable) )
+
+
+## ----------------------------------------------------------------------
+def planModules(snapshots, shapeNames, processes=None, existing=None, chunksize=None):
+	'''
+	planModules(snapshots, shapeNames, processes=None, existing=None, chunksize=None):
+
+	Validates and plans every snapshot, in parallel if there are enough of
+	them, then runs the cross-module checks (name collisions and seam cycles).
+
+	snapshots:	list of snapshot dicts (see the module docstring).
+
+	shapeNames:	every controller shape name known to the host.
+
+	processes:	worker count. None uses the CPU count; 1 (or 0) runs everything
+				in this process.
+
+	existing:	MODULE names that already exist in the scene.
+
+	Returns:
+
+	A BuildReport. Nothing in the scene is touched.
+	'''
+
+	jobs = [ (x, list(shapeNames)) for x in sorted(snapshots, key=lambda x: x['root']) ]
+
+	if processes is None:
+		processes = multiprocessing.cpu_count()
+
+	results = None
+	if processes > 1 and len(jobs) >= PARALLEL_THRESHOLD:
+		if chunksize is None:
+			chunksize = max( 1, len(jobs) // (processes * 4) )
+		## the executable is process-global: it's only swapped for the
+		## lifetime of this pool, then put back
+		exe = _executable()
+		previous = None
+		try:
+			try:
+				if not exe == sys.executable:
+					previous = _currentExecutable()
+					multiprocessing.set_executable(exe)
+				pool = multiprocessing.Pool(processes)
+				try:
+					results = pool.map(validateSnapshot, jobs, chunksize)
+				finally:
+					pool.close()
+					pool.join()
+			finally:
+				if previous is not None:
+					multiprocessing.set_executable(previous)
+		except (OSError, ImportError, AttributeError):
+			## no usable pool in this session-- fall through to a serial run
+			results = None
+
+	if results is None:
+		results = [ validateSnapshot(x) for x in jobs ]
+
+	diagnostics = []
+	plans = []
+	for found, plan in results:
+		diagnostics += found
+		plans.append(plan)
+
+	diagnostics += findNameCollisions(plans, existing)
+
+	for cycle in findSeamCycles(plans):
+		diagnostics.append( diagnostic(ERROR, cycle[0], 'seam-cycle',
+			'Seam cycle: %s.' % ' -> '.join(cycle)) )
+
+	return( BuildReport(diagnostics, plans) )
@@ -0,0 +1,225 @@
+import re
+
+import maya
+from maya import cmds as mc
+from maya import OpenMaya as om
+
+from . import utils
+from . import graph
+from . import editing
+from . import descriptors
+from .modules import module_base
+
+## ----------------------------------------------------------------------
+'''
+
+	RETOKEN.PY
+
+	Changing the token and / or side of built modules without rebuilding
+	them.
+
+	Both are baked into every name a module makes (makeName's #t and #s).
+	retokenModules() finds everything each module owns through its MODULE
+	node (graph.ownedNodes: the controls / rig / extras hierarchy and every
+	registered node), swaps the old token and side for the new ones in each
+	name, and renames it all in one undo chunk. Renaming doesn't touch
+	connections, so constraints, seams and animation stay as they are.
+
+	Only whole '_' separated name parts are swapped, in their original
+	case ('arm', 'ARM'), so 'arm' doesn't touch 'forearm'. The bind chain
+	keeps its names, and shared shape masters aren't renamed.
+
+	Names that would collide with a node outside the batch, or with each
+	other, get the next free number (see freeName). A MODULE node name that
+	collides is an error, the same as in createModule, and nothing is
+	renamed.
+
+'''
+
+## ----------------------------------------------------------------------
+class RetokenException(Exception):
+	pass
+
+## ----------------------------------------------------------------------
+def _swaps(pairs):
+	## (old, new) pairs -> a table covering the case variants
+	table = {}
+	for old, new in pairs:
+		if not old or not new or old == new:
+			continue
+		for convert in (lambda x: x), (lambda x: x.upper()), (lambda x: x.lower()):
+			table[ convert(str(old)) ] = convert(str(new))
+	return(table)
+
+
+## ----------------------------------------------------------------------
+def swapParts(name, table):
+	'''
+	swapParts(name, table):
+
+	Swaps the whole '_' separated parts of a (short) name found in table,
+	in a single pass. The namespace is left alone.
+	'''
+
+	if not table:
+		return(name)
+	namespace, colon, short = name.rpartition(':')
+	pattern = '(?<![^_])(%s)(?=_|$)' % '|'.join( re.escape(x) for x in sorted(table, key=len, reverse=True) )
+	return( namespace + colon + re.sub( pattern, lambda x: table[x.group(1)], short ) )
+
+
+## ----------------------------------------------------------------------
+def freeName(name, taken):
+	'''
+	freeName(name, taken):
+
+	Returns name if it isn't in taken, otherwise the first free variant:
+	the last number in the name counts up (keeping its padding), or a
+	number is added if it has none.
+	'''
+
+	if not name in taken:
+		return(name)
+
+	numbers = list( re.finditer(r'(?<![^_])(\d+)(?=_|$)', name) )
+	if len(numbers):
+		last = numbers[-1]
+		width = len(last.group(1))
+		index = int(last.group(1))
+		while True:
+			index += 1
+			candidate = name[:last.start(1)] + str(index).zfill(width) + name[last.end(1):]
+			if not candidate in taken:
+				return(candidate)
+
+	index = 1
+	while True:
+		candidate = '%s%d' % (name, index)
+		if not candidate in taken:
+			return(candidate)
+		index += 1
+
+
+## ----------------------------------------------------------------------
+def _handle(name):
+	## MObjectHandle for a node, so renames can't invalidate it
+	selection = om.MSelectionList()
+	selection.add(name)
+	obj = om.MObject()
+	selection.getDependNode(0, obj)
+	return( om.MObjectHandle(obj) )
+
+
+## ----------------------------------------------------------------------
+def _currentName(handle):
+	obj = handle.object()
+	if obj.hasFn(om.MFn.kDagNode):
+		return( om.MFnDagNode(obj).fullPathName() )
+	return( om.MFnDependencyNode(obj).name() )
+
+
+## ----------------------------------------------------------------------
+def planRetoken(changes):
+	'''
+	planRetoken(changes):
+
+	Works out every rename retokenModules would do, without changing the
+	scene. changes is a dict of root -> { 'token':..., 'side':... } (either
+	key can be left out).
+
+	Returns:
+
+	A list of (root, old long name, new short name) for every node that
+	gets a new name, children before parents.
+	'''
+
+	renames = []
+	modules = {}
+	for root in changes:
+		found = descriptors.scanRoots( [str(root)] )
+		item = found[0] if len(found) else None
+		if item is None or not item.built:
+			raise RetokenException('planRetoken: %s is not a built module root.' % root)
+
+		side = changes[root].get('side')
+		if side is not None:
+			fields = mc.attributeQuery(module_base.PARAM_PREFIX+'_side', node=item.root, listEnum=True)[0].split(':')
+			if not side in [ x.partition('=')[0] for x in fields ]:
+				raise RetokenException("planRetoken: '%s' is not a side (%s)." % (side, ', '.join(fields)))
+
+		change = changes[root]
+		table = _swaps( [ (item.token, change.get('token')), (item.side, change.get('side')) ] )
+		if not table:
+			continue
+
+		owned = graph.ownedNodes( graph.moduleOf(item.root) )
+		for node in owned['dag'] + owned['external'] + owned['dg']:
+			if mc.objectType(node, isAType='shape') and utils.isSharedShape(node):
+				continue
+			short = node.rpartition('|')[2]
+			new = swapParts(short, table)
+			if not new == short:
+				renames.append( (str(root), node, new) )
+		modules[owned['module']] = str(root)
+
+	## everything that isn't being renamed keeps its name
+	moving = set( x[1] for x in renames )
+	taken = set( x.rpartition('|')[2] for x in mc.ls(long=True) if not x in moving )
+
+	results = []
+	for root, node, new in sorted( renames, key=lambda x: x[1].count('|'), reverse=True ):
+		if node in modules and new in taken:
+			raise RetokenException('planRetoken: cannot rename %s to %s: already exists.' % (node.rpartition('|')[2], new))
+		new = freeName(new, taken)
+		taken.add(new)
+		results.append( (root, node, new) )
+
+	return(results)
+
+
+## ----------------------------------------------------------------------
+def retokenModules(changes):
+	'''
+	retokenModules(changes):
+
+	Renames the built modules in changes (root -> { 'token':..., 'side':... })
+	for their new token and side and updates their token / side params,
+	in one undo chunk.
+
+	Returns:
+
+	A dict of root -> list of (old long name, new short name).
+	'''
+
+	plan = planRetoken(changes)
+
+	## handles first: renaming a parent changes every path below it
+	handles = [ (root, node, new, _handle(node)) for root, node, new in plan ]
+
+	report = dict( (str(x), []) for x in changes )
+	mc.undoInfo(openChunk=True)
+	try:
+		## nodes that are about to be renamed can still hold a name another
+		## one in the batch is getting; park those first
+		wanted = set( new for root, node, new, handle in handles )
+		for index, (root, node, new, handle) in enumerate(handles):
+			if node.rpartition('|')[2] in wanted:
+				mc.rename( _currentName(handle), '__retoken%d' % index )
+
+		for root, node, new, handle in handles:
+			mc.rename( _currentName(handle), new )
+			report[root].append( (node, new) )
+
+		for root, change in changes.items():
+			params = dict( (key, change[key]) for key in ('token', 'side') if change.get(key) is not None )
+			editing.writeParams( str(root), editing.diffParams(str(root), params) )
+	finally:
+		mc.undoInfo(closeChunk=True)
+
+	return(report)
+
+
+## ----------------------------------------------------------------------
+def retoken(root, token=None, side=None):
+	## one module; see retokenModules
+	return( retokenModules( { str(root):{ 'token':token, 'side':side } } )[str(root)] )
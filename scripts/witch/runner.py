@@ -0,0 +1,435 @@
+import time
+
+## ----------------------------------------------------------------------
+'''
+
+	RUNNER.PY
+
+	Cooperative build runner.
+
+	automatedBuild runs every stage in one blocking call. A BuildRunner
+	splits the same stages into one work item per module and stage, runs
+	them in chunks that stay within a time budget, and hands control back
+	between chunks (in Maya, through executeDeferred, so the UI stays live).
+	Progress goes to listeners as event dicts:
+
+		type:		'start', 'progress', 'done', 'cancelled' or 'failed'
+		stage:		current stage name (None for start / end events)
+		module:		root of the module being worked on
+		index:		work items finished so far
+		total:		work item count
+		percent:	0.0 - 100.0
+		elapsed:	seconds since start
+		eta:		estimated seconds left (None until something has finished)
+		error:		the exception, for 'failed'
+		unbuilt:	roots a rollback left without a module they had before
+
+	cancel() stops the runner before its next work item; every module that
+	had its build started is rolled back (newest first). A failing work item
+	rolls back the same way and re-raises.
+
+	A rollback can't bring back a module that a rebuild removed: the root
+	is left tagged but unbuilt, and goes into unbuilt (on the runner and
+	in the 'cancelled' / 'failed' event). Building it again restores it.
+
+	Everything scene-related lives in the backend, so nothing in this file
+	imports maya. MayaBackend does the real work; HeadlessBackend and
+	FakeClock stand in for it and for the wall clock outside Maya (see
+	selfCheck).
+
+'''
+
+## ----------------------------------------------------------------------
+class RunnerException(Exception):
+	pass
+
+## states
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+CANCELLED = 'cancelled'
+FAILED = 'failed'
+
+STAGES = [ 'instantiate', 'validate', 'build', 'postbuild', 'seam' ]
+
+## the stage after which a module has scene changes to roll back
+ROLLBACK_STAGE = 'instantiate'
+
+## ----------------------------------------------------------------------
+class SystemClock(object):
+	def time(self):
+		return( time.time() )
+
+
+## ----------------------------------------------------------------------
+class FakeClock(object):
+	## only moves when told to
+	def __init__(self, start=0.0):
+		self.now = start
+
+	def time(self):
+		return(self.now)
+
+	def advance(self, seconds):
+		self.now += seconds
+
+
+## ----------------------------------------------------------------------
+class HeadlessBackend(object):
+	'''
+	Stand-in backend: "builds" plain names, advancing a FakeClock by
+	costs[stage] per work item, and records every call in .calls.
+	failOn is an optional (stage, root) pair that raises; built lists the
+	roots that are being rebuilt.
+	'''
+
+	def __init__(self, roots, clock=None, costs=None, failOn=None, built=None):
+		self.roots = list(roots)
+		self.clock = clock
+		self.costs = costs or {}
+		self.failOn = failOn
+		self.built = list(built or [])
+		self.calls = []
+		self.deferred = []
+
+	def collect(self):
+		return( list(self.roots) )
+
+	def run(self, stage, root):
+		self.calls.append( (stage, root) )
+		if self.clock is not None:
+			self.clock.advance( self.costs.get(stage, 0.0) )
+		if self.failOn == (stage, root):
+			raise RunnerException('HeadlessBackend: %s failed on %s.' % (stage, root))
+
+	def rollback(self, root):
+		self.calls.append( ('rollback', root) )
+		return( root in self.built )
+
+	def defer(self, function):
+		self.deferred.append(function)
+
+	def flush(self):
+		## runs deferred calls until none are left, like an idle event loop
+		while len(self.deferred):
+			self.deferred.pop(0)()
+
+
+## ----------------------------------------------------------------------
+class MayaBackend(object):
+	'''
+	The automatedBuild stages, one module at a time.
+	'''
+
+	def __init__(self, roots=None, rebuild=False, plan=True, processes=None):
+		from . import moduleFactory
+		self.roots = roots
+		self.rebuild = rebuild
+		self.plan = plan
+		self.processes = processes
+		self.factory = moduleFactory.ModuleFactory()
+		self.descriptors = {}
+		self.instances = {}
+
+	def collect(self):
+		from . import automatedBuild
+		from . import descriptors
+
+		results = []
+		for item in descriptors.scanRoots(self.roots):
+			if not item.type in self.factory.modules:
+				continue
+			if item.built and not self.rebuild:
+				continue
+			self.descriptors[item.root] = item
+			results.append(item.root)
+
+		if self.plan and len(results):
+			report = automatedBuild.planBuild(results, self.factory, self.processes)
+			if not report.ok:
+				raise RunnerException( 'Build plan has %d error(s):\n%s' % (len(report.errors), report.format()) )
+
+		return(results)
+
+	def run(self, stage, root):
+		from . import utils
+
+		if stage == 'instantiate':
+			item = self.descriptors[root]
+			if item.built:
+				utils.removeModule(root)
+			self.instances[root] = item.instantiate(self.factory)
+			return
+
+		instance = self.instances[root]
+		if stage == 'validate':
+			if not instance.validate():
+				raise RunnerException( 'Instance invalid: %s (root %s).' % (instance._message, root) )
+		elif stage == 'build':
+			instance.build()
+		elif stage == 'postbuild':
+			instance.postbuild()
+		elif stage == 'seam':
+			instance.seamRoot()
+			instance.seamGoal()
+
+	def rollback(self, root):
+		## True if the root had a module before this run: instantiate
+		## removed it, and nothing here can bring it back
+		from . import utils
+		from maya import cmds as mc
+
+		utils.removeModule(root)
+		## removeModule untags the root; a rolled back root should still build
+		if mc.objExists(root):
+			self.descriptors[root].instantiate(self.factory)
+		self.instances.pop(root, None)
+		return( self.descriptors[root].built )
+
+	def defer(self, function):
+		import maya.utils
+		maya.utils.executeDeferred(function)
+
+
+## ----------------------------------------------------------------------
+class BuildRunner(object):
+	'''
+	BuildRunner(backend, clock=None, budget=0.1, listeners=None):
+
+	budget:		seconds of work per chunk before control is handed back.
+				At least one work item runs per chunk.
+	'''
+
+	def __init__(self, backend, clock=None, budget=0.1, listeners=None):
+		self.backend = backend
+		self.clock = clock or SystemClock()
+		self.budget = budget
+		self.listeners = list(listeners or [])
+
+		self.state = PENDING
+		self.items = []
+		self.index = 0
+		self.started = []
+		self.unbuilt = []
+		self.startTime = None
+		self.error = None
+		self._cancel = False
+
+	def __repr__(self):
+		return( "<< Witch Build Runner: %s, %d/%d." % (self.state, self.index, len(self.items)) )
+
+	def addListener(self, listener):
+		self.listeners.append(listener)
+
+	def removeListener(self, listener):
+		self.listeners.remove(listener)
+
+	def emit(self, eventType, stage=None, module=None, error=None):
+		total = len(self.items)
+		elapsed = self.clock.time() - self.startTime if self.startTime is not None else 0.0
+		eta = None
+		if self.index:
+			eta = elapsed / self.index * (total - self.index)
+
+		event = {
+			'type':eventType,
+			'stage':stage,
+			'module':module,
+			'index':self.index,
+			'total':total,
+			'percent':100.0 * self.index / total if total else 100.0,
+			'elapsed':elapsed,
+			'eta':eta,
+			'error':error,
+			'unbuilt':list(self.unbuilt),
+		}
+		for listener in self.listeners:
+			listener(event)
+		return(event)
+
+	def start(self):
+		if not self.state == PENDING:
+			raise RunnerException('start: runner is %s.' % self.state)
+		roots = self.backend.collect()
+		self.items = [ (stage, root) for stage in STAGES for root in roots ]
+		self.startTime = self.clock.time()
+		self.state = RUNNING
+		self.emit('start')
+
+	def cancel(self):
+		## takes effect before the next work item
+		self._cancel = True
+
+	def step(self):
+		'''
+		Runs one chunk of work items. Returns True while there's more to do.
+		'''
+
+		if self.state == PENDING:
+			self.start()
+		if not self.state == RUNNING:
+			return(False)
+
+		deadline = self.clock.time() + self.budget
+		while self.index < len(self.items):
+			if self._cancel:
+				self.rollback()
+				self.state = CANCELLED
+				self.emit('cancelled')
+				return(False)
+
+			stage, root = self.items[self.index]
+			if stage == ROLLBACK_STAGE:
+				self.started.append(root)
+			try:
+				self.backend.run(stage, root)
+			except Exception as error:
+				self.error = error
+				self.rollback()
+				self.state = FAILED
+				self.emit('failed', stage, root, error)
+				raise
+
+			self.index += 1
+			self.emit('progress', stage, root)
+
+			if self.clock.time() >= deadline:
+				break
+
+		if self.index >= len(self.items):
+			self.state = DONE
+			self.emit('done')
+			return(False)
+
+		return(True)
+
+	def rollback(self):
+		for root in reversed(self.started):
+			if self.backend.rollback(root):
+				self.unbuilt.append(root)
+		self.started = []
+
+	def run(self):
+		## blocking: every chunk back to back
+		while self.step():
+			pass
+		return(self.state)
+
+	def runDeferred(self):
+		## one chunk per idle callback, so the host stays responsive
+		def chunk():
+			if self.step():
+				self.backend.defer(chunk)
+		self.backend.defer(chunk)
+
+
+## ----------------------------------------------------------------------
+def printListener(event):
+	## automatedBuild-style log lines
+	if event['type'] == 'progress':
+		eta = '' if event['eta'] is None else ', %.1fs left' % event['eta']
+		print( "\t++ [%5.1f%%] %s: %s%s" % (event['percent'], event['stage'], event['module'], eta) )
+	elif event['type'] == 'failed':
+		print( "!! Build failed in %s (%s): %s" % (event['stage'], event['module'], event['error']) )
+	else:
+		print( ">> Build %s (%d/%d, %.2fs)" % (event['type'], event['index'], event['total'], event['elapsed']) )
+	if event['type'] in ('failed', 'cancelled') and len(event['unbuilt']):
+		print( "!! Rollback left %d previously built root(s) unbuilt: %s" % (len(event['unbuilt']), ', '.join(event['unbuilt'])) )
+
+
+## ----------------------------------------------------------------------
+def runBuild(*args, **kwargs):
+	'''
+	runBuild(*roots, rebuild=False, plan=True, budget=0.1, listeners=None, deferred=True):
+
+	Builds the given roots (every tagged root if none are given) with a
+	BuildRunner on a MayaBackend. With deferred=True this returns right away
+	and the build runs in idle chunks; keep the runner to cancel() it.
+
+	Returns:
+
+	The BuildRunner.
+	'''
+
+	backend = MayaBackend( [ str(x) for x in args ] if len(args) else None,
+		rebuild=kwargs.get('rebuild', False), plan=kwargs.get('plan', True) )
+	runner = BuildRunner( backend, budget=kwargs.get('budget', 0.1),
+		listeners=kwargs.get('listeners', [printListener]) )
+
+	if kwargs.get('deferred', True):
+		runner.runDeferred()
+	else:
+		runner.run()
+
+	return(runner)
+
+
+## ----------------------------------------------------------------------
+def selfCheck():
+	'''
+	Exercises the runner with a HeadlessBackend and a FakeClock: chunking,
+	progress / ETA, cancellation with rollback and failure with rollback
+	(including a rebuilt root left unbuilt).
+
+	Returns:
+
+	A list of failure messages; empty if everything behaved.
+	'''
+
+	failures = []
+	def check(condition, message):
+		if not condition:
+			failures.append(message)
+
+	roots = [ 'A', 'B', 'C' ]
+
+	## chunking: every item costs 0.25s, the budget is 0.5s -> 2 per chunk
+	clock = FakeClock()
+	backend = HeadlessBackend(roots, clock, costs=dict( (x, 0.25) for x in STAGES ))
+	events = []
+	runner = BuildRunner(backend, clock, budget=0.5, listeners=[events.append])
+	chunks = 0
+	while runner.step():
+		chunks += 1
+	check( runner.state == DONE, 'chunked run ended %s' % runner.state )
+	check( chunks + 1 == 8, 'expected 8 chunks, got %d' % (chunks + 1) )
+	check( len(backend.calls) == len(STAGES) * len(roots), 'wrong call count %d' % len(backend.calls) )
+	check( backend.calls[:3] == [ ('instantiate', x) for x in roots ], 'stages out of order' )
+	progress = [ x for x in events if x['type'] == 'progress' ]
+	check( abs(progress[-1]['percent'] - 100.0) < 1e-9, 'progress did not reach 100%' )
+	check( abs(progress[0]['eta'] - 0.25 * 14) < 1e-9, 'wrong eta %s' % progress[0]['eta'] )
+
+	## cancellation: everything started is rolled back, newest first
+	clock = FakeClock()
+	backend = HeadlessBackend(roots, clock, costs={ 'build':1.0 })
+	events = []
+	runner = BuildRunner(backend, clock, budget=0.5, listeners=[events.append])
+	while runner.step():
+		if ('build', 'A') in backend.calls:
+			runner.cancel()
+	check( runner.state == CANCELLED, 'cancelled run ended %s' % runner.state )
+	check( backend.calls[-3:] == [ ('rollback', x) for x in reversed(roots) ], 'rollback after cancel: %s' % backend.calls[-3:] )
+	check( events[-1]['type'] == 'cancelled', 'no cancelled event' )
+
+	## failure: rolls back and re-raises; a rebuilt root is reported unbuilt
+	backend = HeadlessBackend(roots, FakeClock(), failOn=('build', 'B'), built=['C'])
+	events = []
+	runner = BuildRunner(backend, FakeClock(), listeners=[events.append])
+	try:
+		runner.run()
+		failures.append('failure was not raised')
+	except RunnerException:
+		pass
+	check( runner.state == FAILED, 'failed run ended %s' % runner.state )
+	check( ('rollback', 'A') in backend.calls and ('rollback', 'C') in backend.calls, 'rollback after failure' )
+	check( runner.unbuilt == ['C'] and events[-1]['unbuilt'] == ['C'], 'unbuilt after failure: %s' % runner.unbuilt )
+
+	## deferred: runs through the backend's idle queue
+	clock = FakeClock()
+	backend = HeadlessBackend(roots, clock, costs=dict( (x, 0.05) for x in STAGES ))
+	runner = BuildRunner(backend, clock, budget=0.1)
+	runner.runDeferred()
+	backend.flush()
+	check( runner.state == DONE, 'deferred run ended %s' % runner.state )
+
+	return(failures)
@@ -0,0 +1,259 @@
+import os
+import json
+import math
+
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
+## ----------------------------------------------------------------------
+'''
+
+	SHAPES.PY
+
+	The controller shape library and the engine that turns a shape plus the
+	controller params (scale, aim / up, translation, rotation) into final CV
+	positions.
+
+	Transformed point lists are cached per (shape, scale, aim, up, offset)
+	key, so a chain of a hundred identical controls computes its CVs once and
+	every curve is created with its final points in a single call.
+
+	Shapes are authored aiming down +X with +Y up. New shapes can be added
+	with registerShape() or loaded from a JSON library file (a dict of
+	shape name -> list of [x, y, z] points) with loadLibrary().  Any files
+	listed in the WITCH_SHAPE_LIBRARY environment variable are loaded on
+	import.
+
+	This file doesn't import maya, so it's safe to use from worker processes.
+
+'''
+
+## ----------------------------------------------------------------------
+class ShapesException(Exception):
+	pass
+
+## ----------------------------------------------------------------------
+## Definitions for different rig controller types
+## Controllers are created as D-1 nurbs curves only.
+_library = {
+	'box' : [[0, -0.5, 0.5], [0, -0.5, -0.5], [0, 0.5, -0.5], [0, 0.5, 0.5], [0, -0.5, 0.5]],
+	'circle': [
+		[1.874699728327322e-33, 0.5, -3.061616997868383e-17],
+		[-1.1716301013315743e-17, 0.46193976625564337, 0.19134171618254486],
+		[-2.1648901405887335e-17, 0.35355339059327373, 0.3535533905932738],
+		[-2.8285652807192507e-17, 0.19134171618254486, 0.46193976625564337],
+		[-3.061616997868383e-17, -2.4894981252573997e-17, 0.5],
+		[-2.8285652807192507e-17, -0.19134171618254492, 0.46193976625564337],
+		[-2.164890140588733e-17, -0.35355339059327384, 0.35355339059327373],
+		[-1.1716301013315742e-17, -0.4619397662556434, 0.19134171618254484],
+		[3.223916797098519e-33, -0.5, -5.265055686820291e-17],
+		[1.171630101331575e-17, -0.4619397662556433, -0.19134171618254495],
+		[2.1648901405887338e-17, -0.3535533905932737, -0.35355339059327384],
+		[2.828565280719251e-17, -0.19134171618254478, -0.4619397662556434],
+		[3.061616997868383e-17, 1.0816170809946073e-16, -0.5],
+		[2.8285652807192507e-17, 0.191341716182545, -0.4619397662556433],
+		[2.1648901405887323e-17, 0.35355339059327384, -0.3535533905932736],
+		[1.1716301013315736e-17, 0.46193976625564337, -0.19134171618254472],
+		[-1.0022072164332974e-32, 0.4999999999999999, 1.6367285933071856e-16]
+	],
+	'cube': [
+		[-0.5, 0.5, 0.5], [0.5, 0.5, 0.5], [0.5, 0.5, -0.5], [-0.5, 0.5, -0.5],
+		[-0.5, 0.5, 0.5], [-0.5, -0.5, 0.5], [0.5, -0.5, 0.5], [0.5, 0.5, 0.5],
+		[0.5, -0.5, 0.5], [0.5, -0.5, -0.5], [0.5, 0.5, -0.5], [0.5, -0.5, -0.5],
+		[-0.5, -0.5, -0.5], [-0.5, 0.5, -0.5], [-0.5, -0.5, -0.5], [-0.5, -0.5, 0.5]
+	],
+}
+
+axes = {
+	'x': (1.0, 0.0, 0.0),
+	'y': (0.0, 1.0, 0.0),
+	'z': (0.0, 0.0, 1.0),
+	'-x': (-1.0, 0.0, 0.0),
+	'-y': (0.0, -1.0, 0.0),
+	'-z': (0.0, 0.0, -1.0),
+}
+
+_cache = {}
+_stats = { 'hits':0, 'misses':0 }
+
+## ----------------------------------------------------------------------
+def names():
+	return( sorted(_library.keys()) )
+
+
+## ----------------------------------------------------------------------
+def registerShape(name, points, overwrite=True):
+	'''
+	registerShape(name, points, overwrite=True):
+
+	Adds a shape to the library. Points are a list of [x, y, z] positions for
+	a D-1 curve, authored aiming down +X with +Y up.
+	'''
+
+	if name in _library and not overwrite:
+		raise ShapesException('registerShape: shape %s already exists.' % name)
+
+	points = [ [ float(x) for x in point ] for point in points ]
+	if len(points) < 2 or [ x for x in points if not len(x) == 3 ]:
+		raise ShapesException('registerShape: shape %s needs two or more 3D points.' % name)
+
+	_library[name] = points
+
+	## anything cached for an older version of the shape is stale
+	for key in [ x for x in _cache if x[0] == name ]:
+		_cache.pop(key)
+
+
+## ----------------------------------------------------------------------
+def loadLibrary(path, overwrite=True):
+	'''
+	Loads every shape in a JSON library file. Returns the names loaded.
+	'''
+
+	with open(path, 'r') as handle:
+		data = json.load(handle)
+
+	if not isinstance(data, dict):
+		raise ShapesException('loadLibrary: %s does not contain a shape dictionary.' % path)
+
+	for name, points in data.items():
+		registerShape(str(name), points, overwrite=overwrite)
+
+	return( sorted(str(x) for x in data.keys()) )
+
+
+## ----------------------------------------------------------------------
+def saveLibrary(path, shapeNames=None):
+	shapeNames = shapeNames or names()
+	data = dict( (x, _library[x]) for x in shapeNames )
+	with open(path, 'w') as handle:
+		json.dump(data, handle, indent=1, sort_keys=True)
+
+
+## ----------------------------------------------------------------------
+def orientMatrix(aim='x', up='y'):
+	'''
+	Returns the 3x3 (row vector) matrix that takes a shape authored down +X
+	with +Y up to the given aim and up axes.
+	'''
+
+	if not aim in axes or not up in axes:
+		raise ShapesException('orientMatrix: axes must be one of %s.' % ' '.join(sorted(axes)))
+	if aim.strip('-') == up.strip('-'):
+		raise ShapesException('orientMatrix: aim and up cannot be the same axis (%s, %s).' % (aim, up))
+
+	a = axes[aim]
+	u = axes[up]
+	side = ( a[1]*u[2] - a[2]*u[1], a[2]*u[0] - a[0]*u[2], a[0]*u[1] - a[1]*u[0] )
+
+	return( [ list(a), list(u), list(side) ] )
+
+
+## ----------------------------------------------------------------------
+def rotationMatrix(rotation):
+	## euler degrees, xyz order, row vectors (Maya convention)
+	rx, ry, rz = [ math.radians(float(x)) for x in (list(rotation) + [0.0, 0.0, 0.0])[:3] ]
+
+	cx, sx = math.cos(rx), math.sin(rx)
+	cy, sy = math.cos(ry), math.sin(ry)
+	cz, sz = math.cos(rz), math.sin(rz)
+
+	mx = [ [1.0, 0.0, 0.0], [0.0, cx, sx], [0.0, -sx, cx] ]
+	my = [ [cy, 0.0, -sy], [0.0, 1.0, 0.0], [sy, 0.0, cy] ]
+	mz = [ [cz, sz, 0.0], [-sz, cz, 0.0], [0.0, 0.0, 1.0] ]
+
+	return( _multiply(_multiply(mx, my), mz) )
+
+
+## ----------------------------------------------------------------------
+def _multiply(a, b):
+	return( [ [ sum( a[i][k] * b[k][j] for k in range(3) ) for j in range(3) ] for i in range(3) ] )
+
+
+## ----------------------------------------------------------------------
+def _key(shape, scale, aim, up, translation, rotation):
+	translation = tuple( float(x) for x in (list(translation or []) + [0.0, 0.0, 0.0])[:3] )
+	rotation = tuple( float(x) for x in (list(rotation or []) + [0.0, 0.0, 0.0])[:3] )
+	return( (shape, float(scale), aim, up, translation, rotation) )
+
+
+## ----------------------------------------------------------------------
+def transformPoints(points, scale=1.0, aim='x', up='y', translation=None, rotation=None):
+	'''
+	transformPoints(points, scale=1.0, aim='x', up='y', translation=None, rotation=None):
+
+	Applies the controller params to a list of points: uniform scale, then
+	the aim / up axis remap, then the offset rotation (euler degrees, xyz)
+	and finally the offset translation, all in the control's local space.
+
+	Returns:
+
+	An (N, 3) NumPy array, or a list of [x, y, z] lists if NumPy isn't
+	available.
+	'''
+
+	key = _key(None, scale, aim, up, translation, rotation)
+	scale, translation, rotation = key[1], key[4], key[5]
+
+	matrix = _multiply( orientMatrix(aim, up), rotationMatrix(rotation) )
+
+	if np is not None:
+		result = np.asarray(points, dtype=np.float64) * scale
+		result = result.dot( np.asarray(matrix) ) + np.asarray(translation)
+		return(result)
+
+	result = []
+	for point in points:
+		point = [ x * scale for x in point ]
+		result.append( [ sum( point[k] * matrix[k][j] for k in range(3) ) + translation[j] for j in range(3) ] )
+	return(result)
+
+
+## ----------------------------------------------------------------------
+def getPoints(shape, scale=1.0, aim='x', up='y', translation=None, rotation=None):
+	'''
+	getPoints(shape, scale=1.0, aim='x', up='y', translation=None, rotation=None):
+
+	Cached version of transformPoints for library shapes.
+
+	Returns:
+
+	A tuple of (x, y, z) tuples, ready to hand to curve creation. The result
+	is shared between callers and must not be modified.
+	'''
+
+	if not shape in _library:
+		raise ShapesException('getPoints: unknown controller shape %s (known: %s).' % (shape, ', '.join(names())))
+
+	key = _key(shape, scale, aim, up, translation, rotation)
+
+	result = _cache.get(key)
+	if result is not None:
+		_stats['hits'] += 1
+		return(result)
+
+	_stats['misses'] += 1
+	points = transformPoints(_library[shape], key[1], aim, up, key[4], key[5])
+	result = tuple( tuple( float(x) for x in point ) for point in points )
+	_cache[key] = result
+
+	return(result)
+
+
+## ----------------------------------------------------------------------
+def cacheInfo():
+	return( { 'hits':_stats['hits'], 'misses':_stats['misses'], 'size':len(_cache) } )
+
+
+## ----------------------------------------------------------------------
+def clearCache():
+	_cache.clear()
+	_stats['hits'] = _stats['misses'] = 0
+
+
+## ----------------------------------------------------------------------
+for _path in os.environ.get('WITCH_SHAPE_LIBRARY', '').split(os.pathsep):
+	if len(_path) and os.path.exists(_path):
+		loadLibrary(_path)
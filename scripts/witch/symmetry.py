@@ -0,0 +1,380 @@
+import maya
+from maya import cmds as mc
+import pymel.core as pm
+
+from . import utils
+from . import graph
+from . import descriptors
+from .modules import module_base
+
+## ----------------------------------------------------------------------
+'''
+
+	SYMMETRY.PY
+
+	Builds one side of a character and mirrors it onto the other.
+
+	Left / right roots are paired by name (ARM_LF_01 <-> ARM_RT_01, see
+	mirrorName). The left module is built as usual; the right one is a
+	copy of its node graph (graph.cloneModule) rewired onto the right chain
+	and mirrored in place, which skips everything build() does besides
+	creating nodes.
+
+	Mirroring is behavior mirroring across the YZ plane, which is what
+	Maya's mirror joint tool gives you with the behavior option: world
+	positions flip in X and every local axis flips as well. For a node in a
+	mirrored hierarchy that works out to negating its local translation
+	while the rotation stays the same; only nodes whose parent isn't
+	mirrored (the MODULE node, anything with inheritsTransform off) need
+	their full matrix mirrored. The right-side skeleton is expected to be a
+	behavior mirror of the left; compareModules checks a mirrored module
+	against an independently built one.
+
+	A mirrored root has a mirrorOf link to its source, and
+	ModuleBase.setParam keeps the pair's params in sync.
+
+'''
+
+## ----------------------------------------------------------------------
+class SymmetryException(Exception):
+	pass
+
+## constants
+SIDE_TOKENS = [ ('_LF_', '_RT_'), ('_lf_', '_rt_'), ('_L_', '_R_') ]
+
+## behavior mirror across YZ: W' = FLIP_ROWS * W * FLIP_X
+FLIP_ROWS = [ -1.0, -1.0, -1.0, 1.0 ]
+FLIP_X = [ -1.0, 1.0, 1.0, 1.0 ]
+
+## ----------------------------------------------------------------------
+def mirrorName(name, extra=None):
+	'''
+	mirrorName(name, extra=None):
+
+	Swaps the side tokens in a name (see SIDE_TOKENS). extra is a dict of
+	additional substring swaps that take precedence; every substring is
+	replaced at most once, so swapped parts aren't swapped back.
+	'''
+
+	table = {}
+	for left, right in SIDE_TOKENS:
+		table[left] = right
+		table[right] = left
+	if extra:
+		table.update(extra)
+
+	return( graph.replaceAll(name, table) )
+
+
+## ----------------------------------------------------------------------
+def pairSides(items):
+	'''
+	pairSides(items):
+
+	Pairs left module descriptors with their right side partners (same type,
+	same chain length, mirrored root name).
+
+	Returns:
+
+	A (pairs, singles) tuple: a list of (left, right) descriptor tuples and
+	a list of the descriptors without a partner.
+	'''
+
+	byRoot = dict( (x.root, x) for x in items )
+
+	pairs = []
+	used = set()
+	for item in items:
+		if not item.side == 'lf' or item.root in used:
+			continue
+		partner = byRoot.get( mirrorName(item.root) )
+		if partner is None or partner.root in used or not partner.side == 'rt':
+			continue
+		if not partner.type == item.type or not len(partner.chain) == len(item.chain):
+			continue
+		pairs.append( (item, partner) )
+		used.update( [item.root, partner.root] )
+
+	singles = [ x for x in items if not x.root in used ]
+
+	return( (pairs, singles) )
+
+
+## ----------------------------------------------------------------------
+def mirrorMatrix(m, local=True):
+	## flat 16 float matrices; local matrices of nodes with a mirrored
+	## parent only lose their translation, everything else gets F * m * S
+	if local:
+		return( [ -x if index in (12, 13, 14) else x for index, x in enumerate(m) ] )
+	return( [ FLIP_ROWS[index // 4] * FLIP_X[index % 4] * x for index, x in enumerate(m) ] )
+
+
+## ----------------------------------------------------------------------
+def _settable(plug):
+	return( not mc.connectionInfo(plug, isDestination=True) and not mc.getAttr(plug, lock=True) )
+
+
+## ----------------------------------------------------------------------
+def _negate(plug):
+	if _settable(plug):
+		mc.setAttr( plug, *[ -x for x in mc.getAttr(plug)[0] ] )
+
+
+## ----------------------------------------------------------------------
+def _isIdentity(m, tolerance=1e-9):
+	return( all( abs(x - (1.0 if index % 5 == 0 else 0.0)) < tolerance for index, x in enumerate(m) ) )
+
+
+## ----------------------------------------------------------------------
+def mirrorNodes(nodes, top=None):
+	'''
+	mirrorNodes(nodes, top=None):
+
+	Mirrors a set of already duplicated nodes in place (see the file
+	docstring). top is the node whose parent isn't mirrored; its world
+	matrix is mirrored, and so is the local matrix of any node with
+	inheritsTransform off.
+	'''
+
+	for node in nodes:
+		name = str(node)
+		nodeType = mc.nodeType(name)
+
+		if nodeType in ('transform', 'joint'):
+			if name == str(top):
+				mc.xform( name, ws=True, m=mirrorMatrix( mc.xform(name, q=True, ws=True, m=True), local=False ) )
+			elif not mc.getAttr(name+'.inheritsTransform'):
+				mc.xform( name, os=True, m=mirrorMatrix( mc.xform(name, q=True, os=True, m=True), local=False ) )
+			else:
+				_negate(name+'.translate')
+
+			if mc.attributeQuery('offsetParentMatrix', node=name, exists=True) and _settable(name+'.offsetParentMatrix'):
+				opm = mc.getAttr(name+'.offsetParentMatrix')
+				if not _isIdentity(opm):
+					mc.setAttr( name+'.offsetParentMatrix', mirrorMatrix(opm), type='matrix' )
+
+		elif nodeType == 'nurbsCurve':
+			points = mc.getAttr(name+'.controlPoints[*]') or []
+			for index, point in enumerate(points):
+				mc.setAttr( '%s.controlPoints[%d]' % (name, index), *[ -x for x in point ] )
+
+		elif nodeType == 'multMatrix':
+			for index in mc.getAttr(name+'.matrixIn', multiIndices=True) or []:
+				plug = '%s.matrixIn[%d]' % (name, index)
+				if _settable(plug):
+					m = mc.getAttr(plug)
+					if not _isIdentity(m):
+						mc.setAttr( plug, mirrorMatrix(m), type='matrix' )
+
+		elif nodeType == 'composeMatrix':
+			_negate(name+'.inputTranslate')
+
+		elif nodeType in ('parentConstraint', 'pointConstraint'):
+			if nodeType == 'pointConstraint':
+				_negate(name+'.offset')
+			for index in mc.getAttr(name+'.target', multiIndices=True) or []:
+				if nodeType == 'parentConstraint':
+					_negate( '%s.target[%d].targetOffsetTranslate' % (name, index) )
+
+		elif nodeType == 'aimConstraint':
+			## axes of a mirrored frame flip
+			_negate(name+'.aimVector')
+			_negate(name+'.upVector')
+			plug = name+'.worldUpVector'
+			if _settable(plug):
+				x, y, z = mc.getAttr(plug)[0]
+				mc.setAttr(plug, x, -y, -z)
+
+
+## ----------------------------------------------------------------------
+def copyParams(source, target, skip=None):
+	## WT_ params from one root to another; inputs are per module
+	prefix = module_base.PARAM_PREFIX + '_'
+	skip = set( prefix + x for x in (module_base.MIRROR_SKIP_PARAMS if skip is None else skip) )
+
+	for attr in mc.listAttr(source, ud=True) or []:
+		if not attr.startswith(prefix) or attr.count('.') or attr in skip or attr.endswith('Input'):
+			continue
+		if not mc.attributeQuery(attr, node=target, exists=True):
+			continue
+		plug = '%s.%s' % (source, attr)
+		attrType = mc.getAttr(plug, type=True)
+		if attrType == 'message':
+			continue
+
+		locked = mc.getAttr('%s.%s' % (target, attr), lock=True)
+		if locked:
+			mc.setAttr('%s.%s' % (target, attr), lock=False)
+
+		if attrType == 'string':
+			mc.setAttr( '%s.%s' % (target, attr), mc.getAttr(plug) or '', type='string' )
+		elif attrType in ('float3', 'double3'):
+			mc.setAttr( '%s.%s' % (target, attr), *mc.getAttr(plug)[0] )
+		else:
+			mc.setAttr( '%s.%s' % (target, attr), mc.getAttr(plug) )
+
+		if locked:
+			mc.setAttr('%s.%s' % (target, attr), lock=True)
+
+
+## ----------------------------------------------------------------------
+def mirrorModule(source, target, factory=None):
+	'''
+	mirrorModule(source, target, factory=None):
+
+	Mirrors the module built on the source root onto the (unbuilt) target
+	root: the target is tagged with the same type and params, the source
+	module is cloned onto its chain with side tokens swapped in the names,
+	and the copy is mirrored. Seams aren't copied; run seamRoot / seamGoal
+	on the result.
+
+	Returns:
+
+	The target module instance (rehydrated).
+	'''
+
+	from . import moduleFactory
+	factory = factory or moduleFactory.ModuleFactory()
+
+	source = str(source)
+	target = str(target)
+
+	module = graph.moduleOf(source)
+	if module is None:
+		raise SymmetryException('mirrorModule: %s is not built.' % source)
+	if graph.moduleOf(target) is not None:
+		raise SymmetryException('mirrorModule: %s is already built.' % target)
+
+	moduleType = utils.getAttrSpecial(source, 'type', prefix=module_base.PARAM_PREFIX)
+	moduleClass = factory.getClass(moduleType)
+
+	## tagging (rig root, params); the param values come from the source
+	moduleClass(target)
+	copyParams(source, target)
+
+	if not mc.attributeQuery('mirrorOf', node=target, exists=True):
+		mc.addAttr(target, ln='mirrorOf', at='message')
+	mc.connectAttr(source+'.message', target+'.mirrorOf', force=True)
+
+	sourceChain = [ str(x) for x in utils.getChain(pm.PyNode(source)) ]
+	targetChain = [ str(x) for x in utils.getChain(pm.PyNode(target)) ]
+	names = dict( zip( [ x.rpartition('|')[2] for x in sourceChain ], [ x.rpartition('|')[2] for x in targetChain ] ) )
+
+	owned = graph.ownedNodes(module)
+	clones = graph.cloneModule( module, targetChain, rename=lambda x: mirrorName(x, names) )
+	mirrorNodes( [ clones[x] for x in owned['dag'] + owned['external'] + owned['dg'] ], top=clones[owned['module']] )
+
+	instance = moduleClass.rehydrate(target)
+
+	## seams belong to the source's parents-- they're redone by the caller
+	for key, node in instance._inputs.items():
+		utils.removeConstraints(node)
+
+	return(instance)
+
+
+## ----------------------------------------------------------------------
+def mirrorBuild(*args, **kwargs):
+	'''
+	mirrorBuild(*roots, rebuild=False, plan=True):
+
+	Builds the given roots (every tagged root if none are given): left
+	modules and modules without a partner go through automatedBuild, right
+	modules with a left partner are mirrored from it. Seam parents missing
+	on a mirrored root are taken from its partner, with side tokens swapped
+	where the mirrored parent exists.
+
+	Returns:
+
+	The mirrored module instances.
+	'''
+
+	from . import automatedBuild
+	from . import moduleFactory
+
+	rebuild = kwargs.get('rebuild', False)
+	plan = kwargs.get('plan', True)
+
+	roots = [ str(x) for x in utils.makeList(args, type='joint') ] if len(args) else None
+	pairs, singles = pairSides( descriptors.scanRoots(roots) )
+
+	sources = [ x.root for x, y in pairs ] + [ x.root for x in singles ]
+	if len(sources):
+		automatedBuild.automatedBuild( *sources, rebuild=rebuild, plan=plan )
+
+	factory = moduleFactory.ModuleFactory()
+	instances = []
+
+	print( ">> MirrorBuild: Mirroring %d module(s)..." % len(pairs) )
+	for left, right in pairs:
+		if right.built:
+			if not rebuild:
+				print( "\t-- MirrorBuild: Skipping built root %s." % right.root )
+				continue
+			utils.removeModule(right.root)
+
+		for seam in 'root', 'goal':
+			parent = left.parent(seam)
+			if parent is not None and right.parent(seam) is None:
+				mirrored = mirrorName(parent)
+				utils.setParentAttr( right.root, mirrored if mc.objExists(mirrored) else parent, type=seam )
+
+		print( "\t++ %s -> %s" % (left.root, right.root) )
+		instances.append( mirrorModule(left.root, right.root, factory) )
+
+	for instance in instances:
+		instance.seamRoot()
+		instance.seamGoal()
+
+	print( "++ MirrorBuild: Complete (%d mirrored)" % len(instances) )
+
+	return(instances)
+
+
+## ----------------------------------------------------------------------
+def captureModule(instance):
+	'''
+	World matrices of a built module's controls (by category) and of its
+	bind chain, as plain data for compareModules.
+	'''
+
+	return( {
+		'controls':dict( (key, [ mc.xform(str(x), q=True, ws=True, m=True) for x in items ])
+			for key, items in instance._controllers.items() ),
+		'chain':[ mc.xform(str(x), q=True, ws=True, m=True) for x in instance.chain ],
+	} )
+
+
+## ----------------------------------------------------------------------
+def compareModules(a, b, tolerance=1e-3):
+	'''
+	compareModules(a, b, tolerance=1e-3):
+
+	Compares two modules (instances or captureModule results) matrix by
+	matrix.
+
+	Returns:
+
+	A list of mismatch messages; empty if they match.
+	'''
+
+	if not isinstance(a, dict):
+		a = captureModule(a)
+	if not isinstance(b, dict):
+		b = captureModule(b)
+
+	results = []
+	groups = [ ('chain', a['chain'], b['chain']) ]
+	for key in sorted( set(a['controls']) | set(b['controls']) ):
+		groups.append( ('controls.'+key, a['controls'].get(key, []), b['controls'].get(key, [])) )
+
+	for key, first, second in groups:
+		if not len(first) == len(second):
+			results.append( '%s: count differs (%d, %d).' % (key, len(first), len(second)) )
+			continue
+		for index, (m, n) in enumerate( zip(first, second) ):
+			delta = max( abs(x - y) for x, y in zip(m, n) )
+			if delta > tolerance:
+				results.append( '%s[%d]: off by %.6f.' % (key, index, delta) )
+
+	return(results)
@@ -0,0 +1,435 @@
+import re
+import json
+
+import maya
+from maya import cmds as mc
+
+from . import utils
+from . import editing
+from .modules import module_base
+
+## ----------------------------------------------------------------------
+'''
+
+	TAGGING.PY
+
+	Tagging whole skeletons into modules from rules.
+
+	A rule picks chain roots and says what module they get:
+
+		{
+			"name": "arms",
+			"match": "_(?P<limb>arm|leg)_",
+			"type": "SimpleFK",
+			"depth": [1, 4],
+			"chainLength": [3, 5],
+			"sides": ["lf", "rt"],
+			"side": "auto",
+			"token": "{limb}",
+			"params": { "fkControllerScale": 2.0 },
+			"seamRoot": true
+		}
+
+	match:			regex searched in the joint's short name.
+	depth:			joint ancestors above it, [min, max] (either can be null).
+	chainLength:	length of its chain (the first child chain, as
+					utils.getChain walks it), [min, max].
+	sides:			sides it can have (as utils.determineSide finds them).
+	side:			the side written: 'auto' (determineSide) or a side.
+	token:			format string; the match's named groups, name, side
+					and index (count of roots this rule took so far) fill
+					it in. The module's default token if left out.
+	params:			param overrides.
+	seamRoot:		seam the module's root to the root's parent joint.
+
+	Only type is required. Rules are tried in order and the first match
+	wins; a root takes its whole chain, so joints in it can't be roots for
+	later rules.
+
+	resolveRules() works from one hierarchy snapshot (snapshotHierarchy,
+	a single ls) without touching the scene. writeTags() then writes every
+	root's params in one undo chunk with plain cmds calls, from a per-type
+	template of what the module's constructor would create (see
+	paramTemplate), instead of building a module instance per root. The
+	constructor's other work (rig root, segment scale compensate) happens
+	when the module is built, as it always has.
+
+	Rules files are JSON: a list of rules, or { "rules": [...] }.
+
+'''
+
+## ----------------------------------------------------------------------
+class TaggingException(Exception):
+	pass
+
+RULE_KEYS = [ 'name', 'match', 'type', 'depth', 'chainLength', 'sides', 'side', 'token', 'params', 'seamRoot' ]
+
+## param templates by module type, made once per session
+_templates = {}
+
+## ----------------------------------------------------------------------
+class Rule(object):
+	def __init__(self, data):
+		unknown = [ x for x in data if not x in RULE_KEYS ]
+		if len(unknown):
+			raise TaggingException('Rule: unknown key(s) %s.' % ', '.join(sorted(unknown)))
+		if not data.get('type'):
+			raise TaggingException('Rule: a rule needs a type.')
+
+		self.type = str(data['type'])
+		self.name = str( data.get('name') or self.type )
+		self.match = re.compile(data['match']) if data.get('match') else None
+		self.depth = self._range( data.get('depth') )
+		self.chainLength = self._range( data.get('chainLength') )
+		self.sides = data.get('sides')
+		self.side = data.get('side') or 'auto'
+		self.token = data.get('token')
+		self.params = dict( data.get('params') or {} )
+		self.seamRoot = bool( data.get('seamRoot', False) )
+		self.count = 0
+
+	def __repr__(self):
+		return( "<< Witch Tagging Rule: %s (%s)." % (self.name, self.type) )
+
+	@staticmethod
+	def _range(value):
+		if value is None:
+			return( (None, None) )
+		if isinstance(value, (int, float)):
+			return( (value, value) )
+		return( tuple(value) )
+
+	@staticmethod
+	def _inRange(value, bounds):
+		low, high = bounds
+		return( (low is None or value >= low) and (high is None or value <= high) )
+
+	def test(self, short, depth, length, side):
+		## the match object (True without a regex) if the rule takes this root
+		if not self._inRange(depth, self.depth) or not self._inRange(length, self.chainLength):
+			return(None)
+		if self.sides is not None and not side in self.sides:
+			return(None)
+		if self.match is None:
+			return(True)
+		return( self.match.search(short) )
+
+
+## ----------------------------------------------------------------------
+def loadRules(path):
+	## Rules from a JSON file
+	with open(path, 'r') as handle:
+		data = json.load(handle)
+	if isinstance(data, dict):
+		data = data.get('rules', [])
+	return( [ Rule(x) for x in data ] )
+
+
+## ----------------------------------------------------------------------
+def saveRules(rules, path):
+	## rules as dicts (not Rule objects; those don't round trip their regex flags)
+	with open(path, 'w') as handle:
+		json.dump( { 'rules':rules }, handle, indent=4, sort_keys=True )
+
+
+## ----------------------------------------------------------------------
+def snapshotHierarchy():
+	'''
+	snapshotHierarchy():
+
+	Every joint in the scene from a single ls (long names, shallowest
+	first, siblings in order).
+
+	Returns:
+
+	A dict with names, parents (index, -1 for none), depths (joint
+	ancestors) and chains (the first child chain of every joint, as
+	indices).
+	'''
+
+	## parents first; the sort is stable, so siblings keep their order
+	names = sorted( mc.ls(type='joint', long=True) or [], key=lambda x: x.count('|') )
+	index = dict( (name, position) for position, name in enumerate(names) )
+
+	parents = []
+	children = [ [] for x in names ]
+	for position, name in enumerate(names):
+		## the nearest joint above; rig roots and groups in between are skipped
+		parent = -1
+		path = name
+		while '|' in path.lstrip('|'):
+			path = path.rpartition('|')[0]
+			if path in index:
+				parent = index[path]
+				break
+		parents.append(parent)
+		if parent >= 0:
+			children[parent].append(position)
+
+	depths = []
+	for parent in parents:
+		depths.append( depths[parent] + 1 if parent >= 0 else 0 )
+
+	chains = [ None ] * len(names)
+	for position in reversed( range(len(names)) ):
+		first = children[position][0] if len(children[position]) else None
+		chains[position] = [ position ] + ( chains[first] if first is not None else [] )
+
+	return( { 'names':names, 'parents':parents, 'depths':depths, 'chains':chains } )
+
+
+## ----------------------------------------------------------------------
+def resolveRules(rules, hierarchy=None):
+	'''
+	resolveRules(rules, hierarchy=None):
+
+	Matches rules (Rule objects or dicts) against a hierarchy snapshot
+	(taken now if None). Nothing in the scene is changed.
+
+	Returns:
+
+	A list of dicts, one per root: root, type, token (None for the
+	module's default), side, params, seam (the parent joint or None) and
+	the rule's name, shallowest roots first.
+	'''
+
+	rules = [ x if isinstance(x, Rule) else Rule(x) for x in rules ]
+	for rule in rules:
+		rule.count = 0
+	hierarchy = hierarchy or snapshotHierarchy()
+
+	names = hierarchy['names']
+	claimed = set()
+	results = []
+	for position, name in enumerate(names):
+		if position in claimed:
+			continue
+
+		short = name.rpartition('|')[2]
+		detected = utils.determineSide(short.rpartition(':')[2])
+		chain = hierarchy['chains'][position]
+
+		for rule in rules:
+			found = rule.test(short, hierarchy['depths'][position], len(chain), detected)
+			if not found:
+				continue
+
+			side = detected if rule.side == 'auto' else rule.side
+			token = None
+			if rule.token is not None:
+				fields = found.groupdict() if found is not True else {}
+				fields.update( { 'name':short, 'side':side, 'index':rule.count } )
+				try:
+					token = rule.token.format(**fields)
+				except (KeyError, IndexError) as error:
+					raise TaggingException("resolveRules: rule %s's token '%s' needs %s." % (rule.name, rule.token, error))
+
+			parent = hierarchy['parents'][position]
+			results.append( {
+				'root':name,
+				'rule':rule.name,
+				'type':rule.type,
+				'token':token,
+				'side':side,
+				'params':dict(rule.params),
+				'seam':names[parent] if rule.seamRoot and parent >= 0 else None,
+			} )
+			rule.count += 1
+			claimed.update(chain)
+			break
+
+	return(results)
+
+
+## ----------------------------------------------------------------------
+def paramTemplate(moduleType, factory=None):
+	'''
+	paramTemplate(moduleType, factory=None):
+
+	What the module type's constructor writes on a root: every param
+	attribute with its type, enum fields, range, flags and default. Made
+	by tagging a temporary joint once per session.
+
+	Returns:
+
+	A list of dicts (attr, type, enum, min, max, multi, keyable, channelBox,
+	locked, value, children), parents before their children.
+	'''
+
+	if moduleType in _templates:
+		return(_templates[moduleType])
+
+	from . import moduleFactory
+	factory = factory or moduleFactory.ModuleFactory()
+	moduleClass = factory.getClass(moduleType)
+	if moduleClass is None:
+		raise TaggingException('paramTemplate: unknown module type %s.' % moduleType)
+
+	mc.select(clear=True)
+	joints = [ mc.joint(name='witchTagTemplate_cn_%02d' % (x+1)) for x in range( max(moduleClass._minChainLength, 1) ) ]
+	mc.select(clear=True)
+
+	try:
+		instance = moduleClass(joints[0])
+		root = str(instance.root)
+
+		prefix = module_base.PARAM_PREFIX + '_'
+		specs = []
+		children = set()
+		for attr in mc.listAttr(root, ud=True) or []:
+			if attr.count('.') or attr in children or not (attr.startswith(prefix) or attr == 'MODULEROOT'):
+				continue
+			plug = '%s.%s' % (root, attr)
+			attrType = mc.getAttr(plug, type=True)
+			spec = {
+				'attr':attr,
+				'type':attrType,
+				'enum':None,
+				'min':mc.attributeQuery(attr, node=root, min=True)[0] if mc.attributeQuery(attr, node=root, minExists=True) else None,
+				'max':mc.attributeQuery(attr, node=root, max=True)[0] if mc.attributeQuery(attr, node=root, maxExists=True) else None,
+				'multi':mc.attributeQuery(attr, node=root, multi=True),
+				'keyable':mc.getAttr(plug, keyable=True) if not attrType in ('message', 'string') else False,
+				'channelBox':mc.getAttr(plug, channelBox=True) if not attrType in ('message', 'string') else False,
+				'locked':mc.getAttr(plug, lock=True),
+				'value':None,
+				'children':mc.attributeQuery(attr, node=root, listChildren=True) or [],
+			}
+			children.update(spec['children'])
+			if attrType == 'enum':
+				spec['enum'] = mc.attributeQuery(attr, node=root, listEnum=True)[0]
+				spec['value'] = mc.getAttr(plug, asString=True)
+			elif not attrType == 'message':
+				value = mc.getAttr(plug)
+				## compound attributes come back as [(x, y, z)]
+				if isinstance(value, list) and len(value) == 1 and isinstance(value[0], tuple):
+					value = list(value[0])
+				spec['value'] = value
+			specs.append(spec)
+	finally:
+		## the constructor put a rig root above the joint
+		top = mc.ls(joints[0], long=True)[0].lstrip('|').partition('|')[0]
+		mc.delete(top)
+
+	_templates[moduleType] = specs
+	return(specs)
+
+
+## ----------------------------------------------------------------------
+def _addParam(root, spec):
+	kwargs = { 'ln':spec['attr'], 'multi':spec['multi'] }
+	if spec['type'] == 'string':
+		kwargs['dt'] = 'string'
+	else:
+		kwargs['at'] = spec['type']
+	if spec['enum'] is not None:
+		kwargs['en'] = spec['enum']
+	if spec['min'] is not None:
+		kwargs['min'] = spec['min']
+	if spec['max'] is not None:
+		kwargs['max'] = spec['max']
+	mc.addAttr(root, **kwargs)
+	for child in spec['children']:
+		mc.addAttr(root, ln=child, at='float', p=spec['attr'])
+
+	plug = '%s.%s' % (root, spec['attr'])
+	if spec['keyable']:
+		mc.setAttr(plug, keyable=True)
+	elif spec['channelBox']:
+		mc.setAttr(plug, channelBox=True)
+
+
+## ----------------------------------------------------------------------
+def writeTags(matches, factory=None):
+	'''
+	writeTags(matches, factory=None):
+
+	Writes resolveRules results in one undo chunk: the module type's params
+	(see paramTemplate) where the root doesn't have them yet, then type,
+	token, side, the rule's params and the seam. Params the root already
+	has keep their values unless the rule sets them, so tagging again with
+	the same rules changes nothing.
+
+	Returns:
+
+	The number of roots tagged.
+	'''
+
+	from . import moduleFactory
+	factory = factory or moduleFactory.ModuleFactory()
+
+	## templates first; they make (and remove) temporary joints
+	templates = dict( (x, paramTemplate(x, factory)) for x in set( y['type'] for y in matches ) )
+
+	mc.undoInfo(openChunk=True)
+	try:
+		for match in matches:
+			root = match['root']
+			template = templates[match['type']]
+
+			values = {}
+			for spec in template:
+				plug = '%s.%s' % (root, spec['attr'])
+				if mc.attributeQuery(spec['attr'], node=root, exists=True):
+					if mc.getAttr(plug, type=True) == spec['type']:
+						continue
+					## a param of another module type; same name, new type
+					mc.setAttr(plug, lock=False)
+					mc.deleteAttr(plug)
+				_addParam(root, spec)
+				if spec['value'] is None:
+					continue
+				if spec['attr'].startswith(module_base.PARAM_PREFIX+'_'):
+					values[ spec['attr'][len(module_base.PARAM_PREFIX)+1:] ] = spec['value']
+				else:
+					## MODULEROOT
+					mc.setAttr(plug, spec['value'])
+
+			values['type'] = match['type']
+			values['side'] = match['side']
+			if match['token'] is not None:
+				values['token'] = match['token']
+			values.update(match['params'])
+			if match['seam'] is not None:
+				values['parent_root'] = match['seam']
+
+			known = set( x['attr'] for x in template )
+			for param in values:
+				if not param.startswith('parent_') and not module_base.PARAM_PREFIX+'_'+param in known:
+					raise TaggingException('writeTags: %s has no param %s.' % (match['type'], param))
+
+			editing.writeParams( root, dict( (key, (None, value)) for key, value in values.items() ) )
+
+			for spec in template:
+				if spec['locked']:
+					mc.setAttr('%s.%s' % (root, spec['attr']), lock=True)
+	finally:
+		mc.undoInfo(closeChunk=True)
+
+	return( len(matches) )
+
+
+## ----------------------------------------------------------------------
+def tagSkeleton(rules, apply=True, factory=None):
+	'''
+	tagSkeleton(rules, apply=True, factory=None):
+
+	Resolves rules (a rules file path, or a list of Rules / dicts) against
+	the scene's joints and, with apply, writes the tags.
+
+	Returns:
+
+	The resolveRules result.
+	'''
+
+	if not isinstance(rules, (list, tuple)):
+		rules = loadRules(rules)
+
+	matches = resolveRules(rules)
+	if apply:
+		writeTags(matches, factory)
+
+	for match in matches:
+		print( "\t++ %s: %s (%s)" % (match['rule'], match['root'].rpartition('|')[2], match['type']) )
+	print( "++ Tagging: %d root(s)" % len(matches) )
+
+	return(matches)
@@ -1,3 +1,4 @@
+import hashlib
 from copy import deepcopy
 
 import maya
@@ -5,6 +6,9 @@ from maya import cmds as mc
 from maya import OpenMaya as om
 import pymel.core as pm
 
+from . import shapes
+from . import nodecache
+
 ## ----------------------------------------------------------------------
 '''
 
@@ -104,30 +108,9 @@ class colors(object):
 
 
 ## ----------------------------------------------------------------------
-## Definitions for different rig controller types
-## Controllers are created as D-1 nurbs curves only.
-controllerCurves = {
-	'box' : [[0, -0.5, 0.5], [0, -0.5, -0.5], [0, 0.5, -0.5], [0, 0.5, 0.5], [0, -0.5, 0.5]],
-	'circle': [
-		[1.874699728327322e-33, 0.5, -3.061616997868383e-17],
-		[-1.1716301013315743e-17, 0.46193976625564337, 0.19134171618254486],
-		[-2.1648901405887335e-17, 0.35355339059327373, 0.3535533905932738],
-		[-2.8285652807192507e-17, 0.19134171618254486, 0.46193976625564337],
-		[-3.061616997868383e-17, -2.4894981252573997e-17, 0.5],
-		[-2.8285652807192507e-17, -0.19134171618254492, 0.46193976625564337],
-		[-2.164890140588733e-17, -0.35355339059327384, 0.35355339059327373],
-		[-1.1716301013315742e-17, -0.4619397662556434, 0.19134171618254484],
-		[3.223916797098519e-33, -0.5, -5.265055686820291e-17],
-		[1.171630101331575e-17, -0.4619397662556433, -0.19134171618254495],
-		[2.1648901405887338e-17, -0.3535533905932737, -0.35355339059327384],
-		[2.828565280719251e-17, -0.19134171618254478, -0.4619397662556434],
-		[3.061616997868383e-17, 1.0816170809946073e-16, -0.5],
-		[2.8285652807192507e-17, 0.191341716182545, -0.4619397662556433],
-		[2.1648901405887323e-17, 0.35355339059327384, -0.3535533905932736],
-		[1.1716301013315736e-17, 0.46193976625564337, -0.19134171618254472],
-		[-1.0022072164332974e-32, 0.4999999999999999, 1.6367285933071856e-16]
-	],
-}
+## Definitions for different rig controller types live in shapes.py;
+## this is the same dictionary, kept here for existing callers.
+controllerCurves = shapes._library
 
 
 rotateOrders = {
@@ -139,6 +122,40 @@ rotateOrders = {
 	'zyx': 5
 }
 
+## master curves for controls created with shared=True live under this group
+SHARED_SHAPES_GROUP = 'WT_SHARED_SHAPES'
+
+## ----------------------------------------------------------------------
+def addOffset(*args):
+	'''
+	addOffset(*args):
+
+	The zero-group-free alternative to addZero: moves each object's current
+	local transform into its offsetParentMatrix and resets the channels, so
+	the rest pose lives on the object itself instead of on an extra parent.
+	Call it after the object has been parented where it's going to stay.
+
+	Needs a Maya version with offsetParentMatrix (2020+).
+	'''
+
+	oblist = makeList(args)
+
+	for item in oblist:
+		name = str(item)
+		if not mc.attributeQuery('offsetParentMatrix', node=name, exists=True):
+			raise UtilsException('addOffset: %s has no offsetParentMatrix (Maya 2020+ is required).' % name)
+
+		world = mc.xform(name, q=True, ws=True, m=True)
+		offset = multMatrix( world, mc.getAttr(name+'.parentInverseMatrix') )
+
+		mc.xform(name, t=(0,0,0), ro=(0,0,0), s=(1,1,1))
+		if mc.nodeType(name) == 'joint':
+			mc.setAttr(name+'.jointOrient', 0, 0, 0)
+		mc.setAttr(name+'.offsetParentMatrix', offset, type='matrix')
+
+	return(oblist)
+
+
 ## ----------------------------------------------------------------------
 def addRigRoot(*args):
 	oblist = makeList(args, type='joint')
@@ -232,6 +249,32 @@ def cleanParams(*args, **kwargs):
 			safeDeleteAttr(attr, v=verbose)
 
 
+## ----------------------------------------------------------------------
+def compensateOffset(constraint, ob):
+	'''
+	compensateOffset(constraint, ob):
+
+	Constraints convert their result to local space with the object's
+	parentInverseMatrix, which doesn't include the offsetParentMatrix, so an
+	object using the offset layout would get its rest transform twice. This
+	feeds the constraint the inverse of (offsetParentMatrix * parentMatrix)
+	instead. Returns the multMatrix node.
+	'''
+
+	constraint, name = str(constraint), str(ob)
+	inverse = inverseMatrix( mc.getAttr(name+'.offsetParentMatrix') )
+
+	mult = mc.createNode('multMatrix', name=name.rpartition('|')[2]+'_offsetComp')
+	mc.connectAttr(name+'.parentInverseMatrix', mult+'.matrixIn[0]')
+	mc.setAttr(mult+'.matrixIn[1]', inverse, type='matrix')
+	mc.connectAttr(mult+'.matrixSum', constraint+'.constraintParentInverseMatrix', force=True)
+
+	mc.addAttr(mult, ln='constraintTarget', at='message')
+	mc.connectAttr(name+'.message', mult+'.constraintTarget')
+
+	return(mult)
+
+
 ## ----------------------------------------------------------------------
 def createControl(*args, **kwargs):
 	targets = makeList(args)
@@ -251,7 +294,7 @@ def createControl(*args, **kwargs):
 		'up':'y',
 		'rotateOrder':'zxy',
 		'translation':[0,0,0],
-		'rotation':[0,0]
+		'rotation':[0,0,0]
 	}
 
 	data.update(**kwargs)
@@ -265,20 +308,18 @@ def createControl(*args, **kwargs):
 		else:
 			data['side'] = 'cn'
 
-		curve = pm.curve( d=1, p=controllerCurves[data['type']] )
+		## CVs come out of the shape engine fully transformed, so the
+		## curve is created with its final points in one call
+		points = shapes.getPoints( data['type'], data['scale'], data['aim'], data['up'],
+			data['translation'], data['rotation'] )
+		curve = pm.curve( d=1, p=points )
 		curve.rename( makeName(data['name'], side=data['side'], upper=True) )
 		setColor(curve, data['color'])
-		scale = data['scale']
-		pm.scale(curve.cv, scale, scale, scale, r=True)
 
 		setAttrSpecial(curve, 'origScale', data['scale'], channelBox=False)
-
-		##!FIXME: Apply aim and up
 		setAttrSpecial(curve, 'aim', data['aim'], channelBox=False)
 		setAttrSpecial(curve, 'up', data['up'], channelBox=False)
 
-		##!FIXME: apply controller translation and rotation
-
 		## rotate order
 		rotateOrder = data['rotateOrder']
 		if isinstance(rotateOrder, str) or isinstance(rotateOrder, unicode):
@@ -303,6 +344,137 @@ def createControl(*args, **kwargs):
 	return(zip(zeros, controls))
 
 
+## ----------------------------------------------------------------------
+def createControls(targets, names=None, parent=None, chain=False, layout='zero', shared=False, **kwargs):
+	'''
+	createControls(targets, names=None, parent=None, chain=False, layout='zero', shared=False, **kwargs):
+
+	Batch version of createControl for whole chains. The controller params are
+	resolved once, every name is allocated up front from a single scene query
+	and the curves, zeros and attributes are made with plain cmds calls.
+
+	targets:	list of objects to snap the controls to (None entries make a
+				control at the origin).
+
+	names:		optional list of name templates, one per target. Defaults to
+				the 'name' kwarg for every control.
+
+	parent:		object the zeros are parented under, in one call.
+
+	chain:		if True, each zero is parented under the previous control
+				instead (the first one still goes under parent).
+
+	layout:		'zero' puts a zero group above every control. 'offset' stores
+				the rest transform in each control's offsetParentMatrix
+				instead (see addOffset), and the control is its own "zero".
+
+	shared:		if True, every control gets an instance of one master curve
+				per distinct shape (see getSharedShape) instead of a curve of
+				its own. Color overrides are set on the control transforms, so
+				they still work per control.
+
+	**kwargs:	the same controller data createControl takes.
+
+	Returns:
+
+	A list of (zero, control) PyNode pairs in target order.
+	'''
+
+	targets = [ None if x is None else str(x) for x in targets ]
+
+	data = {
+		'name':'CONTROL_#s_#d_CON',
+		'type':'box',
+		'color': colors.green,
+		'scale':1.0,
+		'aim':'x',
+		'up':'y',
+		'rotateOrder':'zxy',
+		'translation':[0,0,0],
+		'rotation':[0,0,0]
+	}
+	data.update(**kwargs)
+
+	if names is None:
+		names = [ data['name'] ] * len(targets)
+	if not len(names) == len(targets):
+		raise ValueError('createControls: need one name per target (%d names, %d targets).' % (len(names), len(targets)))
+
+	rotateOrder = data['rotateOrder']
+	if isinstance(rotateOrder, str) or isinstance(rotateOrder, unicode):
+		if not rotateOrder in rotateOrders.keys():
+			raise ValueError("rotateOrder must be an integer between 0 and 5 or one of " + ' '.join(rotateOrders.keys()) + '.' )
+		rotateOrder = rotateOrders[rotateOrder]
+
+	color = data['color']
+	if isinstance(color, str) or isinstance(color, unicode):
+		color = colors.indexForColor(color)
+
+	points = shapes.getPoints( data['type'], data['scale'], data['aim'], data['up'],
+		data['translation'], data['rotation'] )
+
+	## one name allocation per distinct template
+	sides = [ data['side'] if 'side' in data else ('cn' if x is None else determineSide(x)) for x in targets ]
+	pools = {}
+	for template, side in zip(names, sides):
+		pools[(template, side)] = pools.get((template, side), 0) + 1
+	for key, count in pools.items():
+		pools[key] = makeNames(key[0], count, side=key[1], upper=True)
+	allocated = [ pools[(template, side)].pop(0) for template, side in zip(names, sides) ]
+
+	if not layout in ('zero', 'offset'):
+		raise ValueError("createControls: layout must be 'zero' or 'offset'.")
+
+	master = getSharedShape(data['type'], points) if shared else None
+
+	zeros = []
+	controls = []
+	for target, name in zip(targets, allocated):
+		if master is None:
+			curve = mc.curve( d=1, p=points, n=name )
+		else:
+			curve = mc.createNode('transform', name=name, skipSelect=True)
+			mc.parent(master, curve, add=True, shape=True)
+		if layout == 'zero':
+			zero = mc.createNode('transform', name=name+'Zero')
+			curve = mc.parent(curve, zero, r=True)[0]
+		else:
+			zero = curve
+
+		for node in set([zero, curve]):
+			mc.setAttr(node+'.rotateOrder', rotateOrder)
+
+		mc.setAttr(curve+'.overrideEnabled', True)
+		mc.setAttr(curve+'.overrideColor', color)
+
+		mc.addAttr(curve, ln='origScale', at='float')
+		mc.setAttr(curve+'.origScale', data['scale'], lock=True)
+		for attr in 'aim', 'up':
+			mc.addAttr(curve, ln=attr, dt='string')
+			mc.setAttr(curve+'.'+attr, data[attr], type='string', lock=True)
+
+		if target is not None:
+			mc.xform(zero, ws=True, m=worldMatrix(target, scale=False))
+
+		## PyNodes follow the objects through the reparenting below
+		zeros.append( pm.PyNode(zero) )
+		controls.append( pm.PyNode(curve) )
+
+	if chain:
+		for index in range(1, len(zeros)):
+			mc.parent(str(zeros[index]), str(controls[index-1]))
+		if parent is not None and len(zeros):
+			mc.parent(str(zeros[0]), str(parent))
+	elif parent is not None and len(zeros):
+		mc.parent([ str(x) for x in zeros ], str(parent))
+
+	## the offsets can only be taken once everything is in its final place
+	if layout == 'offset':
+		addOffset(controls)
+
+	return( list(zip(zeros, controls)) )
+
+
 ## ----------------------------------------------------------------------
 def determineSide(ob):
 	centers = [ '_C_','_CN_', '_cn_' ]
@@ -322,8 +494,7 @@ def determineSide(ob):
 
 ## ----------------------------------------------------------------------
 def getAttrSpecial(ob, attr, defaultValue=None, prefix=None):
-	if not isinstance(ob, pm.PyNode):
-		ob = pm.PyNode(ob)
+	ob = resolveNode(ob)
 
 	attrName = '_'.join([prefix, attr]) if prefix is not None else attr
 
@@ -363,8 +534,7 @@ def getChain(root, chainList=None):
 
 	acceptedTypes = ['transform', 'joint']
 
-	if not isinstance(root, pm.PyNode):
-		root = pm.PyNode(root)
+	root = resolveNode(root)
 
 	if chainList is None:
 		chainList = []
@@ -389,6 +559,113 @@ def getChain(root, chainList=None):
 	return(chainList)
 
 
+## ----------------------------------------------------------------------
+def getSharedShape(shapeType, points):
+	'''
+	getSharedShape(shapeType, points):
+
+	Returns the master nurbsCurve shape for the given (fully transformed)
+	points, creating it under SHARED_SHAPES_GROUP the first time. Masters
+	are named after a hash of their points, so finding one is a name lookup.
+	'''
+
+	digest = hashlib.md5( repr( tuple( tuple( round(x, 6) for x in point ) for point in points ) ).encode('utf-8') ).hexdigest()
+	name = 'WT_SHAPE_%s_%s' % (shapeType, digest[:10])
+
+	found = mc.ls('%s|%s' % (SHARED_SHAPES_GROUP, name), long=True)
+	if len(found):
+		return( mc.listRelatives(found[0], s=True, f=True)[0] )
+
+	if not mc.objExists(SHARED_SHAPES_GROUP):
+		mc.createNode('transform', name=SHARED_SHAPES_GROUP, skipSelect=True)
+		mc.setAttr(SHARED_SHAPES_GROUP+'.visibility', False)
+
+	master = mc.curve( d=1, p=points, n=name )
+	master = mc.parent(master, SHARED_SHAPES_GROUP)[0]
+
+	return( mc.listRelatives(master, s=True, f=True)[0] )
+
+
+## ----------------------------------------------------------------------
+def hasOffset(ob, tolerance=1e-6):
+	## True if the object is using the offset layout (non-identity offsetParentMatrix)
+	name = str(ob)
+	if not mc.attributeQuery('offsetParentMatrix', node=name, exists=True):
+		return(False)
+	matrix = mc.getAttr(name+'.offsetParentMatrix')
+	identity = [ 1.0 if x % 5 == 0 else 0.0 for x in range(16) ]
+	return( max( abs(x - y) for x, y in zip(matrix, identity) ) > tolerance )
+
+
+## ----------------------------------------------------------------------
+def inverseMatrix(m):
+	## inverse of a flat 16-float affine matrix
+	a, b, c = m[0:3], m[4:7], m[8:11]
+	det = a[0]*(b[1]*c[2]-b[2]*c[1]) - a[1]*(b[0]*c[2]-b[2]*c[0]) + a[2]*(b[0]*c[1]-b[1]*c[0])
+	if abs(det) < 1e-12:
+		raise UtilsException('inverseMatrix: matrix is singular.')
+
+	r = [
+		(b[1]*c[2]-b[2]*c[1])/det, (a[2]*c[1]-a[1]*c[2])/det, (a[1]*b[2]-a[2]*b[1])/det,
+		(b[2]*c[0]-b[0]*c[2])/det, (a[0]*c[2]-a[2]*c[0])/det, (a[2]*b[0]-a[0]*b[2])/det,
+		(b[0]*c[1]-b[1]*c[0])/det, (a[1]*c[0]-a[0]*c[1])/det, (a[0]*b[1]-a[1]*b[0])/det,
+	]
+	t = m[12:15]
+	inverseT = [ -sum( t[k] * r[k*3+column] for k in range(3) ) for column in range(3) ]
+
+	return( r[0:3] + [0.0] + r[3:6] + [0.0] + r[6:9] + [0.0] + inverseT + [1.0] )
+
+
+## ----------------------------------------------------------------------
+def installCopyOnEdit():
+	'''
+	Starts a scriptJob that gives a control its own curve as soon as
+	components of a shared shape are selected on it (see unshareShape), so
+	editing one control's CVs doesn't change every control sharing the
+	shape. Returns the job number.
+	'''
+
+	def copyOnEdit():
+		selection = mc.ls(sl=True, long=True) or []
+		components = [ x for x in selection if '.' in x ]
+		changed = {}
+		for item in components:
+			path = item.partition('.')[0]
+			if not mc.objectType(path, isAType='nurbsCurve') or not isSharedShape(path):
+				continue
+			control = mc.listRelatives(path, p=True, f=True)[0]
+			if not control in changed:
+				changed[control] = unshareShape(control)[0]
+		if len(changed):
+			swapped = []
+			for item in selection:
+				path, dot, component = item.partition('.')
+				control = mc.listRelatives(path, p=True, f=True)[0] if dot else None
+				swapped.append( changed[control] + dot + component if control in changed else item )
+			mc.select(swapped, replace=True)
+
+	return( mc.scriptJob(event=['SelectionChanged', copyOnEdit], killWithScene=True) )
+
+
+## ----------------------------------------------------------------------
+def isSharedShape(shape):
+	## True if the shape is instanced under more than one transform
+	return( len( mc.listRelatives(str(shape), allParents=True) or [] ) > 1 )
+
+
+## ----------------------------------------------------------------------
+def listConstraints(*args):
+	## the nodes removeConstraints would delete from the given objects
+	nodes = []
+	for item in makeList(args):
+		name = str(item)
+		nodes += mc.listRelatives(name, c=True, type='constraint', f=True) or []
+		for node in mc.listConnections(name+'.message', s=False, d=True, p=True) or []:
+			if node.endswith('.constraintTarget'):
+				nodes.append( node.partition('.')[0] )
+	return( sorted( set(nodes) ) )
+
+
 ## ----------------------------------------------------------------------
 def lock(*args, **kwargs):
 	oblist = makeList(args)
@@ -453,7 +730,7 @@ def makeList(*args, **kwargs):
 		return(realList)
 
 	## only attempt PyNodes at this point, after the above list has been filtered
-	objects = [ pm.PyNode(x) for x in makeListRecursive(args) if pm.objExists(x) ]
+	objects = [ x for x in [ resolveNode(y, strict=False) for y in makeListRecursive(args) ] if x is not None ]
 
 	## filter by type
 	if obType is not None:
@@ -493,6 +770,148 @@ def makeName(name, token='token', side='cn', upper=False):
 	return(realName)
 
 
+## ----------------------------------------------------------------------
+def makeNames(name, count, token='token', side='cn', upper=False):
+	'''
+	makeNames(name, count, token='token', side='cn', upper=False):
+
+	Like makeName, but allocates count free '#d' names from a single scene
+	query instead of testing one index at a time.
+	'''
+
+	realName = name.replace('#t', token).replace('#s', side)
+	if upper:
+		realName = realName.upper().replace('#D', '#d')
+
+	if not realName.count('#d'):
+		return( [ realName ] * count )
+
+	existing = set( x.rpartition('|')[2] for x in mc.ls(realName.replace('#d', '*')) or [] )
+
+	results = []
+	index = 1
+	while len(results) < count:
+		tempName = realName.replace('#d', '%02d' % index)
+		if not tempName in existing:
+			results.append(tempName)
+		index += 1
+
+	return(results)
+
+
+## ----------------------------------------------------------------------
+def matrixConstraint(driver, target, mo=True, channels='trs', opm=False):
+	'''
+	matrixConstraint(driver, target, mo=True, channels='trs', opm=False):
+
+	A single-driver constraint made from matrix nodes instead of a
+	constraint node.
+
+	By default the network is multMatrix(offset, driver.worldMatrix,
+	target.parentInverseMatrix) -> decomposeMatrix -> the target's translate,
+	rotate and / or scale (channels is any combination of 't', 'r' and 's').
+	Joints with a jointOrient get one extra multMatrix / decomposeMatrix
+	pair for rotation so the orient isn't applied twice.
+
+	With opm=True the multMatrix drives the target's offsetParentMatrix
+	directly and no decomposeMatrix is needed at all. That always drives the
+	full transform, and the target's own channels stay free (for animation,
+	say) on top of it. Needs Maya 2020+.
+
+	mo:		maintain offset-- the target keeps its current world transform.
+
+	Every node made is tagged with a constraintTarget message connection from
+	the target, which is how removeConstraints finds them again.
+
+	Returns:
+
+	The list of nodes created.
+	'''
+
+	driver, target = str(driver), str(target)
+	shortName = target.rpartition('|')[2]
+	identity = [ 1.0 if x % 5 == 0 else 0.0 for x in range(16) ]
+
+	targetWorld = mc.xform(target, q=True, ws=True, m=True)
+	driverWorld = mc.xform(driver, q=True, ws=True, m=True)
+	parentWorld = mc.getAttr(target+'.parentMatrix')
+
+	nodes = []
+	mult = mc.createNode('multMatrix', name=shortName+'_matrixCns')
+	nodes.append(mult)
+
+	if opm:
+		if not mc.attributeQuery('offsetParentMatrix', node=target, exists=True):
+			raise UtilsException('matrixConstraint: %s has no offsetParentMatrix (Maya 2020+ is required).' % target)
+
+		## world = local * offset * driverWorld, so the offset has to
+		## cancel whatever the local channels hold right now
+		currentOffset = mc.getAttr(target+'.offsetParentMatrix')
+		local = multMatrix( targetWorld, inverseMatrix( multMatrix(currentOffset, parentWorld) ) )
+		if mo:
+			offset = multMatrix( multMatrix(currentOffset, parentWorld), inverseMatrix(driverWorld) )
+		else:
+			offset = inverseMatrix(local)
+
+		mc.setAttr(mult+'.matrixIn[0]', offset, type='matrix')
+		mc.connectAttr(driver+'.worldMatrix[0]', mult+'.matrixIn[1]')
+		mc.connectAttr(target+'.parentInverseMatrix[0]', mult+'.matrixIn[2]')
+		mc.connectAttr(mult+'.matrixSum', target+'.offsetParentMatrix', force=True)
+
+	else:
+		offset = multMatrix( targetWorld, inverseMatrix(driverWorld) ) if mo else identity
+
+		mc.setAttr(mult+'.matrixIn[0]', offset, type='matrix')
+		mc.connectAttr(driver+'.worldMatrix[0]', mult+'.matrixIn[1]')
+		mc.connectAttr(target+'.parentInverseMatrix[0]', mult+'.matrixIn[2]')
+		if hasOffset(target):
+			## same story as compensateOffset: the rest lives in the offsetParentMatrix
+			mc.setAttr(mult+'.matrixIn[3]', inverseMatrix(mc.getAttr(target+'.offsetParentMatrix')), type='matrix')
+
+		decompose = mc.createNode('decomposeMatrix', name=shortName+'_matrixCnsDecomp')
+		nodes.append(decompose)
+		mc.connectAttr(mult+'.matrixSum', decompose+'.inputMatrix')
+		mc.connectAttr(target+'.rotateOrder', decompose+'.inputRotateOrder')
+
+		if 't' in channels:
+			mc.connectAttr(decompose+'.outputTranslate', target+'.translate', force=True)
+		if 's' in channels:
+			mc.connectAttr(decompose+'.outputScale', target+'.scale', force=True)
+			mc.connectAttr(decompose+'.outputShear', target+'.shear', force=True)
+
+		if 'r' in channels:
+			orient = mc.getAttr(target+'.jointOrient')[0] if mc.nodeType(target) == 'joint' else (0,0,0)
+			if max( abs(x) for x in orient ) > 1e-6:
+				## local = rotate * jointOrient, so strip the orient back off
+				## for the rotation only-- it would skew the translation
+				rows = shapes.rotationMatrix(orient)
+				orientMatrix = [ rows[column][row] for row in range(3) for column in range(3) ]
+				orientMatrix = orientMatrix[0:3] + [0.0] + orientMatrix[3:6] + [0.0] + orientMatrix[6:9] + [0.0, 0.0, 0.0, 0.0, 1.0]
+
+				rotMult = mc.createNode('multMatrix', name=shortName+'_matrixCnsOrient')
+				rotDecompose = mc.createNode('decomposeMatrix', name=shortName+'_matrixCnsOrientDecomp')
+				nodes += [rotMult, rotDecompose]
+				mc.connectAttr(mult+'.matrixSum', rotMult+'.matrixIn[0]')
+				mc.setAttr(rotMult+'.matrixIn[1]', orientMatrix, type='matrix')
+				mc.connectAttr(rotMult+'.matrixSum', rotDecompose+'.inputMatrix')
+				mc.connectAttr(target+'.rotateOrder', rotDecompose+'.inputRotateOrder')
+				mc.connectAttr(rotDecompose+'.outputRotate', target+'.rotate', force=True)
+			else:
+				mc.connectAttr(decompose+'.outputRotate', target+'.rotate', force=True)
+
+	for node in nodes:
+		mc.addAttr(node, ln='constraintTarget', at='message')
+		mc.connectAttr(target+'.message', node+'.constraintTarget')
+
+	return(nodes)
+
+
+## ----------------------------------------------------------------------
+def multMatrix(a, b):
+	## flat 16-float matrices, row vectors (Maya's convention): a then b
+	return( [ sum( a[row*4+k] * b[k*4+column] for k in range(4) ) for row in range(4) for column in range(4) ] )
+
+
 ## ----------------------------------------------------------------------
 def poseMark(*args):
 	##!FIXME: add a prefix to save poses for multiple names
@@ -556,6 +975,20 @@ def poseReset(*args):
 			## reset the rigRoot on the roots of chains
 			addRigRoot(item)
 
+## ----------------------------------------------------------------------
+def removeConstraints(*args):
+	'''
+	Deletes every constraint on the given objects: constraint nodes parented
+	under them as well as the matrix networks from matrixConstraint and the
+	offset compensation nodes from compensateOffset.
+	'''
+
+	## one delete for everything
+	nodes = listConstraints(args)
+	if len(nodes):
+		mc.delete(nodes)
+
+
 ## ----------------------------------------------------------------------
 def removeModule(*args):
 	oblist = makeList(args)
@@ -564,6 +997,15 @@ def removeModule(*args):
 		if ob.hasAttr('module'):
 			module = ob.module.get()
 			if module is not None:
+				## nodes registered with the module that live outside its
+				## hierarchy (utility networks, constraints on the chain's
+				## rig root) go with it; the chain itself stays
+				chain = set( mc.ls(mc.listConnections(str(module)+'.chain', s=True, d=False) or [], long=True) )
+				inside = set( mc.ls(str(module), dag=True, long=True) )
+				registered = mc.ls(mc.listConnections(str(module)+'.message', s=False, d=True) or [], long=True) or []
+				extra = [ x for x in registered if not x in chain and not x in inside ]
+				if len(extra):
+					mc.delete(extra)
 				pm.delete(module)
 
 		## remove extra attributes
@@ -596,11 +1038,42 @@ def removeParentAttr(*args, **kwargs):
 		safeDeleteAttr( item+'.parent_'+pType )
 
 
+## ----------------------------------------------------------------------
+def resolveNode(ob, strict=True):
+	'''
+	resolveNode(ob, strict=True):
+
+	Returns the PyNode for ob, looking node names up through the shared
+	node cache (see nodecache.py) instead of building a new PyNode every
+	time. PyNodes are passed through; attribute and component names fall
+	back to pm.PyNode.
+
+	strict:	raise like pm.PyNode if nothing exists by that name; with
+			strict=False, return None.
+	'''
+
+	if isinstance(ob, pm.PyNode):
+		return( ob if strict or pm.objExists(ob) else None )
+
+	node = nodecache.resolve( str(ob) )
+	if node is None:
+		if not strict and not pm.objExists(ob):
+			return(None)
+		node = pm.PyNode(ob)
+
+	return(node)
+
+
 ## ----------------------------------------------------------------------
 def safeDeleteAttr(attr, **kwargs):
 	if not isinstance(attr, pm.PyNode):
 		try:
-			attr = pm.PyNode(attr)
+			node, dot, name = str(attr).partition('.')
+			if dot and not name.count('.') and not name.count('['):
+				## the node through the cache, the attribute from it
+				attr = resolveNode(node).attr(name)
+			else:
+				attr = pm.PyNode(attr)
 		except:
 			# raise ValueError('safeDeleteAttr: Attribute does not exist: %s.' % attr)
 			return
@@ -654,8 +1127,7 @@ def setAttrSpecial(ob, attr, value, prefix=None, channelBox=True,
 
 	oldValue = None
 
-	if not isinstance(ob, pm.PyNode):
-		ob = pm.PyNode(ob)
+	ob = resolveNode(ob)
 
 	attrName = '_'.join([prefix, attr]) if prefix is not None else attr
 
@@ -773,6 +1245,44 @@ def setColor(*args):
 		item.overrideColor.set(color)
 
 
+## ----------------------------------------------------------------------
+def setControlShape(control, points, shapeType='box'):
+	'''
+	setControlShape(control, points, shapeType='box'):
+
+	Replaces the curve of an existing control with the given (fully
+	transformed) points, in place: the transform, its connections and its
+	animation are untouched. Same-sized curves just get new CVs; otherwise
+	the shape is swapped. Controls using a shared shape move to the shared
+	shape for the new points.
+	'''
+
+	control = str(control)
+	current = mc.listRelatives(control, s=True, f=True, type='nurbsCurve') or []
+
+	if len(current) and isSharedShape(current[0]):
+		master = getSharedShape(shapeType, points)
+		if not mc.ls(master, long=True) == mc.ls(current[0], long=True):
+			mc.parent(master, control, add=True, shape=True)
+			mc.parent(current[0], removeObject=True, shape=True)
+		return
+
+	if len(current) == 1 and mc.getAttr(current[0]+'.degree') == 1 and \
+		mc.getAttr(current[0]+'.spans') + 1 == len(points):
+		for index, point in enumerate(points):
+			mc.setAttr( '%s.controlPoints[%d]' % (current[0], index), *point )
+		return
+
+	temp = mc.curve( d=1, p=points )
+	shape = mc.listRelatives(temp, s=True, f=True)[0]
+	name = control.rpartition('|')[2] + 'Shape'
+	if len(current):
+		mc.delete(current)
+	mc.parent(shape, control, r=True, shape=True)
+	mc.delete(temp)
+	mc.rename( (mc.listRelatives(control, s=True, f=True, type='nurbsCurve') or [shape])[0], name )
+
+
 ## ----------------------------------------------------------------------
 def setParentAttr(*args, **kwargs):
 	pType = kwargs.get('type', None)
@@ -808,5 +1318,47 @@ def snap(*args):
 		snapHelper(item, target)
 
 
+## ----------------------------------------------------------------------
+def unshareShape(*args):
+	'''
+	Replaces shared (instanced) curve shapes on the given controls with
+	copies of their own. Controls without a shared shape are left alone.
+
+	Returns:
+
+	The new shapes, as long names.
+	'''
+
+	results = []
+	for item in makeList(args):
+		control = str(item)
+		for shape in mc.listRelatives(control, s=True, f=True, type='nurbsCurve') or []:
+			if not isSharedShape(shape):
+				continue
+			name = control.rpartition('|')[2] + 'Shape'
+			copy = mc.createNode('nurbsCurve', name=name, parent=control, skipSelect=True)
+			mc.connectAttr(shape+'.local', copy+'.create')
+			mc.dgeval(copy+'.local')
+			mc.disconnectAttr(shape+'.local', copy+'.create')
+			mc.parent(shape, removeObject=True, shape=True)
+			results += mc.ls(copy, long=True)
+
+	return(results)
+
+
+## ----------------------------------------------------------------------
+def worldMatrix(ob, scale=True):
+	'''
+	Returns the world matrix of ob as a flat list of 16 floats. With
+	scale=False the axes are normalized, which is what snap() gives you.
+	'''
 
+	matrix = mc.xform(str(ob), q=True, ws=True, m=True)
+	if not scale:
+		for row in range(3):
+			length = sum( x * x for x in matrix[row*4:row*4+3] ) ** 0.5
+			if length > 0.0:
+				for column in range(3):
+					matrix[row*4+column] /= length
 
+	return(matrix)